@@ -9,6 +9,10 @@ from anki.collection import ImportAnkiPackageRequest, ImportAnkiPackageOptions
 from anki.import_export_pb2 import ImportAnkiPackageUpdateCondition
 from anki_language_deck_generator.language_codes import LANGUAGES
 from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.http_pool import HttpPool
+from anki_language_deck_generator.image_normalizer import ImageNormalizer
+from anki_language_deck_generator.translators import create_translator
+from anki_language_deck_generator.voice_backend import create_voice_backend
 
 import tempfile
 import json
@@ -32,13 +36,14 @@ class DeckGeneratorDialog(QDialog):
         return config
 
     def _save_config(self, source_language, target_language, deck_name):
-        config = {
+        # Keep settings that are only edited in the addon configuration
+        self.config.update({
             'default_source_language': source_language,
             'default_target_language': target_language,
             'default_deck_name': deck_name
-        }
+        })
         with self._get_config_path().open('w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4)
+            json.dump(self.config, f, indent=4)
 
     def setup_ui(self):
         self.setWindowTitle('Language Deck Generator')
@@ -123,13 +128,46 @@ class DeckGeneratorDialog(QDialog):
 
         # Create temporary directory for media files
         with tempfile.TemporaryDirectory() as temp_dir:
+            http_pool = None
+            generator = None
+            translator = None
+            voice = None
             try:
+                http_pool = HttpPool()
+                dictionary_dir = self.config.get('dictionary_dir')
+                translator = create_translator(
+                    self.config.get('translator') or ('dictionary+glosbe' if dictionary_dir else 'glosbe'),
+                    source_language,
+                    target_language,
+                    http_pool=http_pool,
+                    dictionary_dir=dictionary_dir,
+                )
+                voice = create_voice_backend(
+                    self.config.get('voice') or 'gtts',
+                    source_language,
+                    temp_dir,
+                    http_pool=http_pool,
+                    voice=self.config.get('voice_model') or None,
+                )
+                image_normalizer = None
+                if self.config.get('image_max_size'):
+                    # Anki's executable cannot run worker processes, so images are re-encoded in this one
+                    image_normalizer = ImageNormalizer(
+                        max_size=self.config['image_max_size'],
+                        image_format=self.config.get('image_format') or 'jpeg',
+                        quality=self.config.get('image_quality') or ImageNormalizer.DEFAULT_QUALITY,
+                        processes=0,
+                    )
                 generator = AnkiDeckGenerator(
                     deck_name=deck_name,
                     source_language=source_language,
                     target_language=target_language,
                     working_dir=temp_dir,
-                    progress_callback=self.update_progress
+                    progress_callback=self.update_progress,
+                    http_pool=http_pool,
+                    translator=translator,
+                    image_normalizer=image_normalizer,
+                    voice=voice,
                 )
 
                 generator.add_words(words)
@@ -162,6 +200,15 @@ class DeckGeneratorDialog(QDialog):
                 showInfo(f'Error generating deck: {str(e)}')
                 raise
             finally:
+                if generator is not None:
+                    # Closes the media store in the temporary directory before it is removed
+                    generator.close()
+                if hasattr(translator, 'close'):
+                    translator.close()
+                if voice is not None:
+                    voice.close()
+                if http_pool is not None:
+                    http_pool.close()
                 # Re-enable generate button and hide progress bar
                 self.generate_btn.setEnabled(True)
                 self.progress_bar.hide()
@@ -1,4 +1,10 @@
-from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
-
 __version__ = '0.1.0'
 __all__ = ['AnkiDeckGenerator']
+
+
+def __getattr__(name):
+    # The generator pulls in genanki and the providers, so it is only imported when used
+    if name == 'AnkiDeckGenerator':
+        from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+        return AnkiDeckGenerator
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
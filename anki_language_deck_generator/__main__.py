@@ -1,7 +1,22 @@
 import argparse
 import logging
+import sys
 import tempfile
-from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from pathlib import Path
+from anki_language_deck_generator import failures
+from anki_language_deck_generator.journal import BuildJournal
+from anki_language_deck_generator.lookup_cache import LookupCache, default_cache_dir
+from anki_language_deck_generator.media_store import MediaStore
+from anki_language_deck_generator.metrics import Metrics
+from anki_language_deck_generator.rate_limiter import RateLimiter
+from anki_language_deck_generator.words_file import count_words, open_words_file
+
+
+def log_progress(current, total):
+    if total:
+        logging.info(f'Processed {current} of {total} words ({current * 100 // total}%)')
+    else:
+        logging.info(f'Processed {current} words')
 
 
 def main():
@@ -13,13 +28,243 @@ def main():
     parser.add_argument(
         '--words-file',
         required=True,
-        help='Path to the file with words, one word per line',
+        help='Path to the file with words, one word per line; '
+        "'-' reads from stdin and '.gz' files are decompressed on the fly",
     )
     parser.add_argument('--source-language', required=True, help='Source language')
     parser.add_argument('--target-language', required=True, help='Target language')
     parser.add_argument('-o', '--output', default='deck.apkg', help='Output path for the Anki deck')
     parser.add_argument('--working-dir', help='Working directory for media files')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of words processed concurrently (default: 1)',
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        help='Number of keep-alive connections kept open to each host (default: 10 or --workers if larger)',
+    )
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=RateLimiter.DEFAULT_RATE,
+        help='Maximum requests per second sent to each host (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--host-rate-limit',
+        action='append',
+        default=[],
+        metavar='HOST=RATE',
+        help='Maximum requests per second for one host, e.g. glosbe.com=2; can be repeated',
+    )
+    parser.add_argument(
+        '--max-retries',
+        type=int,
+        default=5,
+        help='Retries of throttled or failed requests with exponential backoff (default: 5)',
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Process words with asyncio over one pooled HTTP client (requires httpx)',
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=100,
+        help='Number of words in flight with --async (default: 100)',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=str(default_cache_dir()),
+        help='Directory of the persistent lookup cache (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--media-dir',
+        default=str(default_cache_dir() / 'media'),
+        help='Directory of the media store reused across runs and decks (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the lookup cache and keep media in the working directory only',
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=30,
+        help='Days after which cached lookups expire (default: 30)',
+    )
+    parser.add_argument(
+        '--not-found-ttl',
+        type=float,
+        default=failures.NOT_FOUND_TTL / (24 * 60 * 60),
+        help='Days for which words the translator does not know are not looked up again, 0 to always look them up '
+        '(default: %(default)g)',
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=LookupCache.DEFAULT_MAX_ENTRIES,
+        help='Maximum number of cached lookups, least recently used ones are evicted (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--retry-passes',
+        type=int,
+        default=1,
+        help='How many times words failing on throttling or network errors are tried again after the run '
+        '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--retry-delay',
+        type=float,
+        default=failures.RETRY_DELAY,
+        help='Seconds to wait before every retry pass (default: %(default)g)',
+    )
+    parser.add_argument(
+        '--failures',
+        metavar='FAILURES_JSONL',
+        help='Write the failed words with the reason (not_found, throttled, network, parse_error) '
+        'and the error to this file, one JSON object per line',
+    )
+    parser.add_argument(
+        '--count-words',
+        action='store_true',
+        help='Count the words in a quick pass before the build to show progress in percent',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume an interrupted build from the journal in the working directory, '
+        'skipping finished words (requires --working-dir)',
+    )
+    parser.add_argument(
+        '--translator',
+        choices=['glosbe', 'dictionary', 'dictionary+glosbe'],
+        help="Source of translations: Glosbe, an offline --dictionary or the dictionary first and Glosbe "
+        "for missing words (default: 'dictionary+glosbe' with --dictionary, 'glosbe' otherwise)",
+    )
+    parser.add_argument(
+        '--dictionary',
+        help='Directory of an offline dictionary built with anki-deck-dictionary-index',
+    )
+    parser.add_argument(
+        '--usage-index',
+        help='Directory of an offline Tatoeba usage index built with anki-deck-tatoeba-index, '
+        'used instead of the Tatoeba API',
+    )
+    parser.add_argument(
+        '--wiktionary-index',
+        help='Index of a nl.wiktionary dump built with anki-deck-wiktionary-index, '
+        'Dutch words found in it are not looked up online',
+    )
+    parser.add_argument(
+        '--voice',
+        choices=['gtts', 'espeak-ng', 'piper'],
+        default='gtts',
+        help='Engine pronouncing the words: Google TTS online or a local espeak-ng or piper (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--voice-model',
+        help='espeak-ng voice (default: the source language) or piper voice model file (required for piper)',
+    )
+    parser.add_argument(
+        '--voice-processes',
+        type=int,
+        help='Number of local synthesizer processes running at once (default: the number of CPUs)',
+    )
+    parser.add_argument(
+        '--image-max-size',
+        type=int,
+        metavar='PIXELS',
+        help='Downscale images to fit into PIXELS x PIXELS and re-encode them to shrink the deck',
+    )
+    parser.add_argument(
+        '--image-format',
+        choices=['jpeg', 'webp'],
+        default='jpeg',
+        help='Format of the re-encoded images (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--image-quality',
+        type=int,
+        default=85,
+        help='Quality of the re-encoded images from 1 to 100 (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--image-processes',
+        type=int,
+        help='Number of processes re-encoding images (default: the number of CPUs)',
+    )
+    parser.add_argument(
+        '--no-normalize-words',
+        action='store_true',
+        help='Look up the words as written, instead of unifying Unicode, case and Dutch articles '
+        'and skipping duplicates',
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        help='Split the words across this many processes and merge their results into one deck',
+    )
+    parser.add_argument(
+        '--shard-dir',
+        help='Directory of the shard results, e.g. shared by several machines (default: the working directory)',
+    )
+    parser.add_argument(
+        '--shard-index',
+        type=int,
+        help='Only build this shard of --shards into --shard-dir, e.g. on one of several machines',
+    )
+    parser.add_argument(
+        '--merge-shards',
+        action='store_true',
+        help='Only merge the shards of --shards already built in --shard-dir into the deck',
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='REPORT_JSON',
+        help='Write stage latencies, request counts, downloaded bytes, retries and cache hit ratios to this file',
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='TRACE_JSON',
+        help='Write a Chrome trace of the stages of every word to this file (open it in chrome://tracing)',
+    )
     args = parser.parse_args()
+    if args.translator is None:
+        args.translator = 'dictionary+glosbe' if args.dictionary else 'glosbe'
+    if args.translator != 'glosbe' and not args.dictionary:
+        parser.error(f'--translator {args.translator} requires --dictionary')
+    if args.voice == 'piper' and not args.voice_model:
+        parser.error('--voice piper requires --voice-model')
+    if not 1 <= args.image_quality <= 100:
+        parser.error('--image-quality must be between 1 and 100')
+    if args.resume and not (args.working_dir or args.shard_dir):
+        parser.error('--resume requires --working-dir or --shard-dir')
+    if args.count_words and args.words_file == '-':
+        parser.error('--count-words cannot be used with words read from stdin')
+    if args.shards is not None:
+        if args.shards < 1:
+            parser.error('--shards must be at least 1')
+        if args.words_file == '-':
+            parser.error('--shards cannot be used with words read from stdin')
+        if args.shard_index is not None and not 0 <= args.shard_index < args.shards:
+            parser.error(f'--shard-index must be between 0 and {args.shards - 1}')
+    elif args.shard_index is not None or args.merge_shards:
+        parser.error('--shard-index and --merge-shards require --shards')
+    if (args.shard_index is not None or args.merge_shards) and not args.shard_dir:
+        parser.error('--shard-index and --merge-shards require --shard-dir')
+    host_rates = {}
+    for host_rate in args.host_rate_limit:
+        host, _, rate = host_rate.partition('=')
+        try:
+            host_rates[host] = float(rate)
+        except ValueError:
+            parser.error(f'Invalid --host-rate-limit value: {host_rate}')
 
     if args.working_dir:
         working_dir = args.working_dir
@@ -27,24 +272,196 @@ def main():
         temp_dir = tempfile.TemporaryDirectory()
         working_dir = temp_dir.name
 
-    logging.basicConfig(level=logging.INFO)  # TODO: make it better
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_shard = args.shard_index is not None
+    merge_shards = args.shards is not None and not build_shard
+    if args.shards is not None:
+        from anki_language_deck_generator import shards
+
+        shard_root = Path(args.shard_dir or working_dir)
+        if build_shard:
+            # Every shard keeps its notes in the journal of its own working directory
+            working_dir = shards.shard_dir(shard_root, args.shard_index)
+            Path(working_dir).mkdir(parents=True, exist_ok=True)
+            if args.profile:
+                args.profile = f'{args.profile}.shard-{args.shard_index}'
+            if args.trace:
+                args.trace = f'{args.trace}.shard-{args.shard_index}'
+        elif not args.merge_shards:
+            try:
+                budget = shards.budget_args(
+                    args.shards, args.rate_limit, host_rates, args.image_processes, args.voice_processes
+                )
+                shards.run_shards(sys.argv[1:] + budget, args.shards, shard_root)
+            except RuntimeError as e:
+                logging.error(str(e))
+                sys.exit(1)
+    # Imported after parsing the arguments, so --help and usage errors do not wait for them
+    from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+    from anki_language_deck_generator.http_pool import HttpPool
+
+    cache = None
+    media_store = None
+    if not args.no_cache:
+        cache = LookupCache(
+            Path(args.cache_dir) / 'lookups.sqlite',
+            ttl=args.cache_ttl * 24 * 60 * 60,
+            max_entries=args.cache_size,
+        )
+        media_store = MediaStore(args.media_dir)
+    rate_limiter = RateLimiter(
+        default_rate=args.rate_limit,
+        host_rates=host_rates,
+        max_retries=args.max_retries,
+    )
+    metrics = Metrics(trace=bool(args.trace))
+    http_pool = HttpPool(
+        pool_size=args.pool_size or max(HttpPool.DEFAULT_POOL_SIZE, args.workers),
+        rate_limiter=rate_limiter,
+        metrics=metrics,
+    )
+    from anki_language_deck_generator.translators import create_translator
+
+    translator = create_translator(
+        args.translator, args.source_language, args.target_language,
+        http_pool=http_pool, dictionary_dir=args.dictionary,
+    )
+    usage_fetcher = None
+    if args.usage_index:
+        from anki_language_deck_generator.tatoeba_index import OfflineUsageFetcher
+
+        usage_fetcher = OfflineUsageFetcher(args.usage_index, args.source_language, args.target_language)
+    wiktionary_index = None
+    if args.wiktionary_index:
+        from anki_language_deck_generator.wiktionary_index import WiktionaryIndex
+
+        wiktionary_index = WiktionaryIndex(args.wiktionary_index)
+    voice = None
+    if args.voice != 'gtts':
+        from anki_language_deck_generator.voice_backend import create_voice_backend
+
+        voice = create_voice_backend(
+            args.voice, args.source_language, working_dir,
+            voice=args.voice_model, processes=args.voice_processes,
+        )
+    image_normalizer = None
+    if args.image_max_size:
+        from anki_language_deck_generator.image_normalizer import ImageNormalizer
+
+        image_normalizer = ImageNormalizer(
+            max_size=args.image_max_size,
+            image_format=args.image_format,
+            quality=args.image_quality,
+            processes=args.image_processes,
+        )
+    # The journal is only useful in a working directory that outlives the run
+    journal = None
+    if build_shard:
+        journal = BuildJournal(Path(working_dir) / BuildJournal.FILE_NAME, resume=args.resume)
+    elif merge_shards:
+        # The merged deck keeps its IDs, so merging again updates the deck imported before
+        path = shard_root / BuildJournal.FILE_NAME
+        header = BuildJournal(path, resume=True).header if path.exists() else None
+        journal = BuildJournal(path)
+        if header is not None:
+            journal.write_header(header['deck_id'], header['model_id'])
+    elif args.working_dir:
+        journal = BuildJournal(Path(working_dir) / BuildJournal.FILE_NAME, resume=args.resume)
+    word_normalizer = None
+    if not args.no_normalize_words:
+        from anki_language_deck_generator.word_normalizer import WordNormalizer
+
+        word_normalizer = WordNormalizer(args.source_language)
     deck_generator = AnkiDeckGenerator(
         deck_name=args.deck_name,
         source_language=args.source_language,
         target_language=args.target_language,
         working_dir=working_dir,
+        progress_callback=log_progress,
+        workers=args.workers,
+        cache=cache,
+        media_store=media_store,
+        journal=journal,
+        http_pool=http_pool,
+        metrics=metrics,
+        usage_fetcher=usage_fetcher,
+        translator=translator,
+        wiktionary_index=wiktionary_index,
+        output_path=None if build_shard else args.output,
+        image_normalizer=image_normalizer,
+        voice=voice,
+        # The merge skips duplicates itself
+        word_normalizer=None if merge_shards else word_normalizer,
+        not_found_ttl=args.not_found_ttl * 24 * 60 * 60,
+        retry_passes=args.retry_passes,
+        retry_delay=args.retry_delay,
     )
-    words = []
-    with open(args.words_file, 'r', encoding='UTF-8') as f:
-        words = f.readlines()
-    deck_generator.add_words(words)
-    deck_generator.save_deck(args.output)
+    total_words = count_words(args.words_file) if args.count_words and not build_shard else None
+    try:
+        with open_words_file(args.words_file) as words:
+            if merge_shards:
+                shards.merge_shards(deck_generator, words, shard_root, args.shards, normalizer=word_normalizer)
+            else:
+                if build_shard:
+                    words = shards.iter_shard_words(
+                        words,
+                        args.shard_index,
+                        args.shards,
+                        normalizer=None if word_normalizer is None else WordNormalizer(args.source_language),
+                    )
+                if args.use_async:
+                    import asyncio
+
+                    asyncio.run(
+                        deck_generator.add_words_async(words, concurrency=args.concurrency, total_words=total_words)
+                    )
+                else:
+                    deck_generator.add_words(words, total_words=total_words)
+        if not build_shard:
+            deck_generator.save_deck()
+    finally:
+        # Removes the unfinished package when the build fails, and with --no-cache
+        # closes the media store before the temporary directory is removed
+        deck_generator.close()
+    if args.profile:
+        metrics.write_report(args.profile)
+    if args.trace:
+        metrics.write_trace(args.trace)
+    http_pool.close()
+    if hasattr(translator, 'close'):
+        translator.close()
+    if usage_fetcher is not None:
+        usage_fetcher.close()
+    if wiktionary_index is not None:
+        wiktionary_index.close()
+    if voice is not None:
+        voice.close()
+    if image_normalizer is not None:
+        image_normalizer.close()
+        logging.info(
+            f'Normalized {image_normalizer.images} images, saved {image_normalizer.bytes_saved / 2**20:.1f} MiB '
+            f'({image_normalizer.original_bytes / 2**20:.1f} -> {image_normalizer.normalized_bytes / 2**20:.1f} MiB)'
+        )
+    if word_normalizer is not None and word_normalizer.duplicates:
+        logging.info(
+            f'Skipped {word_normalizer.duplicates} duplicate words, '
+            f'{word_normalizer.words} words were looked up '
+            f'instead of {word_normalizer.words + word_normalizer.duplicates}'
+        )
+    if journal is not None:
+        journal.close()
+    if cache is not None:
+        cache.close()
+        media_store.close()
+
+    if args.failures:
+        failures.write_failures(args.failures, deck_generator.failures)
 
     # Print failed words if any
-    if deck_generator.failed_words:
+    if deck_generator.failures:
         print("\nFailed words:")
-        for w in deck_generator.failed_words:
-            print(w.strip())
+        for failure in deck_generator.failures:
+            print(f"{failure['word']} ({failure['reason'] or 'unknown'})")
 
     if not args.working_dir:
         temp_dir.cleanup()  # Clean up the temporary directory if it was used
@@ -0,0 +1,213 @@
+"""
+Merge .apkg packages into one.
+
+Notes are deduplicated by GUID or by the word on their front, media files by
+the SHA-256 of their content. The packages are read one after another: the
+collection of one package at a time is extracted to a temporary file, and
+media files are streamed from the inputs into the output package, so memory
+use does not depend on the size of the media:
+
+    anki-deck-merge deck-1.apkg deck-2.apkg -o merged.apkg --key word
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from pathlib import Path
+from anki_language_deck_generator.apkg_writer import CHUNK_SIZE, ApkgWriter
+
+COLLECTION_NAMES = ('collection.anki21', 'collection.anki2')
+MEDIA_REFERENCE_RE = re.compile(r'\[sound:([^\]]+)\]|(<img[^>]*?\ssrc=")([^"]+)(")')
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def note_key(guid, fields, key):
+    """Return what makes two notes the same: their GUID, or the word on their front without markup"""
+    if key == 'guid':
+        return guid
+    word = TAG_RE.sub('', fields[0])
+    return ' '.join(word.split()).casefold()
+
+
+def media_references(field):
+    for match in MEDIA_REFERENCE_RE.finditer(field):
+        yield match.group(1) or match.group(3)
+
+
+def rename_media(field, renames):
+    """Point the sound and image references of a field to renamed media files"""
+    def rename(match):
+        if match.group(1) is not None:
+            return f'[sound:{renames.get(match.group(1), match.group(1))}]'
+        return match.group(2) + renames.get(match.group(3), match.group(3)) + match.group(4)
+
+    return MEDIA_REFERENCE_RE.sub(rename, field)
+
+
+def _read_collection(package):
+    """Return the models, decks and notes of a package; notes as (guid, model id, fields, tags, deck id)"""
+    name = next((name for name in COLLECTION_NAMES if name in package.namelist()), None)
+    if name is None:
+        raise ValueError(f'{package.filename} has no collection readable by this tool')
+    fd, db_path = tempfile.mkstemp(suffix='.anki2')
+    try:
+        with os.fdopen(fd, 'wb') as target, package.open(name) as source:
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+        connection = sqlite3.connect(db_path)
+        try:
+            models, decks = connection.execute('SELECT models, decks FROM col').fetchone()
+            models = {int(model_id): model for model_id, model in json.loads(models).items()}
+            decks = {int(deck_id): deck for deck_id, deck in json.loads(decks).items()}
+            if not models:
+                raise ValueError(f'{package.filename} stores its note types in a format this tool cannot read')
+            notes = connection.execute(
+                'SELECT notes.guid, notes.mid, notes.flds, notes.tags, MIN(cards.did) '
+                'FROM notes LEFT JOIN cards ON cards.nid = notes.id GROUP BY notes.id ORDER BY notes.id'
+            ).fetchall()
+        finally:
+            connection.close()
+    finally:
+        os.remove(db_path)
+    return models, decks, [(guid, mid, flds.split('\x1f'), tags.split(), did) for guid, mid, flds, tags, did in notes]
+
+
+def _make_model(model_id, model):
+    import genanki
+
+    return genanki.Model(
+        model_id,
+        model['name'],
+        fields=[dict(field) for field in sorted(model['flds'], key=lambda field: field['ord'])],
+        templates=[dict(template) for template in sorted(model['tmpls'], key=lambda template: template['ord'])],
+        css=model.get('css', ''),
+        model_type=model.get('type', 0),
+        sort_field_index=model.get('sortf', 0),
+    )
+
+
+class PackageMerger:
+    """Merges packages into an `ApkgWriter`, see `merge_packages`"""
+
+    def __init__(self, writer, key='guid'):
+        self.writer = writer
+        self.key = key
+        self.models = {}
+        self.decks = {}
+        self.keys = set()
+        # Content digest -> name of the media file in the output
+        self.media_by_digest = {}
+        self.notes = 0
+        self.duplicate_notes = 0
+        self.duplicate_media = 0
+
+    def _deck(self, deck_id, decks):
+        import genanki
+
+        if deck_id not in self.decks:
+            name = decks.get(deck_id, {}).get('name') or 'Merged deck'
+            self.decks[deck_id] = genanki.Deck(deck_id, name)
+        return self.decks[deck_id]
+
+    def _copy_media(self, package, referenced):
+        """Copy the referenced media of a package and return how its files were renamed"""
+        renames = {}
+        media = json.loads(package.read('media')) if 'media' in package.namelist() else {}
+        for entry, name in media.items():
+            # Files starting with '_' are used by templates, e.g. fonts
+            if name not in referenced and not name.startswith('_'):
+                continue
+            digest = hashlib.sha256()
+            with package.open(entry) as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+            target = self.media_by_digest.get(digest)
+            if target is not None:
+                self.duplicate_media += 1
+            else:
+                target = name
+                if target in self.writer.media_names:
+                    # The same name with other content
+                    stem, suffix = os.path.splitext(name)
+                    target = f'{stem}-{digest[:8]}{suffix}'
+                with package.open(entry) as source:
+                    self.writer.add_media_from(target, source)
+                self.media_by_digest[digest] = target
+            if target != name:
+                renames[name] = target
+        return renames
+
+    def add_package(self, path):
+        import genanki
+
+        with zipfile.ZipFile(path) as package:
+            models, decks, notes = _read_collection(package)
+            kept = []
+            referenced = set()
+            for guid, model_id, fields, tags, deck_id in notes:
+                key = note_key(guid, fields, self.key)
+                if key in self.keys:
+                    self.duplicate_notes += 1
+                    continue
+                self.keys.add(key)
+                kept.append((guid, model_id, fields, tags, deck_id))
+                for field in fields:
+                    referenced.update(media_references(field))
+            renames = self._copy_media(package, referenced)
+
+        for guid, model_id, fields, tags, deck_id in kept:
+            if model_id not in self.models:
+                self.models[model_id] = _make_model(model_id, models[model_id])
+            if renames:
+                fields = [rename_media(field, renames) for field in fields]
+            note = genanki.Note(model=self.models[model_id], fields=fields, tags=tags, guid=guid)
+            self._deck(deck_id if deck_id is not None else 1, decks).add_note(note)
+            self.notes += 1
+        logging.info(f'Added {len(kept)} notes of {path}, {len(notes) - len(kept)} were there already')
+
+
+def merge_packages(paths, output_path, key='guid'):
+    """Merge the packages into `output_path`. Returns the `PackageMerger` with the counts."""
+    writer = ApkgWriter(output_path)
+    merger = PackageMerger(writer, key=key)
+    try:
+        for path in paths:
+            merger.add_package(path)
+        writer.finish(list(merger.decks.values()))
+    except BaseException:
+        writer.abort()
+        raise
+    logging.info(
+        f'Merged {len(paths)} packages into {output_path}: {merger.notes} notes, '
+        f'{merger.duplicate_notes} duplicate notes and {merger.duplicate_media} duplicate media files dropped'
+    )
+    return merger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='anki-deck-merge',
+        description='Merge Anki packages into one, dropping duplicate notes and media files',
+    )
+    parser.add_argument('packages', nargs='+', help='.apkg files to merge, earlier ones win for duplicate notes')
+    parser.add_argument('-o', '--output', required=True, help='Path of the merged package')
+    parser.add_argument(
+        '--key',
+        choices=['guid', 'word'],
+        default='guid',
+        help="What makes notes duplicates: the same GUID or the same word on the front (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    merge_packages(args.packages, args.output, key=args.key)
+
+
+if __name__ == '__main__':
+    main()
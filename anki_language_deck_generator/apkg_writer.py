@@ -0,0 +1,107 @@
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+# Formats that are compressed already and are stored in the package as they are
+STORED_EXTENSIONS = {'.mp3', '.ogg', '.opus', '.m4a', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.webm'}
+# How many media files are packaged between progress messages
+LOG_INTERVAL = 500
+CHUNK_SIZE = 1024 * 1024
+
+
+class ApkgWriter:
+    """
+    Streaming writer of .apkg packages.
+
+    Media files are copied into the package one by one as soon as they are
+    added, in chunks, so memory use does not depend on the deck size and the
+    final save only has to write the collection. Already compressed formats
+    are stored, everything else is deflated.
+
+    The package is written to a `.partial` file that replaces `path` in `finish`.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.temp_path = self.path.with_name(f'{self.path.name}.partial')
+        self._zip = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED)
+        # Media file name -> its entry in the package
+        self.media_names = {}
+        self.media_bytes = 0
+
+    @staticmethod
+    def _compress_type(name):
+        if Path(name).suffix.lower() in STORED_EXTENSIONS:
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def _added(self, size):
+        self.media_bytes += size
+        if len(self.media_names) % LOG_INTERVAL == 0:
+            logging.info(f'Packaged {len(self.media_names)} media files ({self.media_bytes / 2**20:.1f} MiB)')
+
+    def add_media(self, file_path):
+        """Copy a media file into the package unless a file with the same name is there already"""
+        file_path = Path(file_path)
+        if file_path.name in self.media_names:
+            return False
+        index = len(self.media_names)
+        self._zip.write(file_path, str(index), compress_type=self._compress_type(file_path.name))
+        self.media_names[file_path.name] = index
+        self._added(file_path.stat().st_size)
+        return True
+
+    def add_media_from(self, name, source):
+        """Copy a media file named `name` from a binary file object, e.g. an entry of another package"""
+        if name in self.media_names:
+            return False
+        index = len(self.media_names)
+        info = zipfile.ZipInfo(str(index), date_time=time.localtime()[:6])
+        info.compress_type = self._compress_type(name)
+        size = 0
+        # The size is unknown upfront, so the entry may need ZIP64 sizes
+        with self._zip.open(info, 'w', force_zip64=True) as target:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                target.write(chunk)
+                size += len(chunk)
+        self.media_names[name] = index
+        self._added(size)
+        return True
+
+    def finish(self, decks, timestamp=None):
+        """Write the collection with the decks and the media list, then move the package into place"""
+        import genanki
+
+        if isinstance(decks, genanki.Deck):
+            decks = [decks]
+        if timestamp is None:
+            timestamp = time.time()
+        fd, db_path = tempfile.mkstemp(suffix='.anki2')
+        os.close(fd)
+        try:
+            connection = sqlite3.connect(db_path)
+            genanki.Package(decks).write_to_db(connection.cursor(), timestamp, itertools.count(int(timestamp * 1000)))
+            connection.commit()
+            connection.close()
+            self._zip.write(db_path, 'collection.anki2')
+        finally:
+            os.remove(db_path)
+        media = {index: name for name, index in self.media_names.items()}
+        self._zip.writestr('media', json.dumps(media))
+        self._zip.close()
+        os.replace(self.temp_path, self.path)
+        logging.info(
+            f'Packaged {len(self.media_names)} media files ({self.media_bytes / 2**20:.1f} MiB) into {self.path}'
+        )
+
+    def abort(self):
+        """Close and remove the unfinished package"""
+        self._zip.close()
+        self.temp_path.unlink(missing_ok=True)
@@ -0,0 +1,335 @@
+"""
+Build many decks in one process from a manifest.
+
+The manifest is a JSON or YAML file listing the decks. Settings under
+`defaults` apply to every deck, relative paths are relative to the manifest:
+
+    defaults:
+      source_language: Dutch
+      target_language: English
+    decks:
+      - deck_name: Dutch animals
+        words_file: animals.txt
+        output: animals.apkg
+      - deck_name: Dutch food
+        words_file: food.txt
+        output: food.apkg
+        dictionary: dictionary-nl-en
+
+All decks share the HTTP connection pools, the lookup cache, the media store
+and the worker threads, and a word already turned into a card for another
+deck of the same languages and lookup settings is reused instead of being
+looked up again.
+"""
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from anki_language_deck_generator.lookup_cache import LookupCache, default_cache_dir
+from anki_language_deck_generator.media_store import MediaStore
+from anki_language_deck_generator.metrics import Metrics
+from anki_language_deck_generator.rate_limiter import RateLimiter
+from anki_language_deck_generator.words_file import open_words_file
+
+DECK_KEYS = {
+    'deck_name', 'source_language', 'target_language', 'words_file', 'output',
+    'translator', 'dictionary', 'usage_index', 'normalize_words',
+}
+REQUIRED_KEYS = ('source_language', 'target_language', 'words_file', 'output')
+# Keys holding paths, resolved relative to the manifest
+PATH_KEYS = ('words_file', 'output', 'dictionary', 'usage_index')
+
+
+def load_manifest(path):
+    """Return the decks of a manifest as dicts with all defaults applied"""
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        import yaml
+
+        manifest = yaml.safe_load(text)
+    else:
+        manifest = json.loads(text)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('decks'), list):
+        raise ValueError(f"The manifest {path} must have a list of 'decks'")
+
+    defaults = manifest.get('defaults') or {}
+    decks = []
+    for i, entry in enumerate(manifest['decks']):
+        deck = {**defaults, **entry}
+        unknown = set(deck) - DECK_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys of deck {i + 1} in {path}: {', '.join(sorted(unknown))}")
+        missing = [key for key in REQUIRED_KEYS if not deck.get(key)]
+        if missing:
+            raise ValueError(f"Deck {i + 1} in {path} has no {', '.join(missing)}")
+        for key in PATH_KEYS:
+            if deck.get(key):
+                deck[key] = str(path.parent / deck[key])
+        deck.setdefault('deck_name', Path(deck['output']).stem)
+        if not deck.get('translator'):
+            deck['translator'] = 'dictionary+glosbe' if deck.get('dictionary') else 'glosbe'
+        decks.append(deck)
+    return decks
+
+
+class SharedNotes:
+    """
+    Notes already built for one language pair and deck settings, reused by the other decks.
+
+    Only the most recently used `max_notes` words are kept, so a long running
+    service does not keep every card it has ever built in memory. Evicted
+    words are still found in the lookup cache and the media store.
+    """
+
+    def __init__(self, max_notes):
+        self.max_notes = max_notes
+        self._notes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._notes)
+
+    def get(self, word):
+        with self._lock:
+            value = self._notes.get(word)
+            if value is not None:
+                self._notes.move_to_end(word)
+            return value
+
+    def setdefault(self, word, value):
+        with self._lock:
+            if word in self._notes:
+                self._notes.move_to_end(word)
+                return self._notes[word]
+            self._notes[word] = value
+            if len(self._notes) > self.max_notes:
+                self._notes.popitem(last=False)
+            return value
+
+
+class BatchBuilder:
+    """Builds decks one after another on shared connection pools, caches, media and threads"""
+    DEFAULT_MAX_SHARED_NOTES = 10_000
+
+    def __init__(self, working_dir, workers=1, cache=None, media_store=None, http_pool=None, metrics=None,
+                 threads=None, max_shared_notes=DEFAULT_MAX_SHARED_NOTES):
+        from anki_language_deck_generator.http_pool import HttpPool
+
+        self.working_dir = Path(working_dir)
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.media_store = media_store or MediaStore(self.working_dir / 'media')
+        self.metrics = metrics or Metrics()
+        self.http_pool = http_pool or HttpPool(
+            pool_size=max(HttpPool.DEFAULT_POOL_SIZE, self.workers), metrics=self.metrics
+        )
+        # More threads than `workers` are needed when decks are built at once
+        self.executor = ThreadPoolExecutor(max_workers=threads or self.workers)
+        # Reused per language pair and dictionary, an offline dictionary is opened once
+        self._translators = {}
+        self._usage_fetchers = {}
+        # Notes already built, per language pair and lookup settings, see `_notes_key`
+        self.max_shared_notes = max_shared_notes
+        self._notes = {}
+        self.decks_built = 0
+        # Decks may be built from several threads, see `service`
+        self._lock = threading.Lock()
+
+    def _translator(self, deck):
+        from anki_language_deck_generator.translators import create_translator
+
+        key = (deck['translator'], deck['source_language'], deck['target_language'], deck.get('dictionary'))
+        with self._lock:
+            if key not in self._translators:
+                self._translators[key] = create_translator(
+                    deck['translator'], deck['source_language'], deck['target_language'],
+                    http_pool=self.http_pool, dictionary_dir=deck.get('dictionary'),
+                )
+            return self._translators[key]
+
+    def _usage_fetcher(self, deck):
+        if not deck.get('usage_index'):
+            return None
+        from anki_language_deck_generator.tatoeba_index import OfflineUsageFetcher
+
+        key = deck['usage_index']
+        with self._lock:
+            if key not in self._usage_fetchers:
+                self._usage_fetchers[key] = OfflineUsageFetcher(
+                    key, deck['source_language'], deck['target_language']
+                )
+            return self._usage_fetchers[key]
+
+    @staticmethod
+    def _notes_key(deck):
+        # Decks only share notes built the same way, the deck settings change the fields
+        return (
+            deck['source_language'], deck['target_language'], deck['translator'], deck.get('dictionary'),
+            deck.get('usage_index'), deck.get('normalize_words', True),
+        )
+
+    def build(self, deck, words=None, workers=None, progress_callback=None):
+        """
+        Build one deck of the manifest and return the words that failed.
+
+        The words are read from the deck's `words_file` unless given.
+        """
+        from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+        from anki_language_deck_generator.word_normalizer import WordNormalizer
+
+        def log_progress(current, total):
+            logging.info(f"{deck['deck_name']}: processed {current} words")
+
+        notes_key = self._notes_key(deck)
+        with self._lock:
+            working_dir = self.working_dir / f'deck-{self.decks_built}'
+            self.decks_built += 1
+            if notes_key not in self._notes:
+                self._notes[notes_key] = SharedNotes(self.max_shared_notes)
+            shared_notes = self._notes[notes_key]
+        generator = AnkiDeckGenerator(
+            deck_name=deck['deck_name'],
+            source_language=deck['source_language'],
+            target_language=deck['target_language'],
+            working_dir=working_dir,
+            progress_callback=progress_callback or log_progress,
+            workers=min(workers or self.workers, self.workers),
+            cache=self.cache,
+            media_store=self.media_store,
+            http_pool=self.http_pool,
+            metrics=self.metrics,
+            usage_fetcher=self._usage_fetcher(deck),
+            translator=self._translator(deck),
+            output_path=deck['output'],
+            shared_notes=shared_notes,
+            executor=self.executor,
+            word_normalizer=WordNormalizer(deck['source_language']) if deck.get('normalize_words', True) else None,
+            retry_passes=1,
+        )
+        try:
+            if words is None:
+                with open_words_file(deck['words_file']) as words:
+                    generator.add_words(words)
+            else:
+                generator.add_words(words)
+            generator.save_deck()
+        finally:
+            # Removes the unfinished package when the build fails
+            generator.close()
+            shutil.rmtree(working_dir, ignore_errors=True)
+        return generator.failed_words
+
+    def close(self):
+        self.executor.shutdown()
+        self.http_pool.close()
+        for translator in self._translators.values():
+            if hasattr(translator, 'close'):
+                translator.close()
+        for usage_fetcher in self._usage_fetchers.values():
+            usage_fetcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='anki-deck-batch',
+        description='Generate many Anki decks listed in a JSON or YAML manifest in one process',
+    )
+    parser.add_argument('manifest', help='JSON or YAML file listing the decks')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of words processed concurrently (default: 1)',
+    )
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=RateLimiter.DEFAULT_RATE,
+        help='Maximum requests per second sent to each host (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--max-retries',
+        type=int,
+        default=5,
+        help='Retries of throttled or failed requests with exponential backoff (default: 5)',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=str(default_cache_dir()),
+        help='Directory of the persistent lookup cache (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--media-dir',
+        default=str(default_cache_dir() / 'media'),
+        help='Directory of the media store reused across runs and decks (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the lookup cache and keep media for this batch only',
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='REPORT_JSON',
+        help='Write stage latencies, request counts, downloaded bytes, retries and cache hit ratios to this file',
+    )
+    args = parser.parse_args()
+    try:
+        decks = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from anki_language_deck_generator.http_pool import HttpPool
+
+    with tempfile.TemporaryDirectory() as working_dir:
+        cache = None
+        media_store = None
+        if not args.no_cache:
+            cache = LookupCache(Path(args.cache_dir) / 'lookups.sqlite')
+            media_store = MediaStore(args.media_dir)
+        metrics = Metrics()
+        http_pool = HttpPool(
+            pool_size=max(HttpPool.DEFAULT_POOL_SIZE, args.workers),
+            rate_limiter=RateLimiter(default_rate=args.rate_limit, max_retries=args.max_retries),
+            metrics=metrics,
+        )
+        builder = BatchBuilder(
+            working_dir,
+            workers=args.workers,
+            cache=cache,
+            media_store=media_store,
+            http_pool=http_pool,
+            metrics=metrics,
+        )
+        failed = {}
+        try:
+            for i, deck in enumerate(decks):
+                logging.info(f"Building the deck '{deck['deck_name']}' ({i + 1} of {len(decks)})...")
+                failed_words = builder.build(deck)
+                if failed_words:
+                    failed[deck['deck_name']] = failed_words
+        finally:
+            builder.close()
+            if cache is not None:
+                cache.close()
+            builder.media_store.close()
+        reused = metrics.caches.get('shared_notes', {}).get('hits', 0)
+        logging.info(f'Built {len(decks)} decks, {reused} cards were reused from other decks')
+        if args.profile:
+            metrics.write_report(args.profile)
+
+    for deck_name, failed_words in failed.items():
+        print(f"\nFailed words of '{deck_name}':")
+        for word in failed_words:
+            print(f'  {word}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,231 @@
 import random
 import logging
+import shutil
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-import genanki
-import anki_language_deck_generator.translators as translators
-from anki_language_deck_generator.google_voice import GoogleVoice
-from anki_language_deck_generator.dutch_wiktionary import DutchWiktionaryWord
-from anki_language_deck_generator.google_image_downloader import ImageDownloader
-from anki_language_deck_generator.tatoeba_usage_fetcher import UsageExampleFetcher
+from anki_language_deck_generator import failures
+from anki_language_deck_generator.apkg_writer import ApkgWriter
+from anki_language_deck_generator.media_store import MediaStore
+from anki_language_deck_generator.metrics import Metrics
+
+# genanki, the providers and their parsers (bs4, gTTS, icrawler, requests) and
+# asyncio are imported where they are first needed, so importing this module
+# stays cheap for the CLI and the addon.
 
 
 class AnkiDeckGenerator:
-    def __init__(self, deck_name, source_language, target_language, working_dir, progress_callback=None):
+    def __init__(
+        self,
+        deck_name,
+        source_language,
+        target_language,
+        working_dir,
+        progress_callback=None,
+        workers=1,
+        cache=None,
+        media_store=None,
+        journal=None,
+        http_pool=None,
+        metrics=None,
+        usage_fetcher=None,
+        translator=None,
+        wiktionary_index=None,
+        output_path=None,
+        image_normalizer=None,
+        voice=None,
+        shared_notes=None,
+        executor=None,
+        word_normalizer=None,
+        not_found_ttl=failures.NOT_FOUND_TTL,
+        retry_passes=0,
+        retry_delay=failures.RETRY_DELAY,
+    ):
         self.deck_name = deck_name
         self.source_language = source_language
         self.target_language = target_language
         self.working_dir = Path(working_dir)
         self.progress_callback = progress_callback
-        self.deck = genanki.Deck(random.randint(1, 2**31 - 1), deck_name)
+        self.workers = max(1, workers)
+        # A thread pool shared with other generators, see `batch`
+        self.executor = executor
+        # Drops duplicate words before they are looked up, see `word_normalizer.WordNormalizer`
+        self.word_normalizer = word_normalizer
+        self.cache = cache
+        # Words the translator does not know are remembered in the cache this long, 0 turns it off
+        self.not_found_ttl = not_found_ttl
+        # Words failing on throttling or network errors are tried again after the run,
+        # waiting `retry_delay` seconds before each pass
+        self.retry_passes = retry_passes
+        self.retry_delay = retry_delay
+        # Downloaded media is kept here and reused by later runs
+        self._owns_media_store = media_store is None
+        self.media_store = media_store or MediaStore(self.working_dir / 'media')
+        # Downscales and re-encodes downloaded images, see `image_normalizer.ImageNormalizer`
+        self.image_normalizer = image_normalizer
+        self.journal = journal
+        # Local Dutch Wiktionary entries, see `wiktionary_index.WiktionaryIndex`
+        self.wiktionary_index = wiktionary_index
+        # Fields and media of the notes built for other decks of the same languages, by word
+        self.shared_notes = shared_notes
+        # Stage timings and counters, see `Metrics.report`
+        self.metrics = metrics or Metrics()
+        deck_id = random.randint(1, 2**31 - 1)
+        model_id = random.randint(1, 2**31 - 1)
+        if journal is not None:
+            # A resumed build keeps the IDs, so the deck updates the one imported before
+            if journal.header is not None:
+                deck_id = journal.header['deck_id']
+                model_id = journal.header['model_id']
+            else:
+                journal.write_header(deck_id, model_id)
+        import genanki
+
+        self.deck = genanki.Deck(deck_id, deck_name)
         self.media = []
-        self.model = self._generate_model()
+        # With the output path known upfront, media is packaged as notes complete
+        self.apkg_writer = ApkgWriter(output_path) if output_path is not None else None
+        self.model = self._generate_model(model_id)
 
         # Track failed words
         self.failed_words = []
+        # A dict with the word, the reason and the error for every failed word, see `failures`
+        self.failures = []
+        # Word -> (reason, error), set where the lookups fail
+        self._failure_reasons = {}
+
+        # Initialize helper classes, all sharing one set of connection pools
+        from anki_language_deck_generator.google_image_downloader import ImageDownloader
+        from anki_language_deck_generator.http_pool import HttpPool
+        from anki_language_deck_generator.tatoeba_usage_fetcher import UsageExampleFetcher
+        from anki_language_deck_generator.translators import glosbe
+
+        self.http_pool = http_pool or HttpPool(
+            pool_size=max(HttpPool.DEFAULT_POOL_SIZE, self.workers), metrics=self.metrics
+        )
+        # E.g. an offline dictionary, see `translators.create_translator`
+        self.translator = translator or glosbe.Translator(
+            self.source_language, self.target_language, http_pool=self.http_pool
+        )
+        # E.g. a local speech synthesizer, see `voice_backend.create_voice_backend`
+        self.reverso_voice = voice
+        if self.reverso_voice is None:
+            from anki_language_deck_generator.google_voice import GoogleVoice
+
+            self.reverso_voice = GoogleVoice(self.source_language, self.working_dir, http_pool=self.http_pool)
+        self.image_downloader = ImageDownloader(self.working_dir, http_pool=self.http_pool)
+        # E.g. an `OfflineUsageFetcher` answering from a local Tatoeba index
+        self.usage_fetcher = usage_fetcher or UsageExampleFetcher(
+            self.source_language, self.target_language, http_pool=self.http_pool
+        )
+
+    def _cached(self, provider, word, lookup, offline=False):
+        # Offline indexes answer faster than the cache and would only fill it with copies
+        if self.cache is None or offline:
+            return lookup(word)
+        languages = f'{self.source_language}-{self.target_language}'
+        value = self.cache.get(provider, languages, word)
+        self.metrics.count_cache(provider, value is not None)
+        if value is None:
+            value = lookup(word)
+            self.cache.set(provider, languages, word, value)
+        return value
+
+    @staticmethod
+    async def _in_thread(function, *args):
+        import asyncio
+
+        # SQLite, file and parsing work would stall every word on the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def _cached_async(self, provider, word, lookup, offline=False):
+        if self.cache is None or offline:
+            return await lookup(word)
+        languages = f'{self.source_language}-{self.target_language}'
+        value = await self._in_thread(self.cache.get, provider, languages, word)
+        self.metrics.count_cache(provider, value is not None)
+        if value is None:
+            value = await lookup(word)
+            await self._in_thread(self.cache.set, provider, languages, word, value)
+        return value
 
-        # Initialize helper classes
-        self.translator = translators.glosbe.Translator(self.source_language, self.target_language)
-        self.reverso_voice = GoogleVoice(self.source_language, self.working_dir)
-        self.image_downloader = ImageDownloader(self.working_dir)
-        self.usage_fetcher = UsageExampleFetcher(self.source_language, self.target_language)
+    def _store_key(self, provider, image):
+        # Normalized images are stored apart from the originals and other normalizations
+        if image and self.image_normalizer is not None:
+            return f'{provider}:{self.image_normalizer.variant}'
+        return provider
 
-    def _make_word_dir(self, word):
-        (self.working_dir / word).mkdir(parents=True, exist_ok=True)
+    def _stored(self, provider, word, download, image=False):
+        key = self._store_key(provider, image)
+        path = self.media_store.get(key, self.source_language, word)
+        self.metrics.count_cache(f'media:{provider}', path is not None)
+        if path is None:
+            file_path = download(word)
+            if file_path is None:
+                return None
+            if image and self.image_normalizer is not None:
+                with self.metrics.stage('normalize_image', word):
+                    file_path = self.image_normalizer.normalize(file_path)
+            path = self.media_store.put(key, self.source_language, word, file_path)
+        return path
+
+    async def _stored_async(self, provider, word, download, image=False):
+        key = self._store_key(provider, image)
+        path = await self._in_thread(self.media_store.get, key, self.source_language, word)
+        self.metrics.count_cache(f'media:{provider}', path is not None)
+        if path is None:
+            file_path = await download(word)
+            if file_path is None:
+                return None
+            if image and self.image_normalizer is not None:
+                file_path = await self._timed(
+                    'normalize_image', word, self.image_normalizer.normalize_async(file_path)
+                )
+            path = await self._in_thread(self.media_store.put, key, self.source_language, word, file_path)
+        return path
+
+    def _lookup_wiktionary_locally(self, word):
+        from anki_language_deck_generator.dutch_wiktionary import CachedDutchWiktionaryWord
+
+        fields = None
+        if self.wiktionary_index is not None:
+            fields = self.wiktionary_index.get_fields(word)
+            self.metrics.count_cache('nl.wiktionary-index', fields is not None)
+        if fields is None and self.cache is not None:
+            fields = self.cache.get('nl.wiktionary', self.source_language, word)
+            self.metrics.count_cache('nl.wiktionary', fields is not None)
+        if fields is None:
+            return None
+        return CachedDutchWiktionaryWord(word, self.working_dir, fields, http_pool=self.http_pool)
+
+    def _lookup_wiktionary(self, word):
+        from anki_language_deck_generator.dutch_wiktionary import DutchWiktionaryWord
+
+        wiktionary = self._lookup_wiktionary_locally(word)
+        if wiktionary is not None:
+            return wiktionary
+        # Words missing in the local index and the cache are looked up online
+        wiktionary = DutchWiktionaryWord(word, self.working_dir, http_pool=self.http_pool)
+        if self.cache is not None:
+            self.cache.set('nl.wiktionary', self.source_language, word, wiktionary.get_fields())
+        return wiktionary
+
+    async def _lookup_wiktionary_async(self, word, client):
+        from anki_language_deck_generator.dutch_wiktionary import DutchWiktionaryWord
+
+        wiktionary = await self._in_thread(self._lookup_wiktionary_locally, word)
+        if wiktionary is not None:
+            return wiktionary
+        wiktionary = await DutchWiktionaryWord.fetch_async(
+            word, self.working_dir, client, http_pool=self.http_pool
+        )
+        if self.cache is not None:
+            await self._in_thread(
+                self.cache.set, 'nl.wiktionary', self.source_language, word, wiktionary.get_fields()
+            )
+        return wiktionary
 
     def _load_css(self):
         css_path = Path(__file__).parent / 'templates' / 'card_styles.css'
@@ -46,9 +241,11 @@ class AnkiDeckGenerator:
                 .replace('TARGET_LANGUAGE', self.target_language)
             )
 
-    def _generate_model(self):
+    def _generate_model(self, model_id):
+        import genanki
+
         return genanki.Model(
-            random.randint(1, 2**31 - 1),
+            model_id,
             f'Generated Model {self.source_language} to {self.target_language}',
             fields=[
                 {'name': self.source_language},
@@ -75,11 +272,18 @@ class AnkiDeckGenerator:
             css=self._load_css(),
         )
 
-    def _make_note(self, word):
-        self._make_word_dir(word)
+    async def _timed(self, stage, word, lookup):
+        with self.metrics.stage(stage, word):
+            return await lookup
 
-        translation = self.translator.translate(word)
-        usage = self.usage_fetcher.fetch_usage(word)
+    def _make_note(self, word):
+        with self.metrics.stage('translation', word):
+            translation = self._translate(word)
+        with self.metrics.stage('usage', word):
+            usage = self._cached(
+                self.usage_fetcher.NAME, word, self.usage_fetcher.fetch_usage,
+                offline=getattr(self.usage_fetcher, 'OFFLINE', False),
+            )
 
         sound_file = None
         image_file = None
@@ -90,20 +294,77 @@ class AnkiDeckGenerator:
         
         # TODO: fix it, doesn't work now
         if self.source_language == 'Dutch':
-            wiktionary = DutchWiktionaryWord(word, self.working_dir)
+            with self.metrics.stage('wiktionary', word):
+                wiktionary = self._lookup_wiktionary(word)
             # the quality is so bad, so better always use gTTS
             # sound_file = wiktionary.try_download_sound()
             article = wiktionary.try_get_article()
-            image_file = wiktionary.try_download_image()
+            with self.metrics.stage('image', word):
+                image_file = self._stored(
+                    'nl.wiktionary', word, lambda w: wiktionary.try_download_image(), image=True
+                )
             transcription = wiktionary.try_get_transcription()
             part_of_speech = wiktionary.try_get_part_of_speech()
             plural = wiktionary.try_get_plural_form()
 
         if sound_file is None:
-            sound_file = self.reverso_voice.download_sound(word)
+            with self.metrics.stage('sound', word):
+                sound_file = self._stored(self.reverso_voice.store_name, word, self.reverso_voice.download_sound)
 
         if image_file is None:
-            image_file = self.image_downloader.download_image(word)
+            with self.metrics.stage('image', word):
+                image_file = self._stored('google-images', word, self.image_downloader.download_image, image=True)
+
+        return self._build_note(
+            word, translation, usage, sound_file, image_file, transcription, part_of_speech, plural, article
+        )
+
+    async def _make_note_async(self, word, client):
+        import asyncio
+
+        lookups = [
+            self._timed('translation', word, self._translate_async(word, client)),
+            self._timed('usage', word, self._cached_async(
+                self.usage_fetcher.NAME, word, lambda w: self.usage_fetcher.fetch_usage_async(w, client),
+                offline=getattr(self.usage_fetcher, 'OFFLINE', False),
+            )),
+            self._timed('sound', word, self._stored_async(
+                self.reverso_voice.store_name, word, lambda w: self.reverso_voice.download_sound_async(w, client)
+            )),
+        ]
+        if self.source_language == 'Dutch':
+            lookups.append(self._timed('wiktionary', word, self._lookup_wiktionary_async(word, client)))
+        translation, usage, sound_file, *wiktionary = await asyncio.gather(*lookups)
+
+        image_file = None
+        transcription = None
+        part_of_speech = None
+        plural = None
+        article = None
+
+        if wiktionary:
+            wiktionary = wiktionary[0]
+            article = wiktionary.try_get_article()
+            image_file = await self._timed('image', word, self._stored_async(
+                'nl.wiktionary', word, lambda w: wiktionary.try_download_image_async(client), image=True
+            ))
+            transcription = wiktionary.try_get_transcription()
+            part_of_speech = wiktionary.try_get_part_of_speech()
+            plural = wiktionary.try_get_plural_form()
+
+        if image_file is None:
+            image_file = await self._timed('image', word, self._stored_async(
+                'google-images', word, lambda w: self.image_downloader.download_image_async(w, client), image=True
+            ))
+
+        return self._build_note(
+            word, translation, usage, sound_file, image_file, transcription, part_of_speech, plural, article
+        )
+
+    def _build_note(
+        self, word, translation, usage, sound_file, image_file, transcription, part_of_speech, plural, article
+    ):
+        import genanki
 
         note = genanki.Note(
             model=self.model, fields=[
@@ -124,31 +385,341 @@ class AnkiDeckGenerator:
             media_files.append(image_file)
         return note, media_files
 
-    def add_word(self, word):
+    def _restore_note(self, word):
+        import genanki
+
+        if self.journal is None:
+            return None
+        done = self.journal.get_done(word)
+        if done is None:
+            return None
+        fields, media_files, guid = done
+        logging.info(f"The card for the word '{word}' is restored from the journal")
+        return genanki.Note(model=self.model, fields=fields, guid=guid), media_files
+
+    def _shared_note(self, word):
+        import genanki
+
+        if self.shared_notes is None:
+            return None
+        shared = self.shared_notes.get(word)
+        self.metrics.count_cache('shared_notes', shared is not None)
+        if shared is None:
+            return None
+        fields, media_files = shared
+        logging.info(f"The card for the word '{word}' is reused from another deck")
+        return genanki.Note(model=self.model, fields=fields), media_files
+
+    def _lookup_translation(self, translator, word):
+        return self._cached(
+            translator.NAME, word, translator.translate, offline=getattr(translator, 'OFFLINE', False)
+        )
+
+    def _translate(self, word):
+        from anki_language_deck_generator.translators.fallback import FallbackTranslator
+
+        try:
+            # Every translator of a fallback is cached on its own, so the dictionary answers are not
+            if isinstance(self.translator, FallbackTranslator):
+                return self.translator.translate(word, lookup=self._lookup_translation)
+            return self._lookup_translation(self.translator, word)
+        except Exception as e:
+            # Only the translator tells that a word does not exist, see `_record_failure`
+            e.translator = self.translator.NAME
+            raise
+
+    async def _lookup_translation_async(self, translator, word, client):
+        return await self._cached_async(
+            translator.NAME, word, lambda w: translator.translate_async(w, client),
+            offline=getattr(translator, 'OFFLINE', False),
+        )
+
+    async def _translate_async(self, word, client):
+        from anki_language_deck_generator.translators.fallback import FallbackTranslator
+
+        try:
+            if isinstance(self.translator, FallbackTranslator):
+                return await self.translator.translate_async(
+                    word, client, lookup=lambda translator, w: self._lookup_translation_async(translator, w, client)
+                )
+            return await self._lookup_translation_async(self.translator, word, client)
+        except Exception as e:
+            e.translator = self.translator.NAME
+            raise
+
+    def _not_found_key(self):
+        # A word missing in one translator may be found by another one
+        return f'not-found:{self.translator.NAME}', f'{self.source_language}-{self.target_language}'
+
+    def _known_not_found(self, word):
+        """Return True if an earlier run found out that the word does not exist"""
+        if self.cache is None or not self.not_found_ttl:
+            return False
+        provider, languages = self._not_found_key()
+        error = self.cache.get(provider, languages, word, ttl=self.not_found_ttl)
+        self.metrics.count_cache('not_found', error is not None)
+        if error is None:
+            return False
+        logging.info(f"The word '{word}' was not found by an earlier run, skipping it")
+        self._failure_reasons[word] = (failures.NOT_FOUND, error)
+        return True
+
+    def _record_failure(self, word, error):
+        logging.error(f"Error creating a card for the word '{word}': {error}")
+        reason = failures.classify_failure(error)
+        self._failure_reasons[word] = (reason, str(error))
+        # A missing image, sound or Wiktionary page says nothing about the word
+        translator_failed = getattr(error, 'translator', None) == self.translator.NAME
+        if reason == failures.NOT_FOUND and translator_failed and self.cache is not None and self.not_found_ttl:
+            provider, languages = self._not_found_key()
+            self.cache.set(provider, languages, word, str(error))
+
+    def _try_make_note(self, word):
+        restored = self._restore_note(word) or self._shared_note(word)
+        if restored is not None:
+            return restored
+        if self._known_not_found(word):
+            return None
+        logging.info(f"Creating a card for the word '{word}'...")
+        try:
+            with self.metrics.stage('word', word):
+                return self._make_note(word)
+        except Exception as e:
+            self._record_failure(word, e)
+            return None
+
+    async def _try_make_note_async(self, word, client):
+        restored = await self._in_thread(lambda: self._restore_note(word) or self._shared_note(word))
+        if restored is not None:
+            return restored
+        if await self._in_thread(self._known_not_found, word):
+            return None
         logging.info(f"Creating a card for the word '{word}'...")
         try:
-            note, media_files = self._make_note(word)
-            self.deck.add_note(note)
-            self.media.extend(media_files)
-            logging.info(f"The card for the word '{word}' has been created!")
+            with self.metrics.stage('word', word):
+                return await self._make_note_async(word, client)
         except Exception as e:
-            logging.error(f"Error creating a card for the word '{word}': {e}")
+            await self._in_thread(self._record_failure, word, e)
+            return None
+
+    def _add_result(self, word, result):
+        self.metrics.count_word(failed=result is None)
+        if result is None:
+            reason, error = self._failure_reasons.get(word, (None, None))
             self.failed_words.append(word)
+            self.failures.append({'word': word, 'reason': reason, 'error': error})
+            if self.journal is not None:
+                self.journal.record_failed(word, reason, error)
+            return
+        note, media_files = result
+        self.deck.add_note(note)
+        self.media.extend(media_files)
+        if self.apkg_writer is not None:
+            with self.metrics.stage('package_media', word):
+                for media_file in media_files:
+                    self.apkg_writer.add_media(media_file)
+        if self.shared_notes is not None:
+            self.shared_notes.setdefault(word, (note.fields, media_files))
+        if self.journal is not None and self.journal.get_done(word) is None:
+            self.journal.record_done(word, note.fields, media_files, note.guid)
+        logging.info(f"The card for the word '{word}' has been created!")
 
-    def add_words(self, words, skip_empty=True):
-        total_words = len(words)
-        for i, word in enumerate(words):
+    def add_word(self, word):
+        self._add_result(word, self._try_make_note(word))
+
+    def add_finished_word(self, word, finished, failure=None):
+        """
+        Add a word built elsewhere, e.g. by a shard: (fields, media files, GUID)
+        or None if it failed, with the (reason, error) of the failure if known
+        """
+        import genanki
+
+        if finished is None:
+            if failure is not None:
+                self._failure_reasons[word] = failure
+            self._add_result(word, None)
+            return
+        fields, media_files, guid = finished
+        self._add_result(word, (genanki.Note(model=self.model, fields=fields, guid=guid), media_files))
+
+    def _iter_words(self, words, skip_empty):
+        # Skipped empty lines and duplicates are yielded as None, so callers can count them as done
+        for word in words:
             word = word.strip()
             if word == '':
                 if skip_empty:
+                    yield None
                     continue
                 else:
                     raise ValueError('Empty word found in the list')
+            if self.word_normalizer is not None:
+                word = self.word_normalizer.deduplicate(word)
+                if word is None:
+                    # A duplicate is done as soon as the same word is
+                    yield None
+                    continue
+            yield word
+
+    @staticmethod
+    def _count_words(words, total_words):
+        if total_words is None and hasattr(words, '__len__'):
+            return len(words)
+        return total_words
+
+    def add_words(self, words, skip_empty=True, total_words=None):
+        """
+        Add words from any iterable, e.g. a list or lines streamed from a file.
+
+        The progress callback gets `total_words` as the total, or the length of `words`
+        when it has one. Otherwise the total is None. Words failing on throttling or
+        network errors are tried again afterwards, see `retry_passes`.
+        """
+        total_words = self._count_words(words, total_words)
+        self._add_words(self._iter_words(words, skip_empty), total_words, self.progress_callback)
+        # Retried words do not count as progress again
+        for retries in self._retry_passes():
+            time.sleep(self.retry_delay)
+            self._add_words(iter(retries), None, None)
+
+    def _add_words(self, words, total_words, progress_callback):
+        if self.workers > 1:
+            self._add_words_concurrently(words, total_words, progress_callback)
+            return
+        for i, word in enumerate(words):
+            if word is None:
+                continue
             self.add_word(word)
-            if self.progress_callback:
-                self.progress_callback(i + 1, total_words)
+            if progress_callback:
+                progress_callback(i + 1, total_words)
+
+    def _add_words_concurrently(self, words, total_words, progress_callback):
+        # Notes are built in the pool but added to the deck in input order,
+        # so the deck looks the same as after a sequential run. Progress is
+        # reported from this thread as soon as any word finishes.
+        completed = 0
+        pending = deque()
+        in_flight = set()
+        own_executor = ThreadPoolExecutor(max_workers=self.workers) if self.executor is None else None
+        with own_executor or nullcontext(self.executor) as executor:
+            while True:
+                # Keep a bounded window of words. Finished notes wait behind a slow
+                # head word, so no more words are taken until it is added.
+                window = self.workers * 2
+                if len(pending) < window:
+                    for word in words:
+                        if word is None:
+                            completed += 1
+                            continue
+                        future = executor.submit(self._try_make_note, word)
+                        pending.append((word, future))
+                        in_flight.add(future)
+                        if len(pending) >= window:
+                            break
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for _ in done:
+                    completed += 1
+                    if progress_callback:
+                        progress_callback(completed, total_words)
+                while pending and pending[0][1].done():
+                    word, future = pending.popleft()
+                    self._add_result(word, future.result())
+
+    def _take_retries(self):
+        """Take the words that failed on throttling or network errors out of the failed ones"""
+        retries = [failure['word'] for failure in self.failures if failure['reason'] in failures.TRANSIENT_FAILURES]
+        if retries:
+            self.failures = [
+                failure for failure in self.failures if failure['reason'] not in failures.TRANSIENT_FAILURES
+            ]
+            retried = set(retries)
+            self.failed_words = [word for word in self.failed_words if word not in retried]
+            self.metrics.uncount_failed_words(len(retries))
+        return retries
+
+    def _retry_passes(self):
+        """Yield the words to try again in every retry pass, until none of them fails on a transient error"""
+        for retry_pass in range(self.retry_passes):
+            retries = self._take_retries()
+            if not retries:
+                return
+            logging.info(
+                f'Retrying {len(retries)} words that failed on throttling or network errors '
+                f'in {self.retry_delay:g}s (pass {retry_pass + 1} of {self.retry_passes})'
+            )
+            yield retries
+
+    async def add_words_async(self, words, skip_empty=True, concurrency=100, total_words=None):
+        """Add words using asyncio, keeping up to `concurrency` words in flight over one pooled HTTP client"""
+        import asyncio
+
+        total_words = self._count_words(words, total_words)
+        async with self.http_pool.create_async_client(max_connections=concurrency) as client:
+            await self._add_words_async(
+                self._iter_words(words, skip_empty), client, concurrency, total_words, self.progress_callback
+            )
+            for retries in self._retry_passes():
+                await asyncio.sleep(self.retry_delay)
+                await self._add_words_async(iter(retries), client, concurrency, None, None)
+
+    async def _add_words_async(self, words, client, concurrency, total_words, progress_callback):
+        import asyncio
+
+        completed = 0
+        pending = deque()
+        in_flight = set()
+        while True:
+            # Like `_add_words_concurrently`, finished notes behind a slow head word count against the window
+            if len(in_flight) < concurrency and len(pending) < concurrency * 2:
+                for word in words:
+                    if word is None:
+                        completed += 1
+                        continue
+                    task = asyncio.ensure_future(self._try_make_note_async(word, client))
+                    pending.append((word, task))
+                    in_flight.add(task)
+                    if len(in_flight) >= concurrency or len(pending) >= concurrency * 2:
+                        break
+            if not in_flight:
+                break
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for _ in done:
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, total_words)
+            while pending and pending[0][1].done():
+                word, task = pending.popleft()
+                # Packaging media writes to the deck file, one word at a time and in input order
+                await self._in_thread(self._add_result, word, task.result())
+
+    def save_deck(self, output_path=None):
+        """Write the deck, by default to the `output_path` given to the constructor"""
+        with self.metrics.stage('save_deck'):
+            if self.apkg_writer is None:
+                self.apkg_writer = ApkgWriter(output_path)
+                for media_file in self.media:
+                    self.apkg_writer.add_media(media_file)
+            writer = self.apkg_writer
+            try:
+                writer.finish(self.deck)
+            except BaseException:
+                writer.abort()
+                raise
+            finally:
+                self.apkg_writer = None
+            if output_path is not None and Path(output_path).resolve() != writer.path.resolve():
+                shutil.move(writer.path, output_path)
 
-    def save_deck(self, output_path):
-        package = genanki.Package(self.deck)
-        package.media_files = self.media
-        package.write_to_file(output_path)
+    def close(self):
+        """
+        Remove the unfinished package if the deck was not saved, e.g. after a failed build,
+        and close the media store unless it was given to the constructor.
+        """
+        if self.apkg_writer is not None:
+            self.apkg_writer.abort()
+            self.apkg_writer = None
+        if self._owns_media_store:
+            # Its database would keep the working directory from being removed on Windows
+            self.media_store.close()
+            self._owns_media_store = False
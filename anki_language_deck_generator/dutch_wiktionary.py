@@ -1,9 +1,31 @@
-from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+import os
+import tempfile
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlsplit
+import lxml.html
+from lxml import etree
+from anki_language_deck_generator import failures
+from anki_language_deck_generator.http_pool import HttpPool
 
+PARTS_OF_SPEECH = {
+    'Zelfstandig_naamwoord',
+    'Werkwoord',
+    'Bijvoeglijk_naamwoord',
+    'Bijwoord',
+    'Tussenwerpsel',
+    'Voornaamwoord',
+    'Voorzetsel'
+}
+FIELDS = ['article', 'transcription', 'part_of_speech', 'plural', 'image_url', 'sound_url']
 
-class WordNotFoundError(Exception):
+
+async def _in_thread(function, *args):
+    import asyncio
+
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+class WordNotFoundError(failures.WordNotFoundError):
     pass
 
 
@@ -11,177 +33,265 @@ class NoNederlandsSectionError(Exception):
     pass
 
 
+def extract_fields(html):
+    """
+    Extract all card fields from the HTML of a page in a single pass.
+
+    The page is parsed with lxml and walked once in document order; sections
+    that need a closer look (the genus paragraph, the infobox) are only
+    searched within their own subtree.
+    """
+    fields = dict.fromkeys(FIELDS)
+    if not html.strip():
+        return fields
+    # Images with captions are preferred to other content images
+    thumb_image_url = None
+    content_image_url = None
+    # For every open thumbinner, whether its first image was seen already
+    thumbinners = []
+    # The genus markers are in the first paragraph after the first noun header
+    noun_header = 'not seen'
+
+    for event, element in etree.iterwalk(lxml.html.fromstring(html), events=('start', 'end')):
+        tag = element.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions
+            continue
+        classes = element.get('class', '').split()
+        if event == 'end':
+            if tag == 'div' and 'thumbinner' in classes:
+                thumbinners.pop()
+            continue
+
+        if tag == 'a':
+            href = element.get('href', '')
+            if (
+                fields['sound_url'] is None and 'internal' in classes and
+                href.startswith('//upload.wikimedia.org') and element.get('title', '').endswith('.ogg')
+            ):
+                fields['sound_url'] = 'https:' + href
+        elif tag == 'span':
+            if fields['transcription'] is None and 'IPAtekst' in classes:
+                fields['transcription'] = element.text_content()
+        elif tag == 'h4':
+            header_id = element.get('id')
+            if fields['part_of_speech'] is None and header_id in PARTS_OF_SPEECH:
+                fields['part_of_speech'] = ' '.join(header_id.lower().split('_'))
+            if header_id == 'Zelfstandig_naamwoord' and noun_header == 'not seen':
+                noun_header = 'seen'
+        elif tag == 'p':
+            if noun_header == 'seen':
+                fields['article'] = _parse_article(element)
+                noun_header = 'done'
+        elif tag == 'table':
+            if fields['plural'] is None and 'infobox' in classes:
+                fields['plural'] = _parse_plural_form(element)
+        elif tag == 'div':
+            if 'thumbinner' in classes:
+                thumbinners.append(False)
+        elif tag == 'img' and 'mw-file-element' in classes:
+            # Only the first image of a thumbinner counts as its image
+            if thumbinners and not thumbinners[-1]:
+                thumbinners[-1] = True
+                if thumb_image_url is None:
+                    thumb_image_url = _get_image_url(element)
+            if content_image_url is None:
+                content_image_url = _get_image_url(element, skip_icons=True)
+
+    fields['image_url'] = thumb_image_url or content_image_url
+    return fields
+
+
+def _get_image_url(img, skip_icons=False):
+    src = img.get('src')
+    if src is None or int(img.get('width', '0')) < 50:
+        return None
+    if not src.startswith('//upload.wikimedia.org'):
+        return None
+    if skip_icons and src.endswith(('Icon.svg.png', 'Symbol.svg.png')):
+        return None
+    return 'https:' + src
+
+
+def _parse_article(paragraph):
+    genus_markers = []
+    for a in paragraph.iter('a'):
+        if a.get('title') != 'WikiWoordenboek:Genus':
+            continue
+        span = next(a.iter('span'), None)
+        if span is not None:
+            genus_markers.append(span.text_content().strip())
+    return article_from_genus(genus_markers)
+
+
+def article_from_genus(genus_markers):
+    """Determine if it's 'de' or 'het' from the genus markers: 'm', 'v', 'o' or 'g'"""
+    if 'o' in genus_markers:
+        if any(m in ['m', 'v', 'g'] for m in genus_markers):
+            return 'de/het'
+        return 'het'
+    if any(m in ['m', 'v', 'g'] for m in genus_markers):
+        return 'de'
+    return None
+
+
+def _parse_plural_form(table):
+    rows = list(table.iter('tr'))
+    # Find the column of the header with 'meervoud'
+    meervoud_col = None
+    for tr in rows:
+        for i, th in enumerate(tr.iter('th')):
+            if any(a.get('title') == 'meervoud' for a in th.iter('a')):
+                meervoud_col = i
+                break
+        if meervoud_col is not None:
+            break
+    if meervoud_col is None:
+        return None
+    # Find the row with 'naamwoord'
+    for row in rows:
+        cells = list(row.iter('td'))
+        heading = next((td for td in cells if 'infoboxrijhoofding' in td.get('class', '').split()), None)
+        if heading is not None and 'naamwoord' in heading.text_content().lower():
+            if len(cells) > meervoud_col:
+                return ''.join(text.strip() for text in cells[meervoud_col].itertext())
+    return None
+
+
 class DutchWiktionaryWord:
-    def __init__(self, word, working_dir):
+    API_URL = 'https://nl.wiktionary.org/w/api.php'
+
+    def __init__(self, word, working_dir, data=None, http_pool=None):
         self.working_dir = Path(working_dir)
         self.word = word
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                'User-Agent': (
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                    '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-                )
-            }
+        self.http_pool = http_pool or HttpPool()
+        if data is None:
+            response = self.http_pool.get(self._make_url(word))
+            data = self._check_response(word, response)
+
+        # Store translations
+        self.translations = data['parse'].get('langlinks')
+        if self.translations is None:
+            raise WordNotFoundError(f"No translations found for word '{word}'")
+
+        # Extract everything at once, so the parsed page is not kept alive
+        self.fields = extract_fields(data['parse']['text'])
+
+    @classmethod
+    async def fetch_async(cls, word, working_dir, client, http_pool=None):
+        """Look up the word with a shared async HTTP client"""
+        import asyncio
+
+        response = await client.get(cls._make_url(word))
+        data = cls._check_response(word, response)
+        # Parsing the page would block the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: cls(word, working_dir, data=data, http_pool=http_pool)
         )
-        response = self.session.get(
-            f'https://nl.wiktionary.org/w/api.php'
+
+    @classmethod
+    def _make_url(cls, word):
+        return (
+            f'{cls.API_URL}'
             f'?action=parse&format=json&prop=text%7Clanglinks'
             f'&formatversion=2&utf8=1&page={word}'
         )
+
+    @staticmethod
+    def _check_response(word, response):
         if response.status_code != 200:
-            raise WordNotFoundError(f"HTTP error {response.status_code} when looking up word '{word}'")
+            raise failures.HttpStatusError(
+                f"HTTP error {response.status_code} when looking up word '{word}'", response.status_code
+            )
 
         data = response.json()
         if 'error' in data:
             raise WordNotFoundError(f"Word '{word}' not found in Wiktionary")
+        return data
 
-        # Store translations
-        self.translations = data['parse'].get('langlinks')
-        if self.translations is None:
-            raise WordNotFoundError(f"No translations found for word '{word}'")
-
-        # Get Dutch content
-        self.soup = BeautifulSoup(data['parse']['text'], 'html.parser')
+    def get_fields(self):
+        """Extract all fields used on cards in a form that can be cached"""
+        return self.fields
 
     def try_get_sound_file_url(self):
         """Extract sound file URL from the Uitspraak section"""
-        for a in self.soup.find_all("a", class_="internal"):
-            href = a.get('href', '')
-            title = a.get('title', '')
-            if href.startswith('//upload.wikimedia.org') and title.endswith('.ogg'):
-                return "https:" + href
-        return None
+        return self.fields['sound_url']
 
     def try_get_image_url(self):
         """Extract the first content image URL"""
-        # First try images in thumbinner (images with captions)
-        for figure in self.soup.find_all("div", class_="thumbinner"):
-            img = figure.find("img", class_="mw-file-element")
-            if img and img.has_attr('src'):
-                width = int(img.get('width', '0'))
-                if width < 50:
-                    continue
-                src = img['src']
-                if src.startswith('//upload.wikimedia.org'):
-                    return "https:" + src
-
-        # Then try regular content images
-        for img in self.soup.find_all("img", class_="mw-file-element"):
-            if img.has_attr('src'):
-                width = int(img.get('width', '0'))
-                if width < 50:
-                    continue
-                src = img['src']
-                if (
-                    src.startswith('//upload.wikimedia.org') and
-                    not src.endswith(('Icon.svg.png', 'Symbol.svg.png'))
-                ):
-                    return "https:" + src
-        return None
+        return self.fields['image_url']
 
     def try_get_transcription(self):
         """Extract IPA transcription"""
-        span = self.soup.find("span", class_="IPAtekst")
-        if span:
-            return span.get_text()
-        return None
+        return self.fields['transcription']
 
     def try_get_article(self):
         """Determine if it's 'de' or 'het' based on genus markers"""
-        # Find Zelfstandig naamwoord header and get next paragraph
-        zn_header = self.soup.find("h4", id="Zelfstandig_naamwoord")
-        if zn_header:
-            # Find the next paragraph after the header
-            p = zn_header.find_next("p")
-            if p:
-                genus_markers = []
-                for a in p.find_all("a", title="WikiWoordenboek:Genus"):
-                    span = a.find("span")
-                    if span and span.get_text():
-                        marker = span.get_text().strip()
-                        if marker in ['m', 'v', 'o', 'g']:
-                            genus_markers.append(marker)
-                if 'o' in genus_markers:
-                    if any(m in ['m', 'v', 'g'] for m in genus_markers):
-                        return "de/het"
-                    return "het"
-                if any(m in ['m', 'v', 'g'] for m in genus_markers):
-                    return "de"
-        return None
+        return self.fields['article']
 
     def try_get_part_of_speech(self):
         """Get the part of speech (woordsoort) from the header"""
-        pos_set = {
-            'Zelfstandig_naamwoord',
-            'Werkwoord',
-            'Bijvoeglijk_naamwoord',
-            'Bijwoord',
-            'Tussenwerpsel',
-            'Voornaamwoord',
-            'Voorzetsel'
-        }
-        for h4 in self.soup.find_all("h4"):
-            pos_id = h4.get('id')
-            if pos_id in pos_set:
-                return ' '.join(pos_id.lower().split('_'))
-        return None
+        return self.fields['part_of_speech']
 
     def try_get_plural_form(self):
         """Get plural form from the infobox table"""
-        for table in self.soup.find_all("table", class_="infobox"):
-            # Find the header row with 'meervoud'
-            header_row = None
-            for tr in table.find_all("tr"):
-                headers = tr.find_all("th")
-                for i, th in enumerate(headers):
-                    a = th.find("a", title="meervoud")
-                    if a:
-                        header_row = tr
-                        meervoud_col = i
-                        break
-                if header_row:
-                    break
-            if header_row:
-                # Find the row with 'naamwoord'
-                for row in table.find_all("tr"):
-                    td = row.find("td", class_="infoboxrijhoofding")
-                    if td and 'naamwoord' in td.get_text().lower():
-                        cells = row.find_all("td")
-                        if len(cells) > meervoud_col:
-                            return cells[meervoud_col].get_text(strip=True)
-        return None
+        return self.fields['plural']
+
+    def _make_file_path(self, url):
+        # Every download gets its own staging file, words may contain path separators
+        # and the media store names the file by its content anyway
+        extension = PurePosixPath(urlsplit(url).path).suffix
+        self.working_dir.mkdir(parents=True, exist_ok=True)
+        fd, file_path = tempfile.mkstemp(dir=self.working_dir, suffix=extension)
+        os.close(fd)
+        return Path(file_path)
+
+    def _save_response(self, response, url, kind):
+        if response.status_code != 200:
+            raise failures.HttpStatusError(
+                f"HTTP error {response.status_code} when downloading {kind} file from '{url}'", response.status_code
+            )
+        file_path = self._make_file_path(url)
+        with file_path.open('wb') as f:
+            f.write(response.content)
+        return file_path
 
     def try_download_sound(self):
         """Download the sound file and return the path"""
         sound_url = self.try_get_sound_file_url()
         if sound_url:
-            extension = sound_url.rsplit('.', 1)[-1]
-            sound_file_path = self.working_dir / self.word / f'{self.word}.{extension}'
-            sound_file_path.parent.mkdir(parents=True, exist_ok=True)
-            response = self.session.get(sound_url)
-            if response.status_code != 200:
-                raise WordNotFoundError(
-                    f"HTTP error {response.status_code} when downloading sound file from '{sound_url}'"
-                )
-            with sound_file_path.open('wb') as f:
-                f.write(response.content)
-            return sound_file_path
+            return self._save_response(self.http_pool.get(sound_url), sound_url, 'sound')
         return None
 
     def try_download_image(self):
         """Download the image file and return the path"""
         image_url = self.try_get_image_url()
         if image_url:
-            extension = image_url.rsplit('.', 1)[-1]
-            image_file_path = self.working_dir / self.word / f'{self.word}.{extension}'
-            image_file_path.parent.mkdir(parents=True, exist_ok=True)
-            response = self.session.get(image_url)
-            if response.status_code != 200:
-                raise WordNotFoundError(
-                    f"HTTP error {response.status_code} when downloading image file from '{image_url}'"
-                )
-            with image_file_path.open('wb') as f:
-                f.write(response.content)
-            return image_file_path
+            return self._save_response(self.http_pool.get(image_url), image_url, 'image')
+        return None
+
+    async def try_download_sound_async(self, client):
+        """Download the sound file with a shared async HTTP client and return the path"""
+        sound_url = self.try_get_sound_file_url()
+        if sound_url:
+            response = await client.get(sound_url)
+            return await _in_thread(self._save_response, response, sound_url, 'sound')
         return None
+
+    async def try_download_image_async(self, client):
+        """Download the image file with a shared async HTTP client and return the path"""
+        image_url = self.try_get_image_url()
+        if image_url:
+            response = await client.get(image_url)
+            return await _in_thread(self._save_response, response, image_url, 'image')
+        return None
+
+
+class CachedDutchWiktionaryWord(DutchWiktionaryWord):
+    """A word restored from previously extracted fields without looking up the page"""
+
+    def __init__(self, word, working_dir, fields, http_pool=None):
+        self.working_dir = Path(working_dir)
+        self.word = word
+        self.http_pool = http_pool or HttpPool()
+        self.fields = fields
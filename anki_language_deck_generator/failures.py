@@ -0,0 +1,76 @@
+"""
+Classification of failed words.
+
+A word fails for one of a few reasons, and only some of them are worth
+trying again: a word that does not exist stays missing, but a throttled or
+dropped request may succeed a minute later.
+"""
+import json
+
+NOT_FOUND = 'not_found'
+THROTTLED = 'throttled'
+NETWORK = 'network'
+PARSE_ERROR = 'parse_error'
+# Failures that may go away if the word is tried again
+TRANSIENT_FAILURES = {THROTTLED, NETWORK}
+THROTTLED_STATUSES = {429, 503}
+# How long a word confirmed missing is not looked up again
+NOT_FOUND_TTL = 7 * 24 * 60 * 60
+# Seconds to wait before trying words again, so throttling hosts can recover
+RETRY_DELAY = 30
+
+
+class WordNotFoundError(RuntimeError):
+    """The word does not exist for a provider, e.g. a dictionary has no entry for it"""
+
+
+class HttpStatusError(RuntimeError):
+    """A provider answered with an unexpected HTTP status"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _status_code(error):
+    if isinstance(error, HttpStatusError):
+        return error.status_code
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _is_network_error(error):
+    import requests
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+def classify_failure(error):
+    """Return why a word failed with the exception: NOT_FOUND, THROTTLED, NETWORK or PARSE_ERROR"""
+    if isinstance(error, WordNotFoundError):
+        return NOT_FOUND
+    status_code = _status_code(error)
+    if status_code is not None:
+        if status_code == 404:
+            return NOT_FOUND
+        if status_code in THROTTLED_STATUSES:
+            return THROTTLED
+        # E.g. a server error or a blocked request
+        return NETWORK
+    if _is_network_error(error):
+        return NETWORK
+    # Anything else means a page or a file did not look as expected
+    return PARSE_ERROR
+
+
+def write_failures(path, failures):
+    """Write failures as JSON lines with the word, the reason and the error, e.g. to retry them later"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for failure in failures:
+            f.write(json.dumps(failure, ensure_ascii=False) + '\n')
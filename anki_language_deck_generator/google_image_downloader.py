@@ -1,31 +1,78 @@
-import logging
-import time
+import tempfile
 from pathlib import Path
-from icrawler.builtin import GoogleImageCrawler
+from urllib.parse import urlencode, urlsplit
+from icrawler.builtin.google import GoogleParser
+from anki_language_deck_generator.http_pool import HttpPool
 
 
 class ImageDownloader:
-    def __init__(self, working_dir):
+    """
+    Long-lived Google image downloader that is safe to use from many words at once.
+
+    It runs icrawler's Google result parser inline on the shared HTTP pool instead
+    of starting a crawler with its own threads for every word, and saves every
+    image to its own staging file.
+    """
+    SEARCH_URL = 'https://www.google.com/search'
+    EXTENSIONS = ('jpg', 'jpeg', 'png', 'bmp', 'gif')
+    # How many search results are tried before giving up
+    MAX_CANDIDATES = 5
+
+    def __init__(self, working_dir, http_pool=None):
         self.working_dir = Path(working_dir)
+        self.working_dir.mkdir(parents=True, exist_ok=True)
+        self.http_pool = http_pool or HttpPool()
+
+    def _make_search_url(self, word):
+        params = dict(q=word, ijn=0, start=0, tbs='', tbm='isch')
+        return f'{self.SEARCH_URL}?{urlencode(params)}'
+
+    @staticmethod
+    def _parse_image_urls(word, response):
+        response.raise_for_status()
+        # The parser does not use its instance, so no crawler has to be built for it
+        tasks = GoogleParser.parse(None, response) or []
+        if not tasks:
+            raise RuntimeError(f"Cannot find an image for the word '{word}'")
+        return [task['file_url'] for task in tasks[:ImageDownloader.MAX_CANDIDATES]]
+
+    def _save_image(self, word, url, response):
+        if response.status_code != 200 or not response.headers.get('Content-Type', '').startswith('image/'):
+            return None
+        if not response.content:
+            return None
+        extension = urlsplit(url).path.rsplit('.', 1)[-1].lower()
+        if extension not in self.EXTENSIONS:
+            extension = 'jpg'
+        # Every download gets its own staging file, so parallel lookups never collide and
+        # words with path separators are fine, the media store names the file by its content
+        fd, image_file = tempfile.mkstemp(dir=self.working_dir, suffix=f'.{extension}')
+        with open(fd, 'wb') as f:
+            f.write(response.content)
+        return Path(image_file)
 
     def download_image(self, word):
-        for _ in range(5):
+        response = self.http_pool.get(self._make_search_url(word))
+        for url in self._parse_image_urls(word, response):
             try:
-                GoogleImageCrawler(
-                    storage={'root_dir': str(self.working_dir)},
-                    log_level=logging.ERROR
-                ).crawl(
-                    keyword=word,
-                    max_num=1,
-                    overwrite=True
-                )
-                break
+                image_file = self._save_image(word, url, self.http_pool.get(url))
             except Exception:
-                time.sleep(1)
                 continue
-        else:
-            raise RuntimeError(f"Cannot find an image for the word '{word}'")
-        image_file = next(self.working_dir.glob('000001.*'))
-        new_name = self.working_dir / word / f'{word}{image_file.suffix}'
-        image_file.rename(new_name)
-        return new_name
+            if image_file is not None:
+                return image_file
+        raise RuntimeError(f"Cannot download an image for the word '{word}'")
+
+    async def download_image_async(self, word, client):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        response = await client.get(self._make_search_url(word))
+        # Parsing the page and writing the file would block the event loop
+        for url in await loop.run_in_executor(None, self._parse_image_urls, word, response):
+            try:
+                image_file = await loop.run_in_executor(None, self._save_image, word, url, await client.get(url))
+            except Exception:
+                continue
+            if image_file is not None:
+                return image_file
+        raise RuntimeError(f"Cannot download an image for the word '{word}'")
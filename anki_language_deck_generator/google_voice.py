@@ -1,128 +1,139 @@
 from pathlib import Path
+import base64
+import functools
 import logging
+import re
+import tempfile
 
-from gtts import gTTS
-from gtts import lang as gtts_lang
+from gtts import gTTS, gTTSError
 
-# Configure basic logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from anki_language_deck_generator.http_pool import HttpPool
+from anki_language_deck_generator.voice_backend import VoiceBackend
 
-class GoogleVoice:
+# Used if the languages supported by gTTS cannot be loaded
+FALLBACK_LANGUAGE_ALIASES = {
+    'English': 'en',
+    'Chinese': 'zh-CN',
+    'French': 'fr',
+    'Dutch': 'nl',
+    'German': 'de',
+    'Spanish': 'es',
+    'Italian': 'it',
+    'Japanese': 'ja',
+    'Korean': 'ko',
+    'Russian': 'ru',
+    'Arabic': 'ar',
+    'Portuguese': 'pt',
+    'Hindi': 'hi',
+    'Turkish': 'tr',
+    'Swedish': 'sv',
+    'Polish': 'pl',
+    'Danish': 'da',
+    'Finnish': 'fi',
+    'Greek': 'el',
+    'Vietnamese': 'vi',
+    'Thai': 'th',
+    'Indonesian': 'id',
+    'Malay': 'ms',
+    'Filipino': 'fil',
+    'Bengali': 'bn',
+    'Gujarati': 'gu',
+    'Kannada': 'kn',
+    'Malayalam': 'ml',
+    'Marathi': 'mr',
+    'Tamil': 'ta',
+    'Telugu': 'te',
+    'Ukrainian': 'uk',
+    'Czech': 'cs',
+    'Hungarian': 'hu',
+    'Romanian': 'ro',
+    'Slovak': 'sk',
+    'Norwegian': 'no',
+    'Hebrew': 'iw', # gTTS uses 'iw' for Hebrew
+    'Urdu': 'ur',
+    'Nepali': 'ne',
+    'Sinhala': 'si',
+    'Khmer': 'km',
+    'Lao': 'lo',
+    'Myanmar (Burmese)': 'my',
+    'Amharic': 'am',
+    'Swahili': 'sw',
+    'Afrikaans': 'af',
+    'Catalan': 'ca',
+    'Croatian': 'hr',
+    'Estonian': 'et',
+    'Icelandic': 'is',
+    'Latvian': 'lv',
+    'Lithuanian': 'lt',
+    'Serbian': 'sr',
+    'Slovenian': 'sl',
+    'Bosnian': 'bs',
+    'Azerbaijani': 'az',
+    'Georgian': 'ka',
+    'Armenian': 'hy',
+    'Albanian': 'sq',
+    'Macedonian': 'mk',
+    'Mongolian': 'mn',
+    'Pashto': 'ps',
+    'Persian': 'fa',
+    'Somali': 'so',
+    'Uzbek': 'uz',
+    'Zulu': 'zu',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def language_aliases() -> dict:
     """
-    A class to handle voice synthesis using the gTTS (Google Text-to-Speech) library.
-    This class now provides methods to download sound files for given words
-    in a specified language by utilizing Google's online Text-to-Speech API,
-    making it platform-independent regarding voice management.
+    Language aliases for convenience, mapping to gTTS-compatible language codes (ISO 639-1).
 
-    NOTE: This library requires an active internet connection to synthesize speech.
+    The table covers all languages supported by gTTS. It is built on first use
+    and then reused, so importing this module stays cheap.
     """
-    # These URLs are no longer used as we are using gTTS, but kept for context.
-    VOICE_STREAM_URL = 'https://voice.reverso.net/RestPronunciation.svc/v1/output=xml/GetVoiceStream'
-    AVAILABLE_VOICES_URL = 'https://voice.reverso.net/RestPronunciation.svc/v1/output=json/GetAvailableVoices'
+    from gtts import lang as gtts_lang
 
-    # Language aliases for convenience. These now map to gTTS-compatible language codes (ISO 639-1).
-    # gTTS typically uses two-letter language codes.
-    # This dictionary is now dynamically populated to include all languages supported by gTTS.
-    LANGUAGE_ALIASES = {}
+    aliases = {}
     try:
-        # Dynamically populate LANGUAGE_ALIASES with all gTTS supported languages
-        # This makes the class more robust to gTTS updates and covers more languages.
         for code, name in gtts_lang.tts_langs().items():
             # Add both the full name (capitalized) and the code itself as a potential alias.
-            # Prioritize more common names for easier use.
-            # Handle specific cases for Chinese variants if gTTS uses distinct codes for them.
+            # Handle specific cases for Chinese variants, gTTS uses distinct codes for them.
             if code == 'zh-cn': # Simplified Chinese
-                LANGUAGE_ALIASES['Chinese (Mandarin)'] = 'zh-CN'
-                LANGUAGE_ALIASES['Mandarin Chinese'] = 'zh-CN'
-                LANGUAGE_ALIASES['Chinese'] = 'zh-CN' # Common alias for Mandarin
+                aliases['Chinese (Mandarin)'] = 'zh-CN'
+                aliases['Mandarin Chinese'] = 'zh-CN'
+                aliases['Chinese'] = 'zh-CN' # Common alias for Mandarin
             elif code == 'zh-tw': # Traditional Chinese
-                LANGUAGE_ALIASES['Chinese (Taiwan)'] = 'zh-TW'
+                aliases['Chinese (Taiwan)'] = 'zh-TW'
             else:
-                LANGUAGE_ALIASES[name.capitalize()] = code
-                LANGUAGE_ALIASES[code] = code # Allow using the code directly
-
-        # Add some common specific English variants if gTTS supports them distinctly or if preferred
-        if 'en' in LANGUAGE_ALIASES.values():
-            LANGUAGE_ALIASES['English (US)'] = 'en'
-            LANGUAGE_ALIASES['English (UK)'] = 'en' # gTTS 'en' often covers various English accents
-            LANGUAGE_ALIASES['American English'] = 'en'
-            LANGUAGE_ALIASES['British English'] = 'en'
+                aliases[name.capitalize()] = code
+                aliases[code] = code # Allow using the code directly
 
+        # Add some common English variants, gTTS 'en' covers various English accents
+        if 'en' in aliases.values():
+            aliases['English (US)'] = 'en'
+            aliases['English (UK)'] = 'en'
+            aliases['American English'] = 'en'
+            aliases['British English'] = 'en'
     except Exception as e:
         logging.warning(f"Could not dynamically load gTTS languages. Using fallback aliases. Error: {e}")
-        # Fallback aliases if gtts_lang.tts_langs() fails (e.g., no internet on startup)
-        LANGUAGE_ALIASES = {
-            'English': 'en',
-            'Chinese': 'zh-CN',
-            'French': 'fr',
-            'Dutch': 'nl',
-            'German': 'de',
-            'Spanish': 'es',
-            'Italian': 'it',
-            'Japanese': 'ja',
-            'Korean': 'ko',
-            'Russian': 'ru',
-            'Arabic': 'ar',
-            'Portuguese': 'pt',
-            'Hindi': 'hi',
-            'Turkish': 'tr',
-            'Swedish': 'sv',
-            'Polish': 'pl',
-            'Danish': 'da',
-            'Finnish': 'fi',
-            'Greek': 'el',
-            'Vietnamese': 'vi',
-            'Thai': 'th',
-            'Indonesian': 'id',
-            'Malay': 'ms',
-            'Filipino': 'fil',
-            'Bengali': 'bn',
-            'Gujarati': 'gu',
-            'Kannada': 'kn',
-            'Malayalam': 'ml',
-            'Marathi': 'mr',
-            'Tamil': 'ta',
-            'Telugu': 'te',
-            'Ukrainian': 'uk',
-            'Czech': 'cs',
-            'Hungarian': 'hu',
-            'Romanian': 'ro',
-            'Slovak': 'sk',
-            'Norwegian': 'no',
-            'Hebrew': 'iw', # gTTS uses 'iw' for Hebrew
-            'Urdu': 'ur',
-            'Nepali': 'ne',
-            'Sinhala': 'si',
-            'Khmer': 'km',
-            'Lao': 'lo',
-            'Myanmar (Burmese)': 'my',
-            'Amharic': 'am',
-            'Swahili': 'sw',
-            'Afrikaans': 'af',
-            'Catalan': 'ca',
-            'Croatian': 'hr',
-            'Estonian': 'et',
-            'Icelandic': 'is',
-            'Latvian': 'lv',
-            'Lithuanian': 'lt',
-            'Serbian': 'sr',
-            'Slovenian': 'sl',
-            'Bosnian': 'bs',
-            'Azerbaijani': 'az',
-            'Georgian': 'ka',
-            'Armenian': 'hy',
-            'Albanian': 'sq',
-            'Macedonian': 'mk',
-            'Mongolian': 'mn',
-            'Pashto': 'ps',
-            'Persian': 'fa',
-            'Somali': 'so',
-            'Uzbek': 'uz',
-            'Zulu': 'zu',
-        }
-
-
-    def __init__(self, language: str, working_dir: str):
+        return dict(FALLBACK_LANGUAGE_ALIASES)
+    return aliases
+
+
+class GoogleVoice(VoiceBackend):
+    """
+    A class to handle voice synthesis using the gTTS (Google Text-to-Speech) library.
+    This class now provides methods to download sound files for given words
+    in a specified language by utilizing Google's online Text-to-Speech API,
+    making it platform-independent regarding voice management.
+
+    NOTE: This library requires an active internet connection to synthesize speech.
+    """
+    NAME = 'gtts'
+    # These URLs are no longer used as we are using gTTS, but kept for context.
+    VOICE_STREAM_URL = 'https://voice.reverso.net/RestPronunciation.svc/v1/output=xml/GetVoiceStream'
+    AVAILABLE_VOICES_URL = 'https://voice.reverso.net/RestPronunciation.svc/v1/output=json/GetAvailableVoices'
+
+    def __init__(self, language: str, working_dir: str, http_pool: HttpPool = None):
         """
         Initializes the ReversoVoice handler using the gTTS engine.
 
@@ -130,8 +141,10 @@ class GoogleVoice:
             language (str): The desired language for voice synthesis (e.g., 'English', 'French').
                             This will be used to select a matching voice from gTTS.
             working_dir (str): The directory where sound files will be saved.
+            http_pool (HttpPool): The shared connection pools used to send gTTS requests.
         """
         self.working_dir = Path(working_dir)
+        self.http_pool = http_pool or HttpPool()
         # Ensure the working directory exists
         self.working_dir.mkdir(parents=True, exist_ok=True)
 
@@ -165,7 +178,8 @@ class GoogleVoice:
         # Some languages might have specific variants like 'zh-CN'.
         # Convert the input language to title case to match the common names from gtts_lang.tts_langs()
         # Also check for lower case codes directly.
-        return self.LANGUAGE_ALIASES.get(language, self.LANGUAGE_ALIASES.get(language.capitalize(), self.LANGUAGE_ALIASES.get(language.lower(), None))) or language.lower()
+        aliases = language_aliases()
+        return aliases.get(language, aliases.get(language.capitalize(), aliases.get(language.lower(), None))) or language.lower()
 
     # The _make_voice_url method is no longer needed for gTTS as it doesn't use URLs this way.
     # It's commented out for clarity.
@@ -189,19 +203,24 @@ class GoogleVoice:
         Raises:
             Exception: If there's an error during speech synthesis (e.g., network issue).
         """
-        # Create a subdirectory for each word to organize the downloaded sound files.
-        word_dir = self.working_dir / word
-        word_dir.mkdir(parents=True, exist_ok=True)
-        sound_file_path = word_dir / f'{word}.mp3'
-
-        logging.info(f"Synthesizing sound for '{word}' in language '{self.gtts_language_code}' and saving to: {sound_file_path}")
+        logging.info(f"Synthesizing sound for '{word}' in language '{self.gtts_language_code}'")
         try:
             # Create a gTTS object. 'lang' is the language code.
             # 'slow=False' makes the speech faster.
             tts = gTTS(text=word, lang=self.gtts_language_code, slow=False)
 
-            # Save the audio directly to a file.
-            tts.save(str(sound_file_path))
+            # gTTS opens a new session for every request, so send its prepared
+            # requests through the shared pool and decode the audio the same way.
+            audio = bytearray()
+            for prepared_request in tts._prepare_requests():
+                response = self.http_pool.post(
+                    prepared_request.url,
+                    data=prepared_request.body,
+                    headers=prepared_request.headers,
+                )
+                response.raise_for_status()
+                audio += _extract_audio(response.text)
+            sound_file_path = _write_sound_file(self.working_dir, audio)
             logging.info(f"Successfully synthesized and saved sound to: {sound_file_path}")
             return sound_file_path
         except Exception as e:
@@ -209,3 +228,58 @@ class GoogleVoice:
             logging.error("This usually indicates a network issue or an unsupported language/voice by gTTS.")
             raise # Re-raise the exception for upstream handling
 
+    async def download_sound_async(self, word: str, client) -> Path:
+        """
+        Synthesizes the given word into a sound file (MP3) through a shared async HTTP client.
+
+        gTTS itself only sends requests synchronously, so its prepared requests are
+        sent with the given client and the audio is decoded the same way gTTS does it.
+
+        Args:
+            word (str): The word or phrase to synthesize.
+            client (httpx.AsyncClient): The pooled async HTTP client.
+
+        Returns:
+            Path: The file path where the downloaded MP3 sound file is saved.
+        """
+        import asyncio
+
+        tts = gTTS(text=word, lang=self.gtts_language_code, slow=False)
+        responses = []
+        for prepared_request in tts._prepare_requests():
+            response = await client.post(
+                prepared_request.url,
+                content=prepared_request.body,
+                headers=dict(prepared_request.headers),
+            )
+            response.raise_for_status()
+            responses.append(response.text)
+        # Decoding and writing the audio would block the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, _save_audio, responses, self.working_dir)
+
+
+def _write_sound_file(working_dir: Path, audio: bytes) -> Path:
+    # Every sound gets its own staging file, so words with path separators or the same
+    # word synthesized twice never collide. The media store names the file by its content.
+    fd, sound_file = tempfile.mkstemp(dir=working_dir, suffix='.mp3')
+    with open(fd, 'wb') as f:
+        f.write(audio)
+    return Path(sound_file)
+
+
+def _save_audio(response_texts, working_dir: Path) -> Path:
+    """Decode the audio of gTTS batchexecute responses into a file."""
+    return _write_sound_file(working_dir, b''.join(_extract_audio(text) for text in response_texts))
+
+
+def _extract_audio(response_text: str) -> bytes:
+    """Extract the base64 encoded audio from a gTTS batchexecute response."""
+    audio = bytearray()
+    for line in response_text.splitlines():
+        if gTTS.GOOGLE_TTS_RPC in line:
+            audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', line)
+            if audio_search is None:
+                raise gTTSError('No audio stream in response from TTS API')
+            audio += base64.b64decode(audio_search.group(1).encode('ascii'))
+    return bytes(audio)
+
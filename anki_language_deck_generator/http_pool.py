@@ -0,0 +1,140 @@
+import logging
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from anki_language_deck_generator.metrics import Metrics
+from anki_language_deck_generator.rate_limiter import RateLimiter
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+)
+
+
+class HttpPool:
+    """
+    Shared keep-alive connection pools used by all providers.
+
+    One `requests.Session` keeps up to `pool_size` connections open to each of up
+    to `max_hosts` hosts, so words after the first one skip the TCP and TLS
+    handshakes. The asyncio code path gets an equivalent `httpx.AsyncClient`,
+    which speaks HTTP/2 when the `h2` package is installed.
+
+    Every request of both clients goes through the shared `RateLimiter`, and
+    requests, downloaded bytes and retries are counted in `metrics`.
+    """
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(
+        self, pool_size=DEFAULT_POOL_SIZE, max_hosts=10, timeout=DEFAULT_TIMEOUT, rate_limiter=None, metrics=None
+    ):
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.metrics = metrics or Metrics()
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """Send a request at the rate the host accepts, retrying throttled and failed attempts"""
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).hostname
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(host)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.rate_limiter.max_retries:
+                    raise
+                delay = self.rate_limiter.backoff_delay(attempt)
+                logging.warning(f"Request to '{host}' failed ({e}), retrying in {delay:.1f}s")
+            else:
+                self.metrics.count_request(host, len(response.content))
+                delay = self.rate_limiter.should_retry(
+                    host, attempt, response.status_code, response.headers.get('Retry-After')
+                )
+                if delay is None:
+                    return response
+                logging.warning(f"'{host}' answered {response.status_code}, retrying in {delay:.1f}s")
+                response.close()
+            self.metrics.count_retry(host)
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def create_async_client(self, max_connections=None):
+        """Create a pooled async HTTP client to be shared by all providers"""
+        # httpx is only needed for the asyncio code path
+        import httpx
+
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        max_connections = max_connections or self.pool_size * self.max_hosts
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        return httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT},
+            transport=_make_rate_limited_transport(
+                httpx.AsyncHTTPTransport(limits=limits, http2=http2), self.rate_limiter, self.metrics
+            ),
+            follow_redirects=True,
+            timeout=self.timeout,
+        )
+
+    def close(self):
+        self.session.close()
+
+
+def _make_rate_limited_transport(transport, rate_limiter, metrics):
+    # Defined lazily, because httpx is only needed for the asyncio code path
+    import asyncio
+    import httpx
+
+    class RateLimitedAsyncTransport(httpx.AsyncBaseTransport):
+        """Send requests of an httpx client through the shared rate limiter"""
+
+        async def handle_async_request(self, request):
+            host = request.url.host
+            attempt = 0
+            while True:
+                await rate_limiter.acquire_async(host)
+                try:
+                    response = await transport.handle_async_request(request)
+                except (httpx.NetworkError, httpx.TimeoutException) as e:
+                    if attempt >= rate_limiter.max_retries:
+                        raise
+                    delay = rate_limiter.backoff_delay(attempt)
+                    logging.warning(f"Request to '{host}' failed ({e}), retrying in {delay:.1f}s")
+                else:
+                    # Providers read whole responses anyway, so reading here only makes the size known
+                    await response.aread()
+                    metrics.count_request(host, len(response.content))
+                    delay = rate_limiter.should_retry(
+                        host, attempt, response.status_code, response.headers.get('Retry-After')
+                    )
+                    if delay is None:
+                        return response
+                    logging.warning(f"'{host}' answered {response.status_code}, retrying in {delay:.1f}s")
+                    await response.aclose()
+                metrics.count_retry(host)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        async def aclose(self):
+            await transport.aclose()
+
+    return RateLimitedAsyncTransport()
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Pillow is imported in the worker function, it is only needed when images are normalized
+
+FORMATS = {'jpeg': '.jpg', 'webp': '.webp'}
+
+
+def normalize_image(path, max_size, image_format='jpeg', quality=85):
+    """
+    Downscale an image to fit into `max_size` x `max_size` pixels and re-encode it.
+
+    The original file is replaced by the re-encoded one unless that would only
+    make it larger. Files Pillow cannot read and animations are left as they
+    are. Returns (path of the result, original size, new size) in bytes.
+    """
+    from PIL import Image
+
+    path = Path(path)
+    size = path.stat().st_size
+    try:
+        with Image.open(path) as image:
+            if getattr(image, 'is_animated', False):
+                return path, size, size
+            resized = max(image.size) > max_size
+            # JPEGs are decoded at a reduced scale right away
+            image.draft('RGB', (max_size, max_size))
+            image.thumbnail((max_size, max_size))
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            if has_alpha:
+                image = image.convert('RGBA')
+                if image_format == 'jpeg':
+                    # JPEG has no transparency, so transparent parts become white
+                    background = Image.new('RGB', image.size, 'white')
+                    background.paste(image, mask=image.getchannel('A'))
+                    image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            fd, output = tempfile.mkstemp(dir=path.parent, prefix=f'{path.stem}-', suffix=FORMATS[image_format])
+            with open(fd, 'wb') as f:
+                image.save(f, format=image_format.upper(), quality=quality)
+    except OSError:
+        return path, size, size
+    output = Path(output)
+    new_size = output.stat().st_size
+    if new_size >= size and not resized:
+        output.unlink()
+        return path, size, size
+    path.unlink()
+    return output, size, new_size
+
+
+class ImageNormalizer:
+    """
+    Normalizes downloaded images in a pool of worker processes.
+
+    Decoding and encoding large images is CPU-bound, so the work is sent to
+    other processes instead of blocking the threads or the event loop that
+    download the next words. With `processes=0` images are normalized in the
+    calling thread, e.g. where no worker processes can be started.
+    """
+    DEFAULT_MAX_SIZE = 512
+    DEFAULT_QUALITY = 85
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, image_format='jpeg', quality=DEFAULT_QUALITY, processes=None):
+        if image_format not in FORMATS:
+            raise ValueError(f"Unsupported image format '{image_format}', use one of {', '.join(FORMATS)}")
+        self.max_size = max_size
+        self.image_format = image_format
+        self.quality = quality
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.images = 0
+        self.original_bytes = 0
+        self.normalized_bytes = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def variant(self):
+        """Name of the settings, normalized media is stored apart from media normalized differently"""
+        return f'{self.image_format}-{self.max_size}-q{self.quality}'
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.normalized_bytes
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking a process with running threads may copy held locks, so workers are spawned
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _submit(self, path):
+        return self._get_executor().submit(normalize_image, path, self.max_size, self.image_format, self.quality)
+
+    def _count(self, result):
+        path, size, new_size = result
+        with self._lock:
+            self.images += 1
+            self.original_bytes += size
+            self.normalized_bytes += new_size
+        return path
+
+    def normalize(self, path):
+        """Normalize an image and return the path of the result"""
+        if self.processes == 0:
+            return self._count(normalize_image(path, self.max_size, self.image_format, self.quality))
+        return self._count(self._submit(path).result())
+
+    async def normalize_async(self, path):
+        import asyncio
+
+        if self.processes == 0:
+            return self.normalize(path)
+        return self._count(await asyncio.wrap_future(self._submit(path)))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,107 @@
+import json
+import logging
+from pathlib import Path
+
+
+class BuildJournal:
+    """
+    Append-only checkpoint journal of a deck build, one JSON object per line.
+
+    The first line holds the deck and model IDs, every other line records a
+    finished note with its media files or a failed word. A resumed build reads
+    the journal back, so finished words are not looked up again.
+    """
+    FILE_NAME = 'journal.jsonl'
+
+    def __init__(self, path, resume=False):
+        self.path = Path(path)
+        self.header = None
+        self.done = {}
+        self.failed = set()
+        # Why the failed words failed, see `failures.classify_failure`
+        self.failures = {}
+        if resume and self.path.exists():
+            self._load()
+        self._file = self.path.open('a' if resume else 'w', encoding='utf-8')
+        if resume and not self._ends_with_newline():
+            # Start the next entry on a new line after a cut short one
+            self._file.write('\n')
+
+    def _ends_with_newline(self):
+        with self.path.open('rb') as f:
+            if f.seek(0, 2) == 0:
+                return True
+            f.seek(-1, 2)
+            return f.read(1) == b'\n'
+
+    def _load(self):
+        with self.path.open('r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be cut short if the build was killed while writing it
+                    logging.warning(f"Skipping a broken line in the journal '{self.path}'")
+                    continue
+                if 'deck_id' in entry:
+                    self.header = entry
+                elif entry['status'] == 'done':
+                    self.done[entry['word']] = entry
+                    self.failed.discard(entry['word'])
+                    self.failures.pop(entry['word'], None)
+                else:
+                    self.failed.add(entry['word'])
+                    self.failures[entry['word']] = entry
+        logging.info(
+            f"Resuming from the journal '{self.path}': "
+            f"{len(self.done)} finished and {len(self.failed)} failed words"
+        )
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def write_header(self, deck_id, model_id):
+        self.header = {'deck_id': deck_id, 'model_id': model_id}
+        self._write(self.header)
+
+    def record_done(self, word, fields, media_files, guid):
+        entry = {
+            'word': word,
+            'status': 'done',
+            'fields': fields,
+            'media': [str(path) for path in media_files],
+            'guid': guid,
+        }
+        self.done[word] = entry
+        self.failed.discard(word)
+        self.failures.pop(word, None)
+        self._write(entry)
+
+    def record_failed(self, word, reason=None, error=None):
+        entry = {'word': word, 'status': 'failed'}
+        if reason is not None:
+            entry.update(reason=reason, error=error)
+        self.failed.add(word)
+        self.failures[word] = entry
+        self._write(entry)
+
+    def get_failure(self, word):
+        """Return the reason and the error of a failed word, or None if it is unknown"""
+        entry = self.failures.get(word)
+        if entry is None or 'reason' not in entry:
+            return None
+        return entry['reason'], entry['error']
+
+    def get_done(self, word):
+        """Return the recorded note of a finished word if all its media files still exist"""
+        entry = self.done.get(word)
+        if entry is None:
+            return None
+        media_files = [Path(path) for path in entry['media']]
+        if not all(path.exists() for path in media_files):
+            return None
+        return entry['fields'], media_files, entry['guid']
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,156 @@
+"""
+Voice backends running a local speech synthesizer instead of an online service.
+
+`EspeakVoice` runs espeak-ng (https://github.com/espeak-ng/espeak-ng) once per
+word, `PiperVoice` keeps piper (https://github.com/rhasspy/piper) processes
+running with the voice model loaded and feeds them words one line at a time.
+Both run at most `processes` syntheses at once, so words processed by
+parallel workers are synthesized in parallel at CPU speed and work offline.
+Sounds are saved as WAV files.
+"""
+import json
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from anki_language_deck_generator.language_codes import LANGUAGES
+from anki_language_deck_generator.voice_backend import VoiceBackend
+
+
+def _find_executable(executable):
+    path = shutil.which(executable)
+    if path is None:
+        raise RuntimeError(f"Cannot find '{executable}', install it or choose another voice backend")
+    return path
+
+
+class EspeakVoice(VoiceBackend):
+    NAME = 'espeak-ng'
+    # A synthesis takes milliseconds, a hanging one is killed
+    TIMEOUT = 60
+
+    def __init__(self, language, working_dir, voice=None, processes=None, executable='espeak-ng'):
+        self.working_dir = Path(working_dir)
+        self.working_dir.mkdir(parents=True, exist_ok=True)
+        self.executable = _find_executable(executable)
+        # espeak-ng names most voices by the ISO 639-1 code of their language
+        self.voice = voice or LANGUAGES.get(language) or language.lower()
+        self._slots = threading.BoundedSemaphore(processes or os.cpu_count() or 1)
+
+    @property
+    def store_name(self):
+        return f'{self.NAME}:{self.voice}'
+
+    def download_sound(self, word):
+        # Words may contain characters not allowed in file names, the media store names the file
+        fd, sound_file = tempfile.mkstemp(dir=self.working_dir, suffix='.wav')
+        os.close(fd)
+        with self._slots:
+            # The word goes through stdin, so words starting with '-' are not taken for options
+            subprocess.run(
+                [self.executable, '-v', self.voice, '-w', sound_file, '--stdin'],
+                input=word.encode('utf-8'),
+                capture_output=True,
+                timeout=self.TIMEOUT,
+                check=True,
+            )
+        return Path(sound_file)
+
+
+class PiperVoice(VoiceBackend):
+    NAME = 'piper'
+    # A hanging process is killed after this many seconds per word
+    TIMEOUT = 60
+    # How often a word waiting for a busy process checks whether it may start one
+    POLL_INTERVAL = 1
+
+    def __init__(self, language, working_dir, voice, processes=None, executable='piper'):
+        self.working_dir = Path(working_dir)
+        self.working_dir.mkdir(parents=True, exist_ok=True)
+        self.executable = _find_executable(executable)
+        self.model = Path(voice)
+        if not self.model.exists():
+            raise ValueError(f'Cannot find the piper voice model {self.model}')
+        self.max_processes = processes or os.cpu_count() or 1
+        # Idle processes; a process is taken by one word at a time
+        self._idle = queue.LifoQueue()
+        self._processes = []
+        self._lock = threading.Lock()
+
+    @property
+    def store_name(self):
+        return f'{self.NAME}:{self.model.stem}'
+
+    def _start_process(self):
+        logging.info(f'Starting piper with the voice {self.model.name}...')
+        return subprocess.Popen(
+            [self.executable, '--model', str(self.model), '--json-input', '--output_dir', str(self.working_dir)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+        )
+
+    def _acquire(self):
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    # Processes are started on demand, loading a model takes a while
+                    if len(self._processes) < self.max_processes:
+                        process = self._start_process()
+                        self._processes.append(process)
+                        return process
+                try:
+                    process = self._idle.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            # None is left by a discarded process, so a waiting word starts a new one
+            if process is not None:
+                return process
+
+    def _discard(self, process):
+        process.kill()
+        process.wait()
+        with self._lock:
+            self._processes.remove(process)
+        self._idle.put(None)
+
+    def download_sound(self, word):
+        fd, sound_file = tempfile.mkstemp(dir=self.working_dir, suffix='.wav')
+        os.close(fd)
+        process = self._acquire()
+        # Killing a hanging process ends the read below
+        watchdog = threading.Timer(self.TIMEOUT, process.kill)
+        watchdog.start()
+        try:
+            process.stdin.write(json.dumps({'text': word, 'output_file': sound_file}) + '\n')
+            process.stdin.flush()
+            # piper prints the path of every file it has written
+            output = process.stdout.readline()
+        except (OSError, ValueError):
+            output = ''
+        finally:
+            watchdog.cancel()
+        if not output:
+            self._discard(process)
+            raise RuntimeError(f"piper exited or timed out while synthesizing the word '{word}'")
+        self._idle.put(process)
+        return Path(sound_file)
+
+    def close(self):
+        with self._lock:
+            processes, self._processes = self._processes, []
+        for process in processes:
+            process.stdin.close()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
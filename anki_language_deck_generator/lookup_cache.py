@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from anki_language_deck_generator.word_normalizer import word_key
+
+
+def default_cache_dir():
+    """Get the per-user cache directory of the generator"""
+    if sys.platform == 'win32':
+        base_dir = Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData' / 'Local'))
+    elif sys.platform == 'darwin':
+        base_dir = Path.home() / 'Library' / 'Caches'
+    else:
+        base_dir = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache'))
+    return base_dir / 'anki-language-deck-generator'
+
+
+# Seconds a write waits for other processes, e.g. the shards of a build, to finish theirs
+BUSY_TIMEOUT = 120
+
+
+def connect_shared(path):
+    """
+    Open an SQLite database shared by concurrent processes.
+
+    In WAL mode readers never wait for the writer and the writers queue up for
+    `BUSY_TIMEOUT` seconds instead of failing with "database is locked".
+    """
+    connection = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    return connection
+
+
+class LookupCache:
+    """
+    Persistent cache of parsed lookup results shared across runs.
+
+    Entries are keyed by provider, language pair and the word compared like
+    `word_normalizer` does, so case only matters where it does in the source
+    language. They hold small JSON values (a translation, usage HTML,
+    extracted Wiktionary fields).
+    Reads never write, so processes sharing the cache only wait for each other
+    on new entries: the access times of hits are written with the next batch
+    of writes, when expired entries are dropped and the least recently used
+    entries are evicted if the cache grows over `max_entries`.
+    """
+    DEFAULT_TTL = 30 * 24 * 60 * 60
+    DEFAULT_MAX_ENTRIES = 200_000
+    # How many writes happen between checks of the size cap
+    EVICTION_INTERVAL = 100
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # Key -> last access time of the hits since the last batch of writes
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._connection = connect_shared(self.path)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS lookups ('
+                'provider TEXT NOT NULL, languages TEXT NOT NULL, word TEXT NOT NULL, '
+                'value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, '
+                'PRIMARY KEY (provider, languages, word))'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)')
+
+    @staticmethod
+    def normalize(word, languages):
+        # `languages` is the source language, optionally followed by '-' and the target language
+        return word_key(word, languages.split('-', 1)[0])
+
+    def get(self, provider, languages, word, ttl=None):
+        """Return the cached value or None if it is missing or older than `ttl` (default: the cache's TTL)"""
+        ttl = self.ttl if ttl is None else ttl
+        key = (provider, languages, self.normalize(word, languages))
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, created FROM lookups WHERE provider = ? AND languages = ? AND word = ?', key
+            ).fetchone()
+            # Expired entries are replaced by the next `set` or dropped by `_evict`
+            if row is None or now - row[1] > ttl:
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, provider, languages, word, value):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?, ?)',
+                (provider, languages, self.normalize(word, languages), json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICTION_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self):
+        self._connection.executemany(
+            'UPDATE lookups SET accessed = ? WHERE provider = ? AND languages = ? AND word = ?',
+            ((accessed, *key) for key, accessed in self._accessed.items()),
+        )
+        self._accessed.clear()
+        self._connection.execute('DELETE FROM lookups WHERE created < ?', (time.time() - self.ttl,))
+        count = self._connection.execute('SELECT COUNT(*) FROM lookups').fetchone()[0]
+        if count > self.max_entries:
+            self._connection.execute(
+                'DELETE FROM lookups WHERE rowid IN '
+                '(SELECT rowid FROM lookups ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,),
+            )
+
+    def close(self):
+        with self._lock:
+            if self._writes % self.EVICTION_INTERVAL or self._accessed:
+                with self._connection:
+                    self._evict()
+            self._connection.close()
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from anki_language_deck_generator.lookup_cache import connect_shared
+
+
+class MediaStore:
+    """
+    Content-addressed store of downloaded media reused across runs and decks.
+
+    Files are kept under `blobs/` named by the SHA-256 of their content, so the
+    same sound or image is stored once and gets the same name in every deck.
+    An SQLite index maps (provider, language, word) to the blob.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.blobs_dir = self.root / 'blobs'
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Shards of a build may share the store
+        self._connection = connect_shared(self.root / 'index.sqlite')
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS media ('
+                'provider TEXT NOT NULL, language TEXT NOT NULL, word TEXT NOT NULL, blob TEXT NOT NULL, '
+                'PRIMARY KEY (provider, language, word))'
+            )
+
+    def _blob_path(self, blob):
+        return self.blobs_dir / blob[:2] / blob
+
+    def get(self, provider, language, word):
+        """Return the stored file for the word or None if it has not been downloaded yet"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT blob FROM media WHERE provider = ? AND language = ? AND word = ?',
+                (provider, language, word),
+            ).fetchone()
+        if row is not None:
+            path = self._blob_path(row[0])
+            if path.exists():
+                self.hits += 1
+                return path
+        self.misses += 1
+        return None
+
+    def put(self, provider, language, word, file_path):
+        """Move a downloaded file into the store and return its path in the store"""
+        file_path = Path(file_path)
+        digest = hashlib.sha256()
+        with file_path.open('rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        blob = f'{digest.hexdigest()}{file_path.suffix.lower()}'
+        path = self._blob_path(blob)
+        with self._lock:
+            if path.exists():
+                file_path.unlink()
+            else:
+                path.parent.mkdir(exist_ok=True)
+                # Move through a temporary name so other processes never see a partial blob
+                temp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+                shutil.move(str(file_path), str(temp_path))
+                os.replace(temp_path, path)
+            with self._connection:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?)', (provider, language, word, blob)
+                )
+        return path
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
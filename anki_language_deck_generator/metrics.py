@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets.
+
+    Every bucket is about 19% wider than the previous one, so percentiles are
+    accurate to that much while memory stays constant however many words run.
+    """
+    # Four buckets per doubling of the latency
+    BASE = 2 ** 0.25
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = max(seconds * 1000, 0.001)
+        index = math.ceil(math.log(ms, self.BASE))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the `q`-th percentile, in seconds"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.BASE ** index / 1000, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+            # Upper bucket bounds in milliseconds and sample counts
+            'buckets': {f'{self.BASE ** index:.3f}': self.buckets[index] for index in sorted(self.buckets)},
+        }
+
+
+class Metrics:
+    """
+    Counters and stage timings of a deck build.
+
+    The generator times every stage of a word (translation, usage, Wiktionary,
+    sound, image and packaging) and counts cache hits. `HttpPool` counts
+    requests, downloaded bytes and retries per host. With `trace=True` every
+    stage is also kept as an event of a Chrome trace, one row per word.
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.hosts = {}
+        self.caches = {}
+        self.words = {'done': 0, 'failed': 0}
+        self._events = []
+        self._trace_rows = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, word=None):
+        """Time the enclosed block as one sample of the stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, start, time.perf_counter(), word)
+
+    def record_stage(self, name, start, end, word=None):
+        with self._lock:
+            self.stages.setdefault(name, Histogram()).add(end - start)
+            if self.trace:
+                self._events.append(self._trace_event(name, start, end, word))
+
+    def _trace_event(self, name, start, end, word):
+        if word is None:
+            row = 0
+        else:
+            if word not in self._trace_rows:
+                self._trace_rows[word] = len(self._trace_rows) + 1
+            row = self._trace_rows[word]
+        return {
+            'name': name,
+            'cat': 'stage',
+            'ph': 'X',
+            'ts': (start - self.started) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': row,
+        }
+
+    def count_request(self, host, size):
+        with self._lock:
+            counters = self.hosts.setdefault(host, {'requests': 0, 'bytes': 0, 'retries': 0})
+            counters['requests'] += 1
+            counters['bytes'] += size
+
+    def count_retry(self, host):
+        with self._lock:
+            counters = self.hosts.setdefault(host, {'requests': 0, 'bytes': 0, 'retries': 0})
+            counters['retries'] += 1
+
+    def count_cache(self, name, hit):
+        with self._lock:
+            counters = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+            counters['hits' if hit else 'misses'] += 1
+
+    def count_word(self, failed):
+        with self._lock:
+            self.words['failed' if failed else 'done'] += 1
+
+    def uncount_failed_words(self, count):
+        """Take back the failures of words that are about to be tried again"""
+        with self._lock:
+            self.words['failed'] -= count
+
+    def report(self):
+        """Collect all metrics into a JSON serializable dict"""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            words = sum(self.words.values())
+            caches = {}
+            for name, counters in self.caches.items():
+                lookups = counters['hits'] + counters['misses']
+                caches[name] = dict(counters, hit_ratio=counters['hits'] / lookups if lookups else None)
+            return {
+                'elapsed_seconds': elapsed,
+                'words': dict(self.words, per_second=words / elapsed if elapsed else None),
+                'stages': {name: histogram.summary() for name, histogram in self.stages.items()},
+                'hosts': {host: dict(counters) for host, counters in self.hosts.items()},
+                'caches': caches,
+            }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_trace(self, path):
+        """Write the stage events in the Chrome trace format, viewable in chrome://tracing or Perfetto"""
+        with self._lock:
+            events = list(self._events)
+            pid = os.getpid()
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'deck'}})
+            for word, row in self._trace_rows.items():
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': row, 'args': {'name': word}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
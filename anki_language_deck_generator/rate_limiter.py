@@ -0,0 +1,128 @@
+import email.utils
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the request rate to one host.
+
+    The rate adapts to the host: it is halved when the host throttles us and
+    creeps back up to `max_rate` while requests succeed.
+    """
+
+    def __init__(self, max_rate, min_rate=0.2):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.capacity = max(1.0, max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.paused_until - now)
+
+    def pause(self, delay):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+    """
+    Central request scheduler: one token bucket per host plus the retry policy.
+
+    Failed requests are retried with exponential backoff and jitter. A 429 or 503
+    response with a `Retry-After` header pauses the whole host for that long.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    THROTTLE_STATUSES = {429, 503}
+    DEFAULT_RATE = 10
+
+    def __init__(self, default_rate=DEFAULT_RATE, host_rates=None, max_retries=5, base_delay=0.5, max_delay=60):
+        self.default_rate = default_rate
+        self.host_rates = dict(host_rates or {})
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.host_rates.get(host, self.default_rate))
+            return self._buckets[host]
+
+    def acquire(self, host):
+        delay = self.bucket(host).reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, host):
+        import asyncio
+
+        delay = self.bucket(host).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Delay before the retry number `attempt` (counting from 0)"""
+        self.retries += 1
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # Equal jitter keeps some delay but spreads out retries of parallel words
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def should_retry(self, host, attempt, status_code, retry_after_header=None):
+        """
+        Update the host state after a response and decide whether to retry.
+
+        Returns the delay before the next attempt or None if the response should be used.
+        """
+        bucket = self.bucket(host)
+        if status_code not in self.RETRY_STATUSES:
+            bucket.speed_up()
+            return None
+        retry_after = parse_retry_after(retry_after_header)
+        if status_code in self.THROTTLE_STATUSES:
+            bucket.slow_down()
+            if retry_after is not None:
+                bucket.pause(retry_after)
+        if attempt >= self.max_retries:
+            return None
+        return self.backoff_delay(attempt, retry_after)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
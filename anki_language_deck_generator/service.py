@@ -0,0 +1,433 @@
+"""
+Local deck generation service with a small HTTP/JSON API.
+
+The service keeps the connection pools, the caches, the media store and the
+translators warm between decks, so decks can be generated back to back
+without paying the startup and cold cache costs every time:
+
+    POST   /jobs            {"deck_name": ..., "source_language": ..., "target_language": ...,
+                             "words": [...], "workers": 4}  -> 202 {"id": ..., "status": "queued", ...}
+    GET    /jobs            all jobs
+    GET    /jobs/<id>       status and progress of a job
+    GET    /jobs/<id>/deck  the .apkg file of a finished job
+    DELETE /jobs/<id>       forget a finished job and remove its deck
+
+At most `--max-queued` jobs wait in the queue, more are refused with 503.
+`--concurrent-jobs` jobs run at once, each with up to `--workers` words in flight.
+Jobs pick offline dictionaries and usage indexes by the names given with
+`--dictionary NAME=DIR` and `--usage-index NAME=DIR`, never by path. Finished
+jobs and their decks are removed after `--job-ttl` hours, or earlier when
+more than `--max-finished-jobs` are kept.
+"""
+import argparse
+import json
+import logging
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from anki_language_deck_generator.batch import BatchBuilder
+from anki_language_deck_generator.lookup_cache import LookupCache, default_cache_dir
+from anki_language_deck_generator.media_store import MediaStore
+from anki_language_deck_generator.metrics import Metrics
+from anki_language_deck_generator.rate_limiter import RateLimiter
+
+JOB_KEYS = {'deck_name', 'source_language', 'target_language', 'words', 'workers', 'translator', 'dictionary',
+            'usage_index'}
+# Finished jobs and their decks are kept this long
+JOB_TTL = 24 * 60 * 60
+MAX_FINISHED_JOBS = 100
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, spec, output):
+        self.id = uuid.uuid4().hex
+        self.spec = spec
+        self.output = output
+        self.status = 'queued'
+        self.processed = 0
+        self.total = len(spec['words'])
+        self.failed_words = []
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'deck_name': self.spec['deck_name'],
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'failed_words': self.failed_words,
+            'error': self.error,
+            'submitted': self.submitted,
+            'finished': self.finished,
+        }
+
+
+def validate_job(spec, dictionaries=None, usage_indexes=None):
+    """
+    Return the job spec with defaults applied or raise ValueError.
+
+    `dictionary` and `usage_index` name one of the `dictionaries` and
+    `usage_indexes` configured on the service and are replaced by its directory.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('The job must be a JSON object')
+    unknown = set(spec) - JOB_KEYS
+    if unknown:
+        raise ValueError(f"Unknown job keys: {', '.join(sorted(unknown))}")
+    for key in ('source_language', 'target_language'):
+        if not isinstance(spec.get(key), str) or not spec[key]:
+            raise ValueError(f"The job has no '{key}'")
+    words = spec.get('words')
+    if not isinstance(words, list) or not words or not all(isinstance(word, str) for word in words):
+        raise ValueError("The job needs a non-empty list of 'words'")
+    if 'workers' in spec and (not isinstance(spec['workers'], int) or spec['workers'] < 1):
+        raise ValueError("'workers' must be a positive integer")
+    spec = dict(spec)
+    for key, configured in (('dictionary', dictionaries or {}), ('usage_index', usage_indexes or {})):
+        if spec.get(key):
+            if spec[key] not in configured:
+                names = ', '.join(sorted(configured)) or 'none'
+                raise ValueError(f"Unknown {key} '{spec[key]}', the service has {names}")
+            spec[key] = configured[spec[key]]
+    spec.setdefault('deck_name', 'Generated deck')
+    if not spec.get('translator'):
+        spec['translator'] = 'dictionary+glosbe' if spec.get('dictionary') else 'glosbe'
+    return spec
+
+
+class GenerationService:
+    """Runs deck jobs from a bounded queue on one `BatchBuilder` shared by all jobs"""
+
+    def __init__(self, builder, jobs_dir, max_queued=16, concurrent_jobs=1, dictionaries=None, usage_indexes=None,
+                 job_ttl=JOB_TTL, max_finished_jobs=MAX_FINISHED_JOBS):
+        self.builder = builder
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        # Name -> directory, the only indexes jobs may open
+        self.dictionaries = dictionaries or {}
+        self.usage_indexes = usage_indexes or {}
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._runners = [
+            threading.Thread(target=self._run, name=f'job-runner-{i}', daemon=True) for i in range(concurrent_jobs)
+        ]
+        for runner in self._runners:
+            runner.start()
+
+    def submit(self, spec):
+        job = Job(validate_job(spec, self.dictionaries, self.usage_indexes), self.jobs_dir / f'{uuid.uuid4().hex}.apkg')
+        self._evict_finished()
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f'The queue is full ({self._queue.maxsize} jobs)')
+            self.jobs[job.id] = job
+        logging.info(f"Queued the job {job.id} for the deck '{job.spec['deck_name']}' of {job.total} words")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def delete(self, job_id):
+        """Forget a finished job and remove its deck. Returns False for unfinished jobs."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in ('queued', 'running'):
+                return False
+            del self.jobs[job_id]
+        job.output.unlink(missing_ok=True)
+        return True
+
+    def _evict_finished(self, incoming=0):
+        """Forget finished jobs older than `job_ttl` and the oldest ones over `max_finished_jobs`"""
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self.jobs.values() if job.finished is not None), key=lambda job: job.finished
+            )
+            excess = len(finished) + incoming - self.max_finished_jobs
+            evicted = [
+                job for i, job in enumerate(finished) if i < excess or now - job.finished > self.job_ttl
+            ]
+            for job in evicted:
+                del self.jobs[job.id]
+        for job in evicted:
+            job.output.unlink(missing_ok=True)
+        if evicted:
+            logging.info(f'Removed {len(evicted)} finished jobs')
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _run_job(self, job):
+        def update_progress(current, total):
+            job.processed = current
+
+        deck = {key: value for key, value in job.spec.items() if key not in ('words', 'workers')}
+        deck['output'] = str(job.output)
+        job.status = 'running'
+        logging.info(f'Running the job {job.id}...')
+        try:
+            job.failed_words = self.builder.build(
+                deck, words=job.spec['words'], workers=job.spec.get('workers'), progress_callback=update_progress,
+            )
+            status = 'done'
+        except Exception as e:
+            logging.error(f'The job {job.id} failed: {e}')
+            job.error = str(e)
+            status = 'failed'
+        # Make room before the job shows up as finished
+        self._evict_finished(incoming=1)
+        job.finished = time.time()
+        job.status = status
+
+    def close(self):
+        for _ in self._runners:
+            self._queue.put(None)
+        for runner in self._runners:
+            runner.join()
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    # The service is reached by `self.server.service`
+
+    def log_message(self, format, *args):
+        logging.info(f'{self.address_string()} - {format % args}')
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def _find_job(self, parts):
+        job = self.server.service.get(parts[1]) if len(parts) >= 2 else None
+        if job is None:
+            self._send_error(404, 'Unknown job')
+        return job
+
+    def _path_parts(self):
+        return [part for part in self.path.split('?', 1)[0].split('/') if part]
+
+    def do_POST(self):
+        if self._path_parts() != ['jobs']:
+            self._send_error(404, 'Not found')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = self.server.service.submit(json.loads(self.rfile.read(length)))
+        except QueueFull as e:
+            self._send_error(503, str(e))
+            return
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+        self._send_json(202, job.to_json())
+
+    def do_GET(self):
+        parts = self._path_parts()
+        if parts == ['jobs']:
+            self._send_json(200, [job.to_json() for job in list(self.server.service.jobs.values())])
+            return
+        if not parts or parts[0] != 'jobs' or len(parts) > 3 or (len(parts) == 3 and parts[2] != 'deck'):
+            self._send_error(404, 'Not found')
+            return
+        job = self._find_job(parts)
+        if job is None:
+            return
+        if len(parts) == 2:
+            self._send_json(200, job.to_json())
+            return
+        if job.status != 'done':
+            self._send_error(409, f'The job is {job.status}')
+            return
+        file_name = ''.join(c for c in job.spec['deck_name'] if c.isalnum() or c in ' -_').strip() or 'deck'
+        with job.output.open('rb') as f:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(job.output.stat().st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{file_name}.apkg"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send_error(404, 'Not found')
+            return
+        job = self._find_job(parts)
+        if job is None:
+            return
+        if not self.server.service.delete(job.id):
+            self._send_error(409, f'The job is {job.status}')
+            return
+        self._send_json(200, {'id': job.id, 'deleted': True})
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, ServiceRequestHandler)
+        self.service = service
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='anki-deck-service',
+        description='Run a local service generating Anki decks through an HTTP/JSON API',
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: %(default)s)')
+    parser.add_argument('--jobs-dir', help='Directory of the generated decks (default: a temporary directory)')
+    parser.add_argument(
+        '--max-queued',
+        type=int,
+        default=16,
+        help='Jobs waiting in the queue before new ones are refused (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--concurrent-jobs',
+        type=int,
+        default=1,
+        help='Number of jobs running at once (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Maximum number of words of one job processed concurrently (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=RateLimiter.DEFAULT_RATE,
+        help='Maximum requests per second sent to each host (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--dictionary',
+        action='append',
+        default=[],
+        metavar='NAME=DIR',
+        help='Offline dictionary jobs may use by its name, can be repeated',
+    )
+    parser.add_argument(
+        '--usage-index',
+        action='append',
+        default=[],
+        metavar='NAME=DIR',
+        help='Offline usage index jobs may use by its name, can be repeated',
+    )
+    parser.add_argument(
+        '--job-ttl',
+        type=float,
+        default=JOB_TTL / 60 / 60,
+        help='Hours finished jobs and their decks are kept (default: %(default)g)',
+    )
+    parser.add_argument(
+        '--max-finished-jobs',
+        type=int,
+        default=MAX_FINISHED_JOBS,
+        help='Finished jobs kept at most, the oldest are removed first (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=str(default_cache_dir()),
+        help='Directory of the persistent lookup cache (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--media-dir',
+        default=str(default_cache_dir() / 'media'),
+        help='Directory of the media store reused across runs and decks (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the lookup cache and keep media while the service runs only',
+    )
+    args = parser.parse_args()
+    presets = {}
+    for option in ('dictionary', 'usage_index'):
+        presets[option] = {}
+        for preset in getattr(args, option):
+            name, _, path = preset.partition('=')
+            if not name or not path:
+                parser.error(f"Invalid --{option.replace('_', '-')} value: {preset}")
+            presets[option][name] = str(Path(path).resolve())
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from anki_language_deck_generator.http_pool import HttpPool
+
+    with tempfile.TemporaryDirectory() as working_dir:
+        cache = None
+        media_store = None
+        if not args.no_cache:
+            cache = LookupCache(Path(args.cache_dir) / 'lookups.sqlite')
+            media_store = MediaStore(args.media_dir)
+        metrics = Metrics()
+        threads = args.workers * args.concurrent_jobs
+        builder = BatchBuilder(
+            working_dir,
+            workers=args.workers,
+            threads=threads,
+            cache=cache,
+            media_store=media_store,
+            http_pool=HttpPool(
+                pool_size=max(HttpPool.DEFAULT_POOL_SIZE, threads),
+                rate_limiter=RateLimiter(default_rate=args.rate_limit),
+                metrics=metrics,
+            ),
+            metrics=metrics,
+        )
+        service = GenerationService(
+            builder,
+            args.jobs_dir or Path(working_dir) / 'jobs',
+            max_queued=args.max_queued,
+            concurrent_jobs=args.concurrent_jobs,
+            dictionaries=presets['dictionary'],
+            usage_indexes=presets['usage_index'],
+            job_ttl=args.job_ttl * 60 * 60,
+            max_finished_jobs=args.max_finished_jobs,
+        )
+        server = ServiceServer((args.host, args.port), service)
+        logging.info(f'Listening on http://{args.host}:{server.server_address[1]}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+            builder.close()
+            if cache is not None:
+                cache.close()
+            builder.media_store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Sharded deck builds across processes or machines.
+
+Every word belongs to one of N shards by a stable hash, so any process can
+tell its words apart without coordination. A shard is built like a resumable
+build in its own directory `<shard dir>/shard-<K>` and leaves its notes in
+the build journal there. The merge reads the words again and adds the notes
+from the journals in input order, so the merged deck does not depend on
+which shard finished first.
+"""
+import logging
+import os
+import subprocess
+import sys
+import zlib
+from pathlib import Path
+from anki_language_deck_generator.journal import BuildJournal
+
+
+def shard_of(word, shards):
+    """Return the index of the shard building the word"""
+    return zlib.crc32(word.encode('utf-8')) % shards
+
+
+def shard_dir(root, index):
+    return Path(root) / f'shard-{index}'
+
+
+def iter_shard_words(words, index, shards, normalizer=None):
+    """
+    Yield the words of one shard, keeping empty lines so progress still counts
+    them. With a `WordNormalizer`, words are sharded by their normalized form,
+    so all spellings of a word are built by the same shard.
+    """
+    for word in words:
+        key = normalizer.key(word) if normalizer is not None else word.strip()
+        if not key or shard_of(key, shards) == index:
+            yield word
+
+
+def budget_args(shards, rate_limit, host_rates, image_processes=None, voice_processes=None):
+    """
+    Return the options giving every shard process its share of the request
+    rates and of the CPUs, so N shards do not send N times the requests or
+    start N times the worker processes. Options given later on the command
+    line override earlier ones.
+    """
+    args = ['--rate-limit', f'{rate_limit / shards:g}']
+    for host, rate in host_rates.items():
+        args += ['--host-rate-limit', f'{host}={rate / shards:g}']
+    cpus = os.cpu_count() or 1
+    args += ['--image-processes', str(max(1, (image_processes or cpus) // shards))]
+    args += ['--voice-processes', str(max(1, (voice_processes or cpus) // shards))]
+    return args
+
+
+def run_shards(argv, shards, root):
+    """
+    Build all shards at once, each in a process running the command line
+    `argv` with `--shard-index`. Raises RuntimeError if any shard fails.
+    """
+    processes = []
+    for index in range(shards):
+        command = [
+            sys.executable, '-m', 'anki_language_deck_generator', *argv,
+            '--shard-dir', str(root), '--shard-index', str(index),
+        ]
+        processes.append(subprocess.Popen(command))
+    logging.info(f'Started {shards} shard processes')
+    failed = [index for index, process in enumerate(processes) if process.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shards {', '.join(map(str, failed))} failed, rerun with --resume to finish them")
+
+
+def merge_shards(generator, words, root, shards, normalizer=None):
+    """
+    Add the notes built by the shards to the generator, every word once and in
+    the order of `words`. Pass the same kind of `WordNormalizer` the shards used.
+    """
+    journals = []
+    for index in range(shards):
+        path = shard_dir(root, index) / BuildJournal.FILE_NAME
+        if not path.exists():
+            raise RuntimeError(f'The shard {index} has no results in {path.parent}')
+        journals.append(BuildJournal(path, resume=True))
+    try:
+        seen = set()
+        for word in words:
+            word = word.strip()
+            if not word or word in seen:
+                continue
+            seen.add(word)
+            key = word
+            if normalizer is not None:
+                key = normalizer.key(word)
+                word = normalizer.deduplicate(word)
+                if word is None:
+                    continue
+            journal = journals[shard_of(key, shards)]
+            generator.add_finished_word(word, journal.get_done(word), journal.get_failure(word))
+    finally:
+        for journal in journals:
+            journal.close()
+    logging.info(f'Merged {len(seen)} words from {shards} shards')
@@ -0,0 +1,113 @@
+import mmap
+import os
+import struct
+import uuid
+from pathlib import Path
+
+MAGIC = b'ALDGTBL1'
+HEADER = struct.Struct('<8sQ')
+OFFSET = struct.Struct('<Q')
+
+
+def write_table(path, items):
+    """
+    Write (key, value) pairs into a table file readable with `SortedTable`.
+
+    Keys are strings and values bytes. The pairs are sorted in memory, a later
+    pair replaces an earlier one with the same key. The file is written under a
+    temporary name and renamed, so readers never see a partial table.
+    """
+    records = {}
+    for key, value in items:
+        records[key.encode('utf-8')] = value
+    keys = sorted(records)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+    with temp_path.open('wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        # Offsets of all keys and then of all values, each with an end offset,
+        # relative to the start of the data that follows them
+        offset = 0
+        for key in keys:
+            f.write(OFFSET.pack(offset))
+            offset += len(key)
+        f.write(OFFSET.pack(offset))
+        for key in keys:
+            f.write(OFFSET.pack(offset))
+            offset += len(records[key])
+        f.write(OFFSET.pack(offset))
+        for key in keys:
+            f.write(key)
+        for key in keys:
+            f.write(records[key])
+    os.replace(temp_path, path)
+    return len(keys)
+
+
+class SortedTable:
+    """
+    Read-only on-disk map from strings to bytes.
+
+    The file is memory-mapped and keys are found by binary search over the
+    sorted key array, so opening a table is instant, a lookup touches only a
+    few pages and the operating system shares the pages between processes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.path.open('rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{self.path} is not a table file')
+        self._key_offsets = HEADER.size
+        self._value_offsets = self._key_offsets + (self._count + 1) * OFFSET.size
+        self._data = self._value_offsets + (self._count + 1) * OFFSET.size
+
+    def __len__(self):
+        return self._count
+
+    def _slice(self, offsets, index):
+        start, end = struct.unpack_from('<QQ', self._map, offsets + index * OFFSET.size)
+        return self._map[self._data + start:self._data + end]
+
+    def _key(self, index):
+        return self._slice(self._key_offsets, index)
+
+    def _find(self, key):
+        key = key.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == key:
+            return low
+        return None
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        if index is None:
+            return default
+        return self._slice(self._value_offsets, index)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def keys(self):
+        for index in range(self._count):
+            yield self._key(index).decode('utf-8')
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,194 @@
+"""
+Offline usage examples built from the Tatoeba exports.
+
+`build_usage_index` reads the `sentences.csv` and `links.csv` exports
+(https://tatoeba.org/downloads) once and writes an index directory for one
+language pair. `OfflineUsageFetcher` answers usage lookups from it like
+`UsageExampleFetcher` does, but without network requests or rate limits:
+
+    python -m anki_language_deck_generator.tatoeba_index sentences.csv.bz2 links.csv.bz2 \
+        --source-language Dutch --target-language English -o tatoeba-nl-en
+"""
+import argparse
+import json
+import logging
+import re
+import struct
+from pathlib import Path
+from anki_language_deck_generator.language_codes import get_language_codes
+from anki_language_deck_generator.sorted_table import SortedTable, write_table
+from anki_language_deck_generator.words_file import open_text_file
+
+# The same sentence length rule as the online lookups use
+MIN_WORDS = 5
+MAX_WORDS = 10
+USAGES = 2
+META_FILE = 'meta.json'
+SENTENCES_FILE = 'sentences.table'
+TOKENS_FILE = 'tokens.table'
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.casefold())
+
+
+def _read_sentences(path):
+    with open_text_file(path) as f:
+        for line in f:
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) < 3 or not columns[0].isdigit():
+                continue
+            yield int(columns[0]), columns[1], columns[2]
+
+
+def _read_links(path):
+    with open_text_file(path) as f:
+        for line in f:
+            columns = line.split('\t')
+            if len(columns) < 2 or not columns[0].isdigit() or not columns[1].strip().isdigit():
+                continue
+            yield int(columns[0]), int(columns[1])
+
+
+def _language_codes(source_language, target_language):
+    # Imported here, the online fetcher pulls in the HTTP stack
+    from anki_language_deck_generator.tatoeba_usage_fetcher import UsageExampleFetcher
+
+    return get_language_codes(source_language, target_language, UsageExampleFetcher.LANGUAGES)
+
+
+def build_usage_index(sentences_path, links_path, source_language, target_language, index_dir):
+    """
+    Build the usage index of a language pair from the Tatoeba exports.
+
+    The exports are streamed three times (sentences, links, sentences again),
+    so only the source sentences of a usable length and their translations are
+    kept in memory. Every word keeps all its sentence ids: a phrase matches
+    sentences containing all its words, which a truncated list could miss.
+    Returns the number of indexed sentences.
+    """
+    source_code, target_code = _language_codes(source_language, target_language)
+
+    sources = {}
+    for sentence_id, language, text in _read_sentences(sentences_path):
+        if language == source_code and MIN_WORDS <= len(text.split()) <= MAX_WORDS:
+            sources[sentence_id] = text
+    logging.info(f'Found {len(sources)} {source_language} sentences of {MIN_WORDS}-{MAX_WORDS} words')
+
+    linked = {}
+    for sentence_id, translation_id in _read_links(links_path):
+        if sentence_id in sources:
+            linked.setdefault(sentence_id, []).append(translation_id)
+    needed = {translation_id for translation_ids in linked.values() for translation_id in translation_ids}
+
+    translations = {}
+    for sentence_id, language, text in _read_sentences(sentences_path):
+        if language == target_code and sentence_id in needed:
+            translations[sentence_id] = text
+
+    # Like the online lookups, only sentences translated to the target language are used
+    sentences = {}
+    for sentence_id in sorted(linked):
+        translation = next((translations[i] for i in linked[sentence_id] if i in translations), None)
+        if translation is not None:
+            sentences[sentence_id] = (sources[sentence_id], translation)
+
+    postings = {}
+    for sentence_id, (text, _) in sentences.items():
+        for token in dict.fromkeys(tokenize(text)):
+            postings.setdefault(token, []).append(sentence_id)
+
+    index_dir = Path(index_dir)
+    write_table(
+        index_dir / SENTENCES_FILE,
+        ((str(sentence_id), json.dumps(value, ensure_ascii=False).encode('utf-8'))
+         for sentence_id, value in sentences.items()),
+    )
+    write_table(
+        index_dir / TOKENS_FILE,
+        ((token, struct.pack(f'<{len(ids)}I', *ids)) for token, ids in postings.items()),
+    )
+    meta = {
+        'source_language': source_code,
+        'target_language': target_code,
+        'sentences': len(sentences),
+        'tokens': len(postings),
+    }
+    (index_dir / META_FILE).write_text(json.dumps(meta), encoding='utf-8')
+    logging.info(f'Indexed {len(sentences)} sentences with {len(postings)} distinct words in {index_dir}')
+    return len(sentences)
+
+
+class OfflineUsageFetcher:
+    """Usage examples looked up in an index built by `build_usage_index`, a drop-in for `UsageExampleFetcher`"""
+    NAME = 'tatoeba-index'
+    # Answered from a local table, so the generator does not cache the lookups
+    OFFLINE = True
+
+    def __init__(self, index_dir, source_language=None, target_language=None):
+        self.index_dir = Path(index_dir)
+        meta = json.loads((self.index_dir / META_FILE).read_text(encoding='utf-8'))
+        if source_language is not None and target_language is not None:
+            languages = _language_codes(source_language, target_language)
+            if languages != (meta['source_language'], meta['target_language']):
+                raise ValueError(
+                    f"The usage index {self.index_dir} is built for "
+                    f"{meta['source_language']}-{meta['target_language']}, not {'-'.join(languages)}"
+                )
+        self.sentences = SortedTable(self.index_dir / SENTENCES_FILE)
+        self.tokens = SortedTable(self.index_dir / TOKENS_FILE)
+
+    def _postings(self, token):
+        value = self.tokens.get(token)
+        if value is None:
+            return []
+        return struct.unpack(f'<{len(value) // 4}I', value)
+
+    def find_sentences(self, word, limit=USAGES):
+        """Return up to `limit` (sentence, translation) pairs containing all words of `word`"""
+        tokens = tokenize(word)
+        if not tokens:
+            return []
+        # Start from the rarest word, the posting lists are sorted by sentence id
+        postings = sorted((self._postings(token) for token in dict.fromkeys(tokens)), key=len)
+        ids = postings[0]
+        for other in postings[1:]:
+            other = set(other)
+            ids = [sentence_id for sentence_id in ids if sentence_id in other]
+            if not ids:
+                break
+        return [json.loads(self.sentences.get(str(sentence_id))) for sentence_id in ids[:limit]]
+
+    def fetch_usage(self, word):
+        result = []
+        for text, translation in self.find_sentences(word):
+            result.append(f'<b>{text}</b>')
+            result.append(translation)
+        return '<br>'.join(result)
+
+    async def fetch_usage_async(self, word, client=None):
+        return self.fetch_usage(word)
+
+    def close(self):
+        self.sentences.close()
+        self.tokens.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='anki-deck-tatoeba-index',
+        description='Build an offline usage index from the Tatoeba sentences and links exports',
+    )
+    parser.add_argument('sentences', help='sentences.csv export, may be compressed with gzip or bzip2')
+    parser.add_argument('links', help='links.csv export, may be compressed with gzip or bzip2')
+    parser.add_argument('--source-language', required=True, help='Language of the usage examples')
+    parser.add_argument('--target-language', required=True, help='Language of their translations')
+    parser.add_argument('-o', '--output', required=True, help='Directory of the index')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_usage_index(args.sentences, args.links, args.source_language, args.target_language, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 from urllib.parse import urlencode
-import requests
+from anki_language_deck_generator.failures import HttpStatusError
+from anki_language_deck_generator.http_pool import HttpPool
 from anki_language_deck_generator.language_codes import get_language_codes
 
 
 class UsageExampleFetcher:
+    NAME = 'tatoeba'
     TATOEBA_URL = 'https://tatoeba.org/ru/api_v0/search'
     LANGUAGES = {
         'Arabic': 'ara',
@@ -31,18 +33,18 @@ class UsageExampleFetcher:
         'Turkish': 'tur'
     }
 
-    def __init__(self, source_language, target_language):
+    def __init__(self, source_language, target_language, http_pool=None):
         self.source_language, self.target_language = get_language_codes(
             source_language, target_language, self.LANGUAGES
         )
-        self.session = requests.Session()
+        self.http_pool = http_pool or HttpPool()
 
     def _get_usage_translation(self, usage):
         for translation_array in usage['translations']:
             for translation in translation_array:
                 return translation['text']
 
-    def fetch_usage(self, word):
+    def _make_url(self, word):
         params = {
             'from': self.source_language,
             'to': self.target_language,
@@ -55,11 +57,11 @@ class UsageExampleFetcher:
             'word_count_min': '5',
             'word_count_max': '10',
         }
-        url = f'{self.TATOEBA_URL}?{urlencode(params)}'
+        return f'{self.TATOEBA_URL}?{urlencode(params)}'
 
-        response = self.session.get(url)
+    def _parse_usages(self, response):
         if response.status_code != 200:
-            raise Exception(f'Failed to get usage examples: {response.status_code}')
+            raise HttpStatusError(f'Failed to get usage examples: {response.status_code}', response.status_code)
         usages = response.json()['results']
         result = []
         for i in range(2):
@@ -69,3 +71,13 @@ class UsageExampleFetcher:
             result.append(self._get_usage_translation(usages[i]))
 
         return '<br>'.join(result)
+
+    def fetch_usage(self, word):
+        response = self.http_pool.get(self._make_url(word))
+        return self._parse_usages(response)
+
+    async def fetch_usage_async(self, word, client):
+        import asyncio
+
+        response = await client.get(self._make_url(word))
+        return await asyncio.get_running_loop().run_in_executor(None, self._parse_usages, response)
@@ -0,0 +1,77 @@
+import json
+import sqlite3
+import zipfile
+import genanki
+import pytest
+from anki_language_deck_generator.apkg_merge import merge_packages, rename_media
+from anki_language_deck_generator.apkg_writer import ApkgWriter
+
+MODEL = genanki.Model(1, 'Model', fields=[{'name': 'Word'}, {'name': 'Media'}], templates=[
+    {'name': 'Card', 'qfmt': '{{Word}}', 'afmt': '{{Media}}'},
+])
+
+
+def make_package(path, deck_id, notes, media):
+    deck = genanki.Deck(deck_id, f'Deck {deck_id}')
+    for word, field, guid in notes:
+        deck.add_note(genanki.Note(model=MODEL, fields=[word, field], guid=guid))
+    writer = ApkgWriter(path)
+    for name, content in media.items():
+        media_file = path.parent / name
+        media_file.write_bytes(content)
+        writer.add_media(media_file)
+        media_file.unlink()
+    writer.finish(deck)
+    return path
+
+
+def read_package(path, tmp_path):
+    with zipfile.ZipFile(path) as package:
+        media = {name: package.read(entry) for entry, name in json.loads(package.read('media')).items()}
+        package.extract('collection.anki2', tmp_path / 'merged')
+    connection = sqlite3.connect(tmp_path / 'merged' / 'collection.anki2')
+    notes = connection.execute('SELECT guid, flds FROM notes ORDER BY id').fetchall()
+    connection.close()
+    return [(guid, fields.split('\x1f')) for guid, fields in notes], media
+
+
+@pytest.fixture
+def packages(tmp_path):
+    first = make_package(tmp_path / 'first.apkg', 10, [
+        ('de hond', '<img src="hond.jpg">[sound:hond.mp3]', 'guid-hond'),
+        ('kat', '[sound:kat.mp3]', 'guid-kat'),
+    ], {'hond.jpg': b'dog', 'hond.mp3': b'woof', 'kat.mp3': b'meow'})
+    second = make_package(tmp_path / 'second.apkg', 20, [
+        ('kat', '[sound:kat.mp3]', 'guid-kat'),
+        ('Hond', '[sound:other.mp3]', 'guid-other-hond'),
+        ('vis', '<img class="x" src="hond.jpg">[sound:vis.mp3]', 'guid-vis'),
+    ], {'kat.mp3': b'meow', 'other.mp3': b'woof', 'hond.jpg': b'fish', 'vis.mp3': b'blub', 'unused.mp3': b'?'})
+    return first, second
+
+
+def test_merge_by_guid(packages, tmp_path):
+    merger = merge_packages(packages, tmp_path / 'merged.apkg')
+
+    notes, media = read_package(tmp_path / 'merged.apkg', tmp_path)
+    assert [guid for guid, _ in notes] == ['guid-hond', 'guid-kat', 'guid-other-hond', 'guid-vis']
+    # The same content under another name points to the stored file
+    assert notes[2][1] == ['Hond', '[sound:hond.mp3]']
+    # Another content under a taken name is renamed
+    vis_image = notes[3][1][1].split('"')[3]
+    assert vis_image.startswith('hond-') and media[vis_image] == b'fish'
+    assert sorted(media) == sorted(['hond.jpg', 'hond.mp3', 'kat.mp3', vis_image, 'vis.mp3'])
+    assert (merger.notes, merger.duplicate_notes, merger.duplicate_media) == (4, 1, 1)
+
+
+def test_merge_by_word(packages, tmp_path):
+    merger = merge_packages(packages, tmp_path / 'merged.apkg', key='word')
+
+    notes, _ = read_package(tmp_path / 'merged.apkg', tmp_path)
+    assert [fields[0] for _, fields in notes] == ['de hond', 'kat', 'Hond', 'vis']
+    assert merger.duplicate_notes == 1
+
+
+def test_rename_media():
+    renames = {'a.mp3': 'b.mp3', 'a.jpg': 'b.jpg'}
+
+    assert rename_media('[sound:a.mp3] <img src="a.jpg"> a.mp3', renames) == '[sound:b.mp3] <img src="b.jpg"> a.mp3'
@@ -0,0 +1,48 @@
+import json
+import sqlite3
+import zipfile
+import genanki
+from anki_language_deck_generator.apkg_writer import ApkgWriter
+
+
+def make_deck():
+    model = genanki.Model(1, 'Model', fields=[{'name': 'Word'}], templates=[
+        {'name': 'Card', 'qfmt': '{{Word}}', 'afmt': '{{Word}}'},
+    ])
+    deck = genanki.Deck(2, 'Deck')
+    deck.add_note(genanki.Note(model=model, fields=['hond']))
+    return deck
+
+
+def test_package_contents(tmp_path):
+    sound = tmp_path / 'hond.mp3'
+    sound.write_bytes(b'sound' * 100)
+    notes = tmp_path / 'hond.txt'
+    notes.write_text('text ' * 100)
+    output = tmp_path / 'deck.apkg'
+
+    writer = ApkgWriter(output)
+    assert writer.add_media(sound)
+    assert writer.add_media(notes)
+    assert not writer.add_media(sound)
+    writer.finish(make_deck())
+
+    assert output.exists()
+    assert not writer.temp_path.exists()
+    with zipfile.ZipFile(output) as package:
+        assert json.loads(package.read('media')) == {'0': 'hond.mp3', '1': 'hond.txt'}
+        assert package.read('0') == sound.read_bytes()
+        assert package.getinfo('0').compress_type == zipfile.ZIP_STORED
+        assert package.getinfo('1').compress_type == zipfile.ZIP_DEFLATED
+        assert package.getinfo('collection.anki2').compress_type == zipfile.ZIP_DEFLATED
+        package.extract('collection.anki2', tmp_path)
+    connection = sqlite3.connect(tmp_path / 'collection.anki2')
+    assert connection.execute('SELECT flds FROM notes').fetchall() == [('hond',)]
+    connection.close()
+
+
+def test_abort_removes_partial_package(tmp_path):
+    writer = ApkgWriter(tmp_path / 'deck.apkg')
+    writer.abort()
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,144 @@
+import json
+import zipfile
+import pytest
+from anki_language_deck_generator.batch import BatchBuilder, SharedNotes, load_manifest
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+
+
+def write_manifest(path, manifest):
+    path.write_text(json.dumps(manifest), encoding='utf-8')
+    return path
+
+
+def test_load_manifest_applies_defaults(tmp_path):
+    manifest = write_manifest(tmp_path / 'decks.json', {
+        'defaults': {'source_language': 'Dutch', 'target_language': 'English'},
+        'decks': [
+            {'words_file': 'animals.txt', 'output': 'out/animals.apkg'},
+            {'deck_name': 'Food', 'words_file': 'food.txt', 'output': 'food.apkg', 'target_language': 'German',
+             'dictionary': 'dictionary-nl-de'},
+        ],
+    })
+
+    animals, food = load_manifest(manifest)
+
+    assert animals == {
+        'deck_name': 'animals',
+        'source_language': 'Dutch',
+        'target_language': 'English',
+        'words_file': str(tmp_path / 'animals.txt'),
+        'output': str(tmp_path / 'out' / 'animals.apkg'),
+        'translator': 'glosbe',
+    }
+    assert food['target_language'] == 'German'
+    assert food['translator'] == 'dictionary+glosbe'
+
+
+def test_load_yaml_manifest(tmp_path):
+    manifest = tmp_path / 'decks.yaml'
+    manifest.write_text(
+        'decks:\n'
+        '  - {source_language: Dutch, target_language: English, words_file: a.txt, output: a.apkg}\n',
+        encoding='utf-8',
+    )
+
+    assert load_manifest(manifest)[0]['output'] == str(tmp_path / 'a.apkg')
+
+
+@pytest.mark.parametrize('deck, message', [
+    ({'source_language': 'Dutch', 'words_file': 'a.txt', 'output': 'a.apkg'}, 'target_language'),
+    ({'source_language': 'Dutch', 'target_language': 'English', 'words_file': 'a.txt', 'output': 'a.apkg',
+      'colour': 'red'}, 'colour'),
+])
+def test_invalid_manifest(tmp_path, deck, message):
+    manifest = write_manifest(tmp_path / 'decks.json', {'decks': [deck]})
+
+    with pytest.raises(ValueError, match=message):
+        load_manifest(manifest)
+
+
+def test_overlapping_words_are_built_once(tmp_path, monkeypatch):
+    built = []
+
+    def fake_make_note(self, word):
+        built.append(word)
+        return self._build_note(word, f'{word}-translation', '', None, None, None, None, None, None)
+
+    monkeypatch.setattr(AnkiDeckGenerator, '_make_note', fake_make_note)
+    (tmp_path / 'animals.txt').write_text('hond\nkat\n', encoding='utf-8')
+    (tmp_path / 'pets.txt').write_text('kat\nvis\n', encoding='utf-8')
+    decks = load_manifest(write_manifest(tmp_path / 'decks.json', {
+        'defaults': {'source_language': 'Dutch', 'target_language': 'English'},
+        'decks': [
+            {'words_file': 'animals.txt', 'output': 'animals.apkg'},
+            {'words_file': 'pets.txt', 'output': 'pets.apkg'},
+            {'words_file': 'pets.txt', 'output': 'pets-de.apkg', 'target_language': 'German'},
+        ],
+    }))
+
+    builder = BatchBuilder(tmp_path / 'work', workers=2)
+    try:
+        for deck in decks:
+            assert builder.build(deck) == []
+    finally:
+        builder.close()
+        builder.media_store.close()
+
+    assert built == ['hond', 'kat', 'vis', 'kat', 'vis']
+    assert builder.metrics.caches['shared_notes'] == {'hits': 1, 'misses': 5}
+    for name in ('animals', 'pets', 'pets-de'):
+        assert zipfile.is_zipfile(tmp_path / f'{name}.apkg')
+
+
+def test_shared_notes_keep_recent_words():
+    notes = SharedNotes(max_notes=2)
+    notes.setdefault('hond', 'dog')
+    notes.setdefault('kat', 'cat')
+    assert notes.get('hond') == 'dog'
+    notes.setdefault('vis', 'fish')
+
+    assert len(notes) == 2
+    assert notes.get('kat') is None
+    assert (notes.get('hond'), notes.get('vis')) == ('dog', 'fish')
+    assert notes.setdefault('vis', 'other fish') == 'fish'
+
+
+def test_failed_build_removes_working_dir(tmp_path, monkeypatch):
+    def fail(self, words, **kwargs):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(AnkiDeckGenerator, 'add_words', fail)
+    deck = {'deck_name': 'Animals', 'source_language': 'Dutch', 'target_language': 'English',
+            'translator': 'glosbe', 'output': str(tmp_path / 'animals.apkg')}
+    builder = BatchBuilder(tmp_path / 'work')
+    try:
+        with pytest.raises(OSError):
+            builder.build(deck, words=['hond'])
+    finally:
+        builder.close()
+        builder.media_store.close()
+
+    assert sorted(path.name for path in (tmp_path / 'work').iterdir()) == ['media']
+    assert list(tmp_path.glob('animals.apkg*')) == []
+
+
+def test_notes_are_only_shared_between_decks_built_alike(tmp_path, monkeypatch):
+    built = []
+
+    def fake_make_note(self, word):
+        built.append(word)
+        return self._build_note(word, f'{word}-translation', '', None, None, None, None, None, None)
+
+    monkeypatch.setattr(AnkiDeckGenerator, '_make_note', fake_make_note)
+    deck = {'deck_name': 'Animals', 'source_language': 'Dutch', 'target_language': 'English', 'translator': 'glosbe',
+            'output': str(tmp_path / 'animals.apkg')}
+    builder = BatchBuilder(tmp_path / 'work')
+    try:
+        builder.build(deck, words=['hond'])
+        builder.build(dict(deck, output=str(tmp_path / 'pets.apkg')), words=['hond'])
+        builder.build(dict(deck, output=str(tmp_path / 'raw.apkg'), normalize_words=False), words=['hond'])
+    finally:
+        builder.close()
+        builder.media_store.close()
+
+    assert built == ['hond', 'hond']
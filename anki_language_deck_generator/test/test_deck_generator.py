@@ -0,0 +1,160 @@
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+import pytest
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.journal import BuildJournal
+from anki_language_deck_generator.media_store import MediaStore
+
+
+class FakeNote:
+    def __init__(self, word):
+        self.fields = [word]
+        self.guid = f'guid-{word}'
+
+
+def fake_make_note(word):
+    time.sleep(random.random() / 100)
+    if word.startswith('bad'):
+        raise RuntimeError(f"Cannot find translations for word '{word}'")
+    return FakeNote(word), []
+
+
+@pytest.fixture
+def make_generator(tmp_path, monkeypatch):
+    def make(**kwargs):
+        generator = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path, **kwargs)
+        monkeypatch.setattr(generator, '_make_note', fake_make_note)
+        return generator
+    return make
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_add_words_keeps_order(make_generator, workers):
+    progress = []
+    generator = make_generator(workers=workers, progress_callback=lambda i, n: progress.append((i, n)))
+    words = [f'word{i}\n' for i in range(20)] + ['bad1\n', '\n', 'word20\n', 'bad2\n']
+
+    generator.add_words(words)
+
+    assert [note.fields[0] for note in generator.deck.notes] == [f'word{i}' for i in range(21)]
+    assert generator.failed_words == ['bad1', 'bad2']
+    assert progress[-1] == (len(words), len(words))
+    assert [i for i, _ in progress] == sorted(i for i, _ in progress)
+
+
+def test_add_words_rejects_empty_words(make_generator):
+    generator = make_generator(workers=4)
+    with pytest.raises(ValueError):
+        generator.add_words(['word', ''], skip_empty=False)
+
+
+def test_add_words_async_keeps_order(make_generator, monkeypatch):
+    pytest.importorskip('httpx')
+
+    async def fake_make_note_async(word, client):
+        await asyncio.sleep(random.random() / 100)
+        return fake_make_note(word)
+
+    progress = []
+    generator = make_generator(progress_callback=lambda i, n: progress.append((i, n)))
+    monkeypatch.setattr(generator, '_make_note_async', fake_make_note_async)
+    words = [f'word{i}' for i in range(20)] + ['bad1', '', 'word20']
+
+    asyncio.run(generator.add_words_async(words, concurrency=5))
+
+    assert [note.fields[0] for note in generator.deck.notes] == [f'word{i}' for i in range(21)]
+    assert generator.failed_words == ['bad1']
+    assert progress[-1] == (len(words), len(words))
+
+
+def test_resume_skips_finished_words(make_generator, tmp_path, monkeypatch):
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    generator = make_generator(journal=journal)
+    generator.add_words(['word1', 'bad1', 'word2'])
+    journal.close()
+
+    made = []
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME, resume=True)
+    resumed = make_generator(journal=journal)
+    monkeypatch.setattr(resumed, '_make_note', lambda word: made.append(word) or fake_make_note(word))
+    resumed.add_words(['word1', 'bad1', 'word2', 'word3'])
+    journal.close()
+
+    assert made == ['bad1', 'word3']
+    assert [note.fields[0] for note in resumed.deck.notes] == ['word1', 'word2', 'word3']
+    assert resumed.deck.deck_id == generator.deck.deck_id
+    assert resumed.model.model_id == generator.model.model_id
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_add_words_streams_iterables(make_generator, workers):
+    progress = []
+    generator = make_generator(workers=workers, progress_callback=lambda i, n: progress.append((i, n)))
+
+    generator.add_words(f'word{i}\n' for i in range(10))
+
+    assert [note.fields[0] for note in generator.deck.notes] == [f'word{i}' for i in range(10)]
+    assert progress[-1] == (10, None)
+
+
+def test_slow_word_bounds_the_window(tmp_path):
+    taken = []
+    taken_while_slow = []
+    release = threading.Event()
+
+    def make_note(word):
+        if word == 'slow':
+            release.wait(5)
+        return FakeNote(word), []
+
+    def words():
+        for i in range(100):
+            taken.append(i)
+            yield 'slow' if i == 0 else f'word{i}'
+
+    def release_slow_word():
+        taken_while_slow.append(len(taken))
+        release.set()
+
+    generator = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path, workers=2)
+    generator._make_note = make_note
+    threading.Timer(0.3, release_slow_word).start()
+    generator.add_words(words())
+
+    # Finished words wait behind the slow one, no more than the window of 2 * workers
+    assert taken_while_slow == [4]
+    assert len(generator.deck.notes) == 100
+
+
+def test_wiktionary_index_answers_without_lookups(tmp_path, monkeypatch):
+    class FakeIndex:
+        def get_fields(self, word):
+            return {'article': 'de', 'transcription': None, 'part_of_speech': None, 'plural': None,
+                    'image_url': None, 'sound_url': None} if word == 'hond' else None
+
+    generator = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path, wiktionary_index=FakeIndex())
+    looked_up = []
+    monkeypatch.setattr(
+        'anki_language_deck_generator.dutch_wiktionary.DutchWiktionaryWord.__init__',
+        lambda self, word, *args, **kwargs: looked_up.append(word) or setattr(self, 'fields', {}),
+    )
+
+    assert generator._lookup_wiktionary('hond').try_get_article() == 'de'
+    generator._lookup_wiktionary('kat')
+    assert looked_up == ['kat']
+
+
+def test_close_closes_only_an_own_media_store(tmp_path):
+    own = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path / 'own')
+    own.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        own.media_store.get('gtts', 'Dutch', 'hond')
+
+    store = MediaStore(tmp_path / 'media')
+    shared = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path / 'shared', media_store=store)
+    shared.close()
+    assert store.get('gtts', 'Dutch', 'hond') is None
+    store.close()
@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+import json
+import pytest
+from anki_language_deck_generator.translators import create_translator
+from anki_language_deck_generator.translators.dictionary import Translator, build_dictionary_index
+from anki_language_deck_generator.translators.fallback import FallbackTranslator
+
+ENTRIES = [
+    {'word': 'hond', 'lang_code': 'nl', 'senses': [{'glosses': ['dog']}, {'glosses': ['scoundrel']}]},
+    {'word': 'Huis', 'lang_code': 'nl', 'translations': [{'code': 'en', 'word': 'house'}]},
+    {'word': 'cat', 'lang_code': 'en', 'translations': [
+        {'code': 'nl', 'word': 'kat'}, {'code': 'de', 'word': 'Katze'}, {'code': 'nl', 'word': 'poes'},
+    ]},
+    {'word': 'Hund', 'lang_code': 'de', 'senses': [{'glosses': ['dog']}]},
+    # The table of a target word listed before the source word's own entry
+    {'word': 'bicycle', 'lang_code': 'en', 'translations': [{'code': 'nl', 'word': 'fiets'}]},
+    {'word': 'fiets', 'lang_code': 'nl', 'senses': [
+        {'glosses': ['plural of fiet'], 'tags': ['form-of']}, {'glosses': ['bike']},
+    ]},
+]
+
+
+@pytest.fixture
+def dictionary_dir(tmp_path):
+    dump = tmp_path / 'dump.jsonl.gz'
+    with gzip.open(dump, 'wt', encoding='utf-8') as f:
+        for entry in ENTRIES:
+            f.write(json.dumps(entry) + '\n')
+        f.write('not json\n')
+    assert build_dictionary_index(dump, 'Dutch', 'English', tmp_path / 'dictionary') == 5
+    return tmp_path / 'dictionary'
+
+
+def test_translate(dictionary_dir):
+    translator = Translator(dictionary_dir, 'Dutch', 'English')
+    assert translator.translate('hond') == 'dog'
+    assert translator.translate(' huis ') == 'house'
+    assert translator.translate('kat') == 'cat'
+    assert asyncio.run(translator.translate_async('poes')) == 'cat'
+    assert translator.translate('fiets') == 'bike'
+    with pytest.raises(RuntimeError):
+        translator.translate('Hund')
+    translator.close()
+
+
+def test_glosses_only_in_the_target_language(tmp_path):
+    dump = tmp_path / 'dump.jsonl'
+    dump.write_text(json.dumps(ENTRIES[0]) + '\n' + json.dumps(ENTRIES[1]) + '\n')
+
+    assert build_dictionary_index(dump, 'Dutch', 'German', tmp_path / 'nl-de') == 0
+    assert build_dictionary_index(dump, 'Dutch', 'English', tmp_path / 'french', edition_language='French') == 1
+
+
+def test_rejects_other_language_pair(dictionary_dir):
+    with pytest.raises(ValueError):
+        Translator(dictionary_dir, 'Dutch', 'Russian')
+
+
+class FakeTranslator:
+    NAME = 'fake'
+
+    def translate(self, word):
+        return f'{word} from fake'
+
+    async def translate_async(self, word, client):
+        return self.translate(word)
+
+
+def test_fallback(dictionary_dir):
+    translator = FallbackTranslator([Translator(dictionary_dir), FakeTranslator()])
+    assert translator.NAME == 'dictionary+fake'
+    assert translator.translate('hond') == 'dog'
+    assert translator.translate('auto') == 'auto from fake'
+    assert asyncio.run(translator.translate_async('auto', None)) == 'auto from fake'
+
+
+def test_create_translator(dictionary_dir):
+    assert create_translator('glosbe', 'Dutch', 'English').NAME == 'glosbe'
+    assert create_translator('dictionary', 'Dutch', 'English', dictionary_dir=dictionary_dir).NAME == 'dictionary'
+    translator = create_translator('dictionary+glosbe', 'Dutch', 'English', dictionary_dir=dictionary_dir)
+    assert translator.NAME == 'dictionary+glosbe'
+    with pytest.raises(ValueError):
+        create_translator('dictionary', 'Dutch', 'English')
@@ -1,6 +1,23 @@
 import pytest
-from bs4 import BeautifulSoup
-from anki_language_deck_generator.dutch_wiktionary import DutchWiktionaryWord, WordNotFoundError
+import requests
+from anki_language_deck_generator.dutch_wiktionary import CachedDutchWiktionaryWord, DutchWiktionaryWord, WordNotFoundError, extract_fields
+
+HUIS_HTML = """
+<div class="mw-parser-output">
+<h4 id="Uitspraak">Uitspraak</h4>
+<a href="//upload.wikimedia.org/wikipedia/commons/1/1a/Nl-huis.ogg" class="internal" title="Nl-huis.ogg">Geluid</a>
+<span class="IPAtekst">/ɦœʏ̯s/</span>
+<h4 id="Zelfstandig_naamwoord">Zelfstandig naamwoord</h4>
+<table class="infobox"><tbody>
+<tr><th></th><th><a title="enkelvoud">enkelvoud</a></th><th><a title="meervoud">meervoud</a></th></tr>
+<tr><td class="infoboxrijhoofding"><a title="naamwoord">naamwoord</a></td><td>huis</td><td><a>huizen</a></td></tr>
+</tbody></table>
+<img src="//upload.wikimedia.org/icons/Icon.svg.png" class="mw-file-element" width="60">
+<div class="thumbinner"><img src="//upload.wikimedia.org/tiny.png" class="mw-file-element" width="20"></div>
+<div class="thumbinner"><img src="//upload.wikimedia.org/huis.jpg" class="mw-file-element" width="250"></div>
+<p><b>huis</b> <a title="WikiWoordenboek:Genus"><span>o</span></a></p>
+</div>
+"""
 
 
 @pytest.fixture
@@ -11,7 +28,23 @@ def huis_word(tmp_path):
 def test_init_success(huis_word):
     assert huis_word.word == 'huis'
     assert isinstance(huis_word.translations, list)
-    assert isinstance(huis_word.soup, BeautifulSoup)
+    assert huis_word.get_fields()['article'] == 'het'
+    assert not hasattr(huis_word, 'soup')
+
+
+def test_extract_fields():
+    assert extract_fields(HUIS_HTML) == {
+        'article': 'het',
+        'transcription': '/ɦœʏ̯s/',
+        'part_of_speech': 'zelfstandig naamwoord',
+        'plural': 'huizen',
+        'image_url': 'https://upload.wikimedia.org/huis.jpg',
+        'sound_url': 'https://upload.wikimedia.org/wikipedia/commons/1/1a/Nl-huis.ogg',
+    }
+
+
+def test_extract_fields_of_empty_page():
+    assert set(extract_fields('<div><p>huis</p></div>').values()) == {None}
 
 
 def test_init_word_not_found(tmp_path):
@@ -61,3 +94,22 @@ def test_try_download_image(huis_word):
     path = huis_word.try_download_image()
     assert path is not None
     assert path.exists()
+
+
+def test_downloads_of_words_with_path_separators(tmp_path):
+    class FakeHttpPool:
+        def get(self, url, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = b'sound'
+            return response
+
+    fields = {'sound_url': 'https://upload.wikimedia.org/wikipedia/commons/a/a1/Nl-a_b.ogg'}
+    word = CachedDutchWiktionaryWord('a/b', tmp_path, fields, http_pool=FakeHttpPool())
+    paths = [word.try_download_sound(), word.try_download_sound()]
+
+    assert paths[0] != paths[1]
+    for path in paths:
+        assert path.parent == tmp_path
+        assert path.suffix == '.ogg'
+        assert path.read_bytes() == b'sound'
@@ -0,0 +1,136 @@
+import json
+import pytest
+import requests
+from anki_language_deck_generator import failures
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.dutch_wiktionary import WordNotFoundError
+from anki_language_deck_generator.journal import BuildJournal
+from anki_language_deck_generator.lookup_cache import LookupCache
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f'{status_code} error', response=response)
+
+
+@pytest.mark.parametrize('error, reason', [
+    (WordNotFoundError('missing'), failures.NOT_FOUND),
+    (http_error(404), failures.NOT_FOUND),
+    (http_error(429), failures.THROTTLED),
+    (failures.HttpStatusError('busy', 503), failures.THROTTLED),
+    (http_error(500), failures.NETWORK),
+    (requests.ConnectionError('refused'), failures.NETWORK),
+    (TimeoutError(), failures.NETWORK),
+    (RuntimeError('Cannot find content summary'), failures.PARSE_ERROR),
+    (KeyError('results'), failures.PARSE_ERROR),
+])
+def test_classify_failure(error, reason):
+    assert failures.classify_failure(error) == reason
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    yield cache
+    cache.close()
+
+
+def make_generator(tmp_path, make_note, **kwargs):
+    generator = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path, retry_delay=0, **kwargs)
+    generator._make_note = make_note
+    return generator
+
+
+class MissingTranslator:
+    NAME = 'fake'
+
+    def __init__(self):
+        self.looked_up = []
+
+    def translate(self, word):
+        self.looked_up.append(word)
+        raise failures.WordNotFoundError(f"Cannot find translations for word '{word}'")
+
+
+def test_words_missing_in_the_translator_are_cached(tmp_path, cache):
+    translator = MissingTranslator()
+
+    def make_generator_with(**kwargs):
+        generator = make_generator(tmp_path, None, cache=cache, translator=translator, **kwargs)
+        generator._make_note = generator._translate
+        return generator
+
+    make_generator_with().add_words(['xyzzy'])
+    generator = make_generator_with()
+    generator.add_words(['xyzzy'])
+
+    assert translator.looked_up == ['xyzzy']
+    assert generator.failures == [
+        {'word': 'xyzzy', 'reason': 'not_found', 'error': "Cannot find translations for word 'xyzzy'"},
+    ]
+    # The entries expire after the TTL
+    make_generator_with(not_found_ttl=-1).add_words(['xyzzy'])
+    assert translator.looked_up == ['xyzzy', 'xyzzy']
+
+
+def test_other_missing_lookups_are_not_cached(tmp_path, cache):
+    made = []
+
+    def make_note(word):
+        made.append(word)
+        raise WordNotFoundError(f"Word '{word}' not found in Wiktionary")
+
+    make_generator(tmp_path, make_note, cache=cache).add_words(['xyzzy'])
+    generator = make_generator(tmp_path, make_note, cache=cache)
+    generator.add_words(['xyzzy'])
+
+    assert made == ['xyzzy', 'xyzzy']
+    assert generator.failures[0]['reason'] == 'not_found'
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_transient_failures_are_retried(tmp_path, workers):
+    attempts = {}
+
+    class FakeNote:
+        def __init__(self, word):
+            self.fields = [word]
+            self.guid = f'guid-{word}'
+
+    def make_note(word):
+        attempts[word] = attempts.get(word, 0) + 1
+        if word == 'flaky' and attempts[word] == 1:
+            raise http_error(429)
+        if word == 'offline':
+            raise requests.ConnectionError('refused')
+        if word == 'broken':
+            raise RuntimeError('Cannot find content summary')
+        return FakeNote(word), []
+
+    progress = []
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    generator = make_generator(
+        tmp_path, make_note, workers=workers, retry_passes=2, journal=journal,
+        progress_callback=lambda current, total: progress.append(current),
+    )
+    generator.add_words(['hond', 'flaky', 'offline', 'broken'])
+    journal.close()
+
+    assert [note.fields[0] for note in generator.deck.notes] == ['hond', 'flaky']
+    assert attempts == {'hond': 1, 'flaky': 2, 'offline': 3, 'broken': 1}
+    assert [failure['reason'] for failure in generator.failures] == ['parse_error', 'network']
+    assert generator.failed_words == ['broken', 'offline']
+    assert generator.metrics.words == {'done': 2, 'failed': 2}
+    assert max(progress) == 4
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME, resume=True)
+    assert journal.failed == {'broken', 'offline'}
+    assert journal.get_failure('offline') == ('network', 'refused')
+    journal.close()
+
+
+def test_write_failures(tmp_path):
+    failures.write_failures(tmp_path / 'failures.jsonl', [{'word': 'één', 'reason': 'not_found', 'error': 'missing'}])
+
+    lines = (tmp_path / 'failures.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == [{'word': 'één', 'reason': 'not_found', 'error': 'missing'}]
@@ -0,0 +1,32 @@
+import pytest
+from anki_language_deck_generator.translators.glosbe import Translator
+
+PAGE = """<html><body>
+<p class="intro">Dictionary</p>
+<div id="dictionary-content">
+<p class="summary" id="content-summary">Translation of "hond" into English
+<br><strong>dog, hound</strong> are the top translations.</p>
+<ul><li><p>noun</p></li></ul>
+</div>
+</body></html>"""
+
+
+@pytest.fixture
+def translator():
+    return Translator('Dutch', 'English')
+
+
+@pytest.mark.parametrize('html', [PAGE, PAGE.replace('id="content-summary"', "id='content-summary'")])
+def test_parse_translation(translator, html):
+    assert translator._parse_translation('hond', html) == 'dog'
+
+
+@pytest.mark.parametrize('html', ['', '<div id="content-summary"><strong>dog</strong></div>'])
+def test_parse_translation_without_summary(translator, html):
+    with pytest.raises(RuntimeError, match='content summary'):
+        translator._parse_translation('hond', html)
+
+
+def test_parse_translation_without_translations(translator):
+    with pytest.raises(RuntimeError, match='translations'):
+        translator._parse_translation('hond', '<p id="content-summary">No results</p>')
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+from icrawler.builtin.google import GoogleParser
+from anki_language_deck_generator.google_image_downloader import ImageDownloader
+
+
+def make_response(content, content_type, status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers['Content-Type'] = content_type
+    response._content = content
+    return response
+
+
+class FakeHttpPool:
+    def get(self, url, **kwargs):
+        if url.startswith(ImageDownloader.SEARCH_URL):
+            word = url.split('q=')[1].split('&')[0]
+            return make_response(
+                f'<html><script>["https://example.com/broken.jpg", "https://example.com/{word}.png"]'
+                f'</script></html>'.encode(),
+                'text/html',
+            )
+        if 'broken' in url:
+            return make_response(b'Not found', 'text/html', status_code=404)
+        return make_response(url.encode(), 'image/png')
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    return ImageDownloader(tmp_path, http_pool=FakeHttpPool())
+
+
+def test_download_image_skips_broken_results(downloader):
+    image_file = downloader.download_image('hond')
+    assert image_file.suffix == '.png'
+    assert image_file.read_bytes() == b'https://example.com/hond.png'
+
+
+def test_parallel_downloads_do_not_collide(downloader):
+    words = [f'word{i}' for i in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        image_files = list(executor.map(downloader.download_image, words))
+
+    assert len(set(image_files)) == len(words)
+    for word, image_file in zip(words, image_files):
+        assert image_file.read_bytes() == f'https://example.com/{word}.png'.encode()
+
+
+def test_no_results(downloader, monkeypatch):
+    monkeypatch.setattr(FakeHttpPool, 'get', lambda self, url: make_response(b'<html></html>', 'text/html'))
+    with pytest.raises(RuntimeError):
+        downloader.download_image('hond')
+
+
+def test_words_with_path_separators(downloader, tmp_path):
+    image_file = downloader.download_image('AC/DC')
+    assert image_file.parent == tmp_path
+    assert image_file.read_bytes() == b'https://example.com/AC%2FDC.png'
+
+
+def test_icrawler_parser_runs_without_a_crawler():
+    # ImageDownloader calls GoogleParser.parse unbound, so this fails when an
+    # icrawler release starts to use the parser instance or changes its results
+    response = make_response(
+        b'<html><script>AF_initDataCallback({data: ["https://example.com/a.jpg", '
+        b'"https://example.com/hond\\u0026kat.png"]});</script></html>',
+        'text/html',
+    )
+
+    assert GoogleParser.parse(None, response) == [
+        {'file_url': 'https://example.com/a.jpg'}, {'file_url': 'https://example.com/hond&kat.png'},
+    ]
@@ -0,0 +1,51 @@
+import base64
+import requests
+from gtts import gTTS
+from anki_language_deck_generator.google_voice import GoogleVoice, _extract_audio
+
+# GoogleVoice sends the requests gTTS prepares through the shared pool and decodes
+# the answers like gTTS does, so these tests fail when a gTTS release changes either.
+AUDIO = b'ID3\x03' + bytes(range(256))
+RESPONSE = ')]}\'\n\n[["wrb.fr","jQ1olc","[\\"' + base64.b64encode(AUDIO).decode('ascii') + '\\"]",null]]\n'
+
+
+def test_gtts_prepares_batchexecute_requests():
+    prepared_requests = gTTS(text='hond', lang='nl')._prepare_requests()
+
+    assert len(prepared_requests) == 1
+    assert prepared_requests[0].method == 'POST'
+    assert 'batchexecute' in prepared_requests[0].url
+    assert gTTS.GOOGLE_TTS_RPC in requests.utils.unquote(prepared_requests[0].body)
+
+
+def test_audio_is_decoded_like_gtts_does(monkeypatch):
+    def send(session, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = RESPONSE.encode('utf-8')
+        response._content_consumed = True
+        response.request = request
+        return response
+
+    monkeypatch.setattr(requests.Session, 'send', send)
+
+    assert b''.join(gTTS(text='hond', lang='nl').stream()) == AUDIO
+    assert _extract_audio(RESPONSE) == AUDIO
+
+
+def test_sounds_get_their_own_staging_files(tmp_path):
+    class FakeHttpPool:
+        def post(self, url, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = RESPONSE.encode('utf-8')
+            return response
+
+    voice = GoogleVoice('Dutch', tmp_path, http_pool=FakeHttpPool())
+    sound_files = [voice.download_sound('a/b'), voice.download_sound('a/b')]
+
+    assert sound_files[0] != sound_files[1]
+    for sound_file in sound_files:
+        assert sound_file.parent == tmp_path
+        assert sound_file.suffix == '.mp3'
+        assert sound_file.read_bytes() == AUDIO
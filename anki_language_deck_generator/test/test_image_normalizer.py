@@ -0,0 +1,68 @@
+import random
+import pytest
+from PIL import Image
+from anki_language_deck_generator.image_normalizer import ImageNormalizer, normalize_image
+
+
+def make_png(path, size, mode='RGB'):
+    # Noise compresses badly, like photos saved as PNG
+    rng = random.Random(0)
+    image = Image.frombytes(mode, size, bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * len(mode))))
+    image.save(path)
+    return path
+
+
+def test_large_image_is_downscaled(tmp_path):
+    original = make_png(tmp_path / 'hond.png', (800, 400))
+
+    path, size, new_size = normalize_image(original, 200, 'jpeg', 80)
+
+    assert not original.exists()
+    assert path.suffix == '.jpg'
+    assert new_size == path.stat().st_size < size
+    with Image.open(path) as image:
+        assert image.size == (200, 100)
+        assert image.format == 'JPEG'
+
+
+@pytest.mark.parametrize('image_format, mode', [('jpeg', 'RGB'), ('webp', 'RGBA')])
+def test_transparency(tmp_path, image_format, mode):
+    original = make_png(tmp_path / 'kat.png', (300, 300), mode='RGBA')
+
+    path, _, _ = normalize_image(original, 100, image_format)
+
+    with Image.open(path) as image:
+        assert image.mode == mode
+
+
+def test_small_image_is_kept_when_not_smaller(tmp_path):
+    original = tmp_path / 'huis.jpg'
+    Image.new('RGB', (10, 10), 'red').save(original, quality=10)
+
+    assert normalize_image(original, 100, 'jpeg', 95) == (original, original.stat().st_size, original.stat().st_size)
+    assert list(tmp_path.iterdir()) == [original]
+
+
+def test_not_an_image_is_kept(tmp_path):
+    original = tmp_path / 'boom.jpg'
+    original.write_bytes(b'<html>Not found</html>')
+
+    assert normalize_image(original, 100) == (original, 22, 22)
+
+
+@pytest.mark.parametrize('processes', [0, 1])
+def test_normalizer_counts_saved_bytes(tmp_path, processes):
+    normalizer = ImageNormalizer(max_size=100, processes=processes)
+    try:
+        path = normalizer.normalize(make_png(tmp_path / 'hond.png', (400, 400)))
+    finally:
+        normalizer.close()
+
+    assert path.exists()
+    assert normalizer.images == 1
+    assert normalizer.bytes_saved == normalizer.original_bytes - path.stat().st_size > 0
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        ImageNormalizer(image_format='gif')
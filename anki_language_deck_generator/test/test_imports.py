@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import pytest
+
+HEAVY_MODULES = ['genanki', 'bs4', 'lxml', 'gtts', 'icrawler', 'requests', 'httpx', 'asyncio']
+
+
+def imported_modules(statement):
+    # A fresh interpreter, because this one has imported everything already.
+    # The module names go to stderr, apart from anything the statement prints.
+    code = f'import sys\n{statement}\nprint(" ".join(sys.modules), file=sys.stderr)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stderr
+    return set(output.split())
+
+
+@pytest.mark.parametrize('module', [
+    'anki_language_deck_generator',
+    'anki_language_deck_generator.__main__',
+    'anki_language_deck_generator.deck_generator',
+])
+def test_import_does_not_load_providers(module):
+    modules = imported_modules(f'import {module}')
+    assert [name for name in HEAVY_MODULES if name in modules] == []
+
+
+def test_help_does_not_load_providers():
+    modules = imported_modules(
+        'sys.argv = ["prog", "--help"]\n'
+        'from anki_language_deck_generator.__main__ import main\n'
+        'try:\n    main()\nexcept SystemExit:\n    pass'
+    )
+    assert [name for name in HEAVY_MODULES if name in modules] == []
+
+
+def test_google_voice_import_does_not_load_asyncio():
+    assert 'asyncio' not in imported_modules('import anki_language_deck_generator.google_voice')
+
+
+def test_google_voice_import_keeps_logging_unconfigured():
+    code = (
+        'import logging, anki_language_deck_generator.google_voice; '
+        'assert not logging.getLogger().handlers'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,56 @@
+from anki_language_deck_generator.journal import BuildJournal
+
+
+def test_journal_is_read_back_on_resume(tmp_path):
+    media_file = tmp_path / 'hond.mp3'
+    media_file.write_bytes(b'sound')
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    journal.write_header(1, 2)
+    journal.record_done('hond', ['hond', 'dog'], [media_file], 'guid')
+    journal.record_failed('kat')
+    journal.close()
+
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME, resume=True)
+    assert journal.header == {'deck_id': 1, 'model_id': 2}
+    assert journal.get_done('hond') == (['hond', 'dog'], [media_file], 'guid')
+    assert journal.get_done('kat') is None
+    assert journal.failed == {'kat'}
+    journal.close()
+
+
+def test_journal_without_resume_starts_over(tmp_path):
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    journal.record_done('hond', ['hond', 'dog'], [], 'guid')
+    journal.close()
+
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    assert journal.header is None
+    assert journal.get_done('hond') is None
+    journal.close()
+
+
+def test_word_with_missing_media_is_not_done(tmp_path):
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    journal.record_done('hond', ['hond', 'dog'], [tmp_path / 'missing.mp3'], 'guid')
+    journal.close()
+
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME, resume=True)
+    assert journal.get_done('hond') is None
+    journal.close()
+
+
+def test_broken_last_line_is_skipped(tmp_path):
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME)
+    journal.record_done('hond', ['hond', 'dog'], [], 'guid')
+    journal.close()
+    with (tmp_path / BuildJournal.FILE_NAME).open('a', encoding='utf-8') as f:
+        f.write('{"word": "kat", "sta')
+
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME, resume=True)
+    assert journal.get_done('hond') == (['hond', 'dog'], [], 'guid')
+    journal.record_failed('kat')
+    journal.close()
+
+    journal = BuildJournal(tmp_path / BuildJournal.FILE_NAME, resume=True)
+    assert journal.failed == {'kat'}
+    journal.close()
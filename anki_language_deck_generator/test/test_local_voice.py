@@ -0,0 +1,115 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from anki_language_deck_generator.local_voice import EspeakVoice, PiperVoice
+from anki_language_deck_generator.voice_backend import create_voice_backend
+
+# Stand-ins for the synthesizers, they write the text instead of its sound
+FAKE_ESPEAK = '''
+import sys
+args = sys.argv[1:]
+with open(args[args.index('-w') + 1], 'wb') as f:
+    f.write(args[args.index('-v') + 1].encode() + b':' + sys.stdin.buffer.read())
+'''
+FAKE_PIPER = '''
+import json, sys, time
+for line in sys.stdin:
+    request = json.loads(line)
+    if request['text'] == 'crash':
+        time.sleep(0.5)
+        sys.exit(1)
+    if request['text'] == 'hang':
+        time.sleep(60)
+    with open(request['output_file'], 'w', encoding='utf-8') as f:
+        f.write(request['text'])
+    print(request['output_file'], flush=True)
+'''
+
+
+@pytest.fixture
+def fake_bin(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    for name, script in (('espeak-ng', FAKE_ESPEAK), ('piper', FAKE_PIPER)):
+        executable = bin_dir / name
+        executable.write_text(f'#!{sys.executable}\n{script}')
+        executable.chmod(0o755)
+    monkeypatch.setenv('PATH', str(bin_dir))
+    return bin_dir
+
+
+@pytest.fixture
+def model(tmp_path):
+    model = tmp_path / 'nl_NL-mls-medium.onnx'
+    model.write_bytes(b'')
+    return model
+
+
+def test_espeak(fake_bin, tmp_path):
+    voice = EspeakVoice('Dutch', tmp_path / 'work')
+
+    path = voice.download_sound('-huis')
+
+    assert path.suffix == '.wav'
+    assert path.read_bytes() == b'nl:-huis'
+    assert voice.store_name == 'espeak-ng:nl'
+
+
+def test_piper_reuses_processes(fake_bin, tmp_path, model):
+    voice = PiperVoice('Dutch', tmp_path / 'work', model, processes=2)
+    words = [f'woord{i}' for i in range(20)]
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(executor.map(voice.download_sound, words))
+        assert [path.read_text(encoding='utf-8') for path in paths] == words
+        assert len(voice._processes) <= 2
+        assert asyncio.run(voice.download_sound_async('kat', None)).read_text(encoding='utf-8') == 'kat'
+    finally:
+        voice.close()
+    assert voice.store_name == 'piper:nl_NL-mls-medium'
+
+
+def test_piper_replaces_crashed_process(fake_bin, tmp_path, model):
+    voice = PiperVoice('Dutch', tmp_path / 'work', model, processes=1)
+    try:
+        with pytest.raises(RuntimeError):
+            voice.download_sound('crash')
+        assert voice.download_sound('huis').read_text(encoding='utf-8') == 'huis'
+    finally:
+        voice.close()
+
+
+def test_piper_wakes_words_waiting_for_a_crashed_process(fake_bin, tmp_path, model):
+    voice = PiperVoice('Dutch', tmp_path / 'work', model, processes=1)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            crashed = executor.submit(voice.download_sound, 'crash')
+            waiting = executor.submit(voice.download_sound, 'huis')
+            with pytest.raises(RuntimeError):
+                crashed.result(timeout=10)
+            assert waiting.result(timeout=10).read_text(encoding='utf-8') == 'huis'
+    finally:
+        voice.close()
+
+
+def test_piper_kills_hanging_process(fake_bin, tmp_path, model):
+    voice = PiperVoice('Dutch', tmp_path / 'work', model, processes=1)
+    voice.TIMEOUT = 1
+    try:
+        with pytest.raises(RuntimeError):
+            voice.download_sound('hang')
+        assert voice.download_sound('a/b').read_text(encoding='utf-8') == 'a/b'
+    finally:
+        voice.close()
+
+
+def test_missing_executable(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    with pytest.raises(RuntimeError):
+        create_voice_backend('espeak-ng', 'Dutch', tmp_path)
+
+
+def test_piper_needs_model(fake_bin, tmp_path):
+    with pytest.raises(ValueError):
+        create_voice_backend('piper', 'Dutch', tmp_path)
@@ -0,0 +1,78 @@
+import time
+import pytest
+from anki_language_deck_generator.lookup_cache import LookupCache, connect_shared
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    yield cache
+    cache.close()
+
+
+def test_get_missing(cache):
+    assert cache.get('glosbe', 'Dutch-English', 'hond') is None
+    assert cache.misses == 1
+
+
+def test_set_and_get_normalized_word(cache):
+    cache.set('glosbe', 'Dutch-English', 'Hond', 'dog')
+    assert cache.get('glosbe', 'Dutch-English', ' hond ') == 'dog'
+    assert cache.get('glosbe', 'Dutch-Russian', 'hond') is None
+    assert cache.get('tatoeba', 'Dutch-English', 'hond') is None
+
+
+def test_case_matters_where_it_does_in_the_language(cache):
+    cache.set('glosbe', 'German-English', 'Morgen', 'morning')
+    assert cache.get('glosbe', 'German-English', 'morgen') is None
+    assert cache.get('glosbe', 'German-English', 'Morgen') == 'morning'
+    assert cache.hits == 1
+
+
+def test_values_survive_reopening(tmp_path):
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    cache.set('nl.wiktionary', 'Dutch', 'huis', {'article': 'het', 'plural': 'huizen'})
+    cache.close()
+
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    assert cache.get('nl.wiktionary', 'Dutch', 'huis') == {'article': 'het', 'plural': 'huizen'}
+    cache.close()
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = LookupCache(tmp_path / 'lookups.sqlite', ttl=-1)
+    cache.set('glosbe', 'Dutch-English', 'hond', 'dog')
+    assert cache.get('glosbe', 'Dutch-English', 'hond') is None
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(LookupCache, 'EVICTION_INTERVAL', 1)
+    cache = LookupCache(tmp_path / 'lookups.sqlite', max_entries=2)
+    cache.set('glosbe', 'Dutch-English', 'hond', 'dog')
+    cache.set('glosbe', 'Dutch-English', 'kat', 'cat')
+    cache.get('glosbe', 'Dutch-English', 'hond')
+    cache.set('glosbe', 'Dutch-English', 'huis', 'house')
+
+    assert cache.get('glosbe', 'Dutch-English', 'kat') is None
+    assert cache.get('glosbe', 'Dutch-English', 'hond') == 'dog'
+    assert cache.get('glosbe', 'Dutch-English', 'huis') == 'house'
+    cache.close()
+
+
+def test_reads_do_not_wait_for_writers(tmp_path):
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    cache.set('glosbe', 'Dutch-English', 'hond', 'dog')
+    # Another process, e.g. a shard, in the middle of a write
+    writer = connect_shared(tmp_path / 'lookups.sqlite')
+    writer.execute('BEGIN IMMEDIATE')
+    writer.execute("UPDATE lookups SET value = '\"cat\"' WHERE word = 'hond'")
+
+    start = time.monotonic()
+    assert cache.get('glosbe', 'Dutch-English', 'hond') == 'dog'
+    assert cache.get('glosbe', 'Dutch-English', 'kat') is None
+    assert time.monotonic() - start < 1
+
+    writer.rollback()
+    writer.close()
+    cache.close()
@@ -0,0 +1,47 @@
+import pytest
+from anki_language_deck_generator.media_store import MediaStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MediaStore(tmp_path / 'media')
+    yield store
+    store.close()
+
+
+def make_file(path, content):
+    path.write_bytes(content)
+    return path
+
+
+def test_get_missing(store):
+    assert store.get('gtts', 'Dutch', 'hond') is None
+
+
+def test_put_and_get(store, tmp_path):
+    staged = make_file(tmp_path / 'hond.mp3', b'sound')
+    path = store.put('gtts', 'Dutch', 'hond', staged)
+
+    assert not staged.exists()
+    assert path.read_bytes() == b'sound'
+    assert path.suffix == '.mp3'
+    assert store.get('gtts', 'Dutch', 'hond') == path
+    assert store.get('gtts', 'German', 'hond') is None
+
+
+def test_same_content_is_stored_once(store, tmp_path):
+    first = store.put('google-images', 'Dutch', 'hond', make_file(tmp_path / 'hond.jpg', b'image'))
+    second = store.put('google-images', 'Dutch', 'honden', make_file(tmp_path / 'honden.jpg', b'image'))
+
+    assert first == second
+    assert len(list(store.blobs_dir.glob('*/*'))) == 1
+
+
+def test_media_survives_reopening(tmp_path):
+    store = MediaStore(tmp_path / 'media')
+    path = store.put('gtts', 'Dutch', 'hond', make_file(tmp_path / 'hond.mp3', b'sound'))
+    store.close()
+
+    store = MediaStore(tmp_path / 'media')
+    assert store.get('gtts', 'Dutch', 'hond') == path
+    store.close()
@@ -0,0 +1,112 @@
+import json
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.lookup_cache import LookupCache
+from anki_language_deck_generator.metrics import Histogram, Metrics
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.add(ms / 1000)
+
+    assert histogram.count == 100
+    # Percentiles are bucket bounds, accurate to one bucket width
+    assert 0.050 <= histogram.percentile(50) <= 0.050 * Histogram.BASE
+    assert 0.099 <= histogram.percentile(99) <= 0.100
+    assert histogram.percentile(100) == 0.100
+
+
+def test_report_and_trace(tmp_path):
+    metrics = Metrics(trace=True)
+    metrics.record_stage('translation', 1.0, 1.5, 'hond')
+    metrics.record_stage('translation', 2.0, 2.1, 'kat')
+    metrics.count_request('glosbe.com', 100)
+    metrics.count_request('glosbe.com', 50)
+    metrics.count_retry('glosbe.com')
+    metrics.count_cache('glosbe', hit=True)
+    metrics.count_cache('glosbe', hit=False)
+    metrics.count_word(failed=False)
+
+    report = metrics.report()
+    assert report['stages']['translation']['count'] == 2
+    assert report['stages']['translation']['max_ms'] == 500
+    assert report['hosts']['glosbe.com'] == {'requests': 2, 'bytes': 150, 'retries': 1}
+    assert report['caches']['glosbe']['hit_ratio'] == 0.5
+    assert report['words']['done'] == 1
+
+    metrics.write_trace(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    stages = [event for event in events if event['ph'] == 'X']
+    rows = {event['args']['name']: event['tid'] for event in events if event['ph'] == 'M'}
+    assert [event['tid'] for event in stages] == [rows['hond'], rows['kat']]
+    assert stages[0]['dur'] == 500000
+
+
+def test_generator_records_stages(tmp_path, monkeypatch):
+    generator = AnkiDeckGenerator('Test deck', 'English', 'Dutch', tmp_path)
+    monkeypatch.setattr(generator.translator, 'translate', lambda word: 'hond')
+    monkeypatch.setattr(generator.usage_fetcher, 'fetch_usage', lambda word: '')
+    monkeypatch.setattr(generator.reverso_voice, 'download_sound', lambda word: None)
+    monkeypatch.setattr(generator.image_downloader, 'download_image', lambda word: None)
+
+    generator.add_words(['dog'])
+    generator.save_deck(tmp_path / 'deck.apkg')
+
+    report = generator.metrics.report()
+    assert set(report['stages']) == {'translation', 'usage', 'sound', 'image', 'word', 'save_deck'}
+    assert report['words'] == {'done': 1, 'failed': 0, 'per_second': report['words']['per_second']}
+    assert report['caches']['media:gtts'] == {'hits': 0, 'misses': 1, 'hit_ratio': 0.0}
+
+
+def test_offline_usage_lookups_skip_the_cache(tmp_path, monkeypatch):
+    class FakeUsageFetcher:
+        NAME = 'tatoeba-index'
+        OFFLINE = True
+
+        def fetch_usage(self, word):
+            return '<b>De hond slaapt.</b><br>The dog sleeps.'
+
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    cache.set('tatoeba', 'English-Dutch', 'dog', 'online usage')
+    generator = AnkiDeckGenerator('Test deck', 'English', 'Dutch', tmp_path, cache=cache,
+                                  usage_fetcher=FakeUsageFetcher())
+    monkeypatch.setattr(generator.translator, 'translate', lambda word: 'hond')
+    monkeypatch.setattr(generator.reverso_voice, 'download_sound', lambda word: None)
+    monkeypatch.setattr(generator.image_downloader, 'download_image', lambda word: None)
+
+    generator.add_words(['dog'])
+
+    assert '<b>De hond slaapt.</b><br>The dog sleeps.' in generator.deck.notes[0].fields
+    assert 'tatoeba-index' not in generator.metrics.report()['caches']
+    assert cache.get('tatoeba-index', 'English-Dutch', 'dog') is None
+    assert cache.get('tatoeba', 'English-Dutch', 'dog') == 'online usage'
+    cache.close()
+
+
+def test_offline_dictionary_lookups_skip_the_cache(tmp_path, monkeypatch):
+    from anki_language_deck_generator.translators.fallback import FallbackTranslator
+
+    class FakeDictionary:
+        NAME = 'dictionary'
+        OFFLINE = True
+
+        def translate(self, word):
+            if word == 'dog':
+                return 'hond'
+            raise ValueError(f"No translation for '{word}'")
+
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    generator = AnkiDeckGenerator('Test deck', 'English', 'Dutch', tmp_path, cache=cache)
+    glosbe = generator.translator
+    monkeypatch.setattr(glosbe, 'translate', lambda word: 'kat')
+    generator.translator = FallbackTranslator([FakeDictionary(), glosbe])
+    monkeypatch.setattr(generator.usage_fetcher, 'fetch_usage', lambda word: None)
+    monkeypatch.setattr(generator.reverso_voice, 'download_sound', lambda word: None)
+    monkeypatch.setattr(generator.image_downloader, 'download_image', lambda word: None)
+
+    generator.add_words(['dog', 'cat'])
+
+    assert 'dictionary' not in generator.metrics.report()['caches']
+    assert cache.get('dictionary', 'English-Dutch', 'dog') is None
+    assert cache.get('glosbe', 'English-Dutch', 'cat') == 'kat'
+    cache.close()
@@ -0,0 +1,96 @@
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from anki_language_deck_generator.http_pool import HttpPool
+from anki_language_deck_generator.rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status_code, headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers)
+        response.request = request
+        response._content = b''
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('time.sleep', lambda delay: delay > 0.01 and sleeps.append(round(delay)))
+    return sleeps
+
+
+def make_pool(responses, **kwargs):
+    pool = HttpPool(rate_limiter=RateLimiter(**kwargs))
+    adapter = FakeAdapter(responses)
+    pool.session.mount('https://', adapter)
+    return pool, adapter
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('soon') is None
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = TokenBucket(max_rate=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.01)
+
+
+def test_token_bucket_adapts_rate():
+    bucket = TokenBucket(max_rate=8)
+    bucket.slow_down()
+    bucket.slow_down()
+    assert bucket.rate == 2
+    for _ in range(100):
+        bucket.speed_up()
+    assert bucket.rate == 8
+
+
+def test_backoff_is_exponential_with_jitter():
+    limiter = RateLimiter(base_delay=1, max_delay=10)
+    for attempt, delay in enumerate([1, 2, 4, 8, 10, 10]):
+        assert delay / 2 <= limiter.backoff_delay(attempt) <= delay
+
+
+def test_retry_after_is_honored(sleeps):
+    pool, adapter = make_pool([(429, {'Retry-After': '7'}), (200, {})])
+    response = pool.get('https://glosbe.com/nl/en/hond')
+
+    assert response.status_code == 200
+    assert len(adapter.requests) == 2
+    # The backoff waits as long as the host asked
+    assert sleeps[0] == 7
+    assert pool.rate_limiter.retries == 1
+    assert pool.rate_limiter.bucket('glosbe.com').rate < RateLimiter.DEFAULT_RATE
+
+
+def test_gives_up_after_max_retries(sleeps):
+    pool, adapter = make_pool([(503, {})] * 3, max_retries=2)
+    response = pool.get('https://glosbe.com/nl/en/hond')
+
+    assert response.status_code == 503
+    assert len(adapter.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_not_found_is_not_retried(sleeps):
+    pool, adapter = make_pool([(404, {})])
+    assert pool.get('https://glosbe.com/nl/en/hond').status_code == 404
+    assert sleeps == []
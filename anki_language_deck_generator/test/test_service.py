@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import zipfile
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import pytest
+from anki_language_deck_generator.batch import BatchBuilder
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.service import GenerationService, ServiceServer, validate_job
+
+JOB = {'deck_name': 'Animals', 'source_language': 'Dutch', 'target_language': 'English', 'words': ['hond', 'kat']}
+
+
+@pytest.fixture
+def start_service(tmp_path, monkeypatch):
+    def fake_make_note(self, word):
+        return self._build_note(word, f'{word}-translation', '', None, None, None, None, None, None)
+
+    monkeypatch.setattr(AnkiDeckGenerator, '_make_note', fake_make_note)
+    started = []
+
+    def start(**kwargs):
+        builder = BatchBuilder(tmp_path / 'work', workers=2)
+        service = GenerationService(builder, tmp_path / 'jobs', **kwargs)
+        server = ServiceServer(('127.0.0.1', 0), service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((server, service, builder))
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    yield start
+    for server, service, builder in started:
+        server.shutdown()
+        server.server_close()
+        service.close()
+        builder.close()
+        builder.media_store.close()
+
+
+def call(method, url, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    try:
+        with urlopen(Request(url, data=data, method=method)) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+
+def wait_for(url, job_id):
+    for _ in range(100):
+        status, body = call('GET', f'{url}/jobs/{job_id}')
+        job = json.loads(body)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('The job did not finish')
+
+
+def test_job_lifecycle(start_service, tmp_path):
+    url = start_service()
+
+    status, body = call('POST', f'{url}/jobs', JOB)
+    assert status == 202
+    job_id = json.loads(body)['id']
+
+    job = wait_for(url, job_id)
+    assert job['status'] == 'done'
+    assert (job['processed'], job['total'], job['failed_words']) == (2, 2, [])
+
+    status, deck = call('GET', f'{url}/jobs/{job_id}/deck')
+    assert status == 200
+    (tmp_path / 'deck.apkg').write_bytes(deck)
+    with zipfile.ZipFile(tmp_path / 'deck.apkg') as package:
+        assert 'collection.anki2' in package.namelist()
+
+    assert call('DELETE', f'{url}/jobs/{job_id}')[0] == 200
+    assert call('GET', f'{url}/jobs/{job_id}')[0] == 404
+
+
+@pytest.mark.parametrize('job', [
+    {'source_language': 'Dutch', 'target_language': 'English', 'words': []},
+    {'source_language': 'Dutch', 'words': ['hond']},
+    dict(JOB, colour='red'),
+    dict(JOB, workers=0),
+])
+def test_invalid_job(start_service, job):
+    url = start_service()
+
+    status, body = call('POST', f'{url}/jobs', job)
+
+    assert status == 400
+    assert 'error' in json.loads(body)
+
+
+def test_queue_is_bounded(start_service):
+    # Without runners the queued jobs are never taken
+    url = start_service(max_queued=2, concurrent_jobs=0)
+
+    statuses = [call('POST', f'{url}/jobs', JOB)[0] for _ in range(3)]
+
+    assert statuses == [202, 202, 503]
+    job_id = json.loads(call('GET', f'{url}/jobs')[1])[0]['id']
+    assert call('GET', f'{url}/jobs/{job_id}/deck')[0] == 409
+    assert call('DELETE', f'{url}/jobs/{job_id}')[0] == 409
+
+
+def test_failed_job_leaves_no_partial_deck(start_service, tmp_path, monkeypatch):
+    def fail(self, words, **kwargs):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(AnkiDeckGenerator, 'add_words', fail)
+    url = start_service()
+
+    job_id = json.loads(call('POST', f'{url}/jobs', JOB)[1])['id']
+
+    job = wait_for(url, job_id)
+    assert (job['status'], job['error']) == ('failed', 'No space left on device')
+    assert list((tmp_path / 'jobs').iterdir()) == []
+
+
+def test_indexes_are_chosen_by_configured_name():
+    dictionaries = {'nl-en': '/srv/dictionary-nl-en'}
+
+    spec = validate_job(dict(JOB, dictionary='nl-en'), dictionaries=dictionaries)
+    assert (spec['dictionary'], spec['translator']) == ('/srv/dictionary-nl-en', 'dictionary+glosbe')
+    with pytest.raises(ValueError, match='Unknown dictionary'):
+        validate_job(dict(JOB, dictionary='/etc'), dictionaries=dictionaries)
+    with pytest.raises(ValueError, match='Unknown usage_index'):
+        validate_job(dict(JOB, usage_index='/etc'))
+
+
+def test_finished_jobs_are_evicted(start_service, tmp_path):
+    url = start_service(max_finished_jobs=1)
+
+    first = json.loads(call('POST', f'{url}/jobs', JOB)[1])['id']
+    assert wait_for(url, first)['status'] == 'done'
+    second = json.loads(call('POST', f'{url}/jobs', JOB)[1])['id']
+    assert wait_for(url, second)['status'] == 'done'
+
+    assert call('GET', f'{url}/jobs/{first}')[0] == 404
+    assert call('GET', f'{url}/jobs/{second}/deck')[0] == 200
+    assert len(list((tmp_path / 'jobs').iterdir())) == 1
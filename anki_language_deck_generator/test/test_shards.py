@@ -0,0 +1,81 @@
+import multiprocessing
+from anki_language_deck_generator import shards
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.journal import BuildJournal
+from anki_language_deck_generator.lookup_cache import LookupCache
+from anki_language_deck_generator.media_store import MediaStore
+
+WORDS = ['hond', 'kat', '', 'vis', 'boom', 'huis', 'kat']
+
+
+def test_every_word_belongs_to_one_shard():
+    parts = [list(shards.iter_shard_words(WORDS, index, 3)) for index in range(3)]
+
+    for word in ('hond', 'kat', 'vis', 'boom', 'huis'):
+        assert sum(word in part for part in parts) == 1
+    # Empty lines stay in every shard, so progress counts them
+    assert all('' in part for part in parts)
+    assert shards.shard_of('hond', 3) == shards.shard_of('hond', 3)
+
+
+def test_merge_keeps_input_order(tmp_path):
+    for index in range(2):
+        shards.shard_dir(tmp_path, index).mkdir()
+        journal = BuildJournal(shards.shard_dir(tmp_path, index) / BuildJournal.FILE_NAME)
+        for word in shards.iter_shard_words(WORDS, index, 2):
+            if word == 'vis':
+                journal.record_failed(word)
+            elif word:
+                journal.record_done(word, [word, f'{word}-translation'] + [''] * 6, [], f'guid-{word}')
+        journal.close()
+    generator = AnkiDeckGenerator('Test deck', 'Dutch', 'English', tmp_path / 'work')
+
+    shards.merge_shards(generator, WORDS, tmp_path, 2)
+
+    assert [note.fields[0] for note in generator.deck.notes] == ['hond', 'kat', 'boom', 'huis']
+    assert [note.guid for note in generator.deck.notes] == ['guid-hond', 'guid-kat', 'guid-boom', 'guid-huis']
+    assert generator.failed_words == ['vis']
+
+
+def test_shards_share_the_budget():
+    args = shards.budget_args(4, 10, {'glosbe.com': 2}, image_processes=8)
+
+    assert args[:4] == ['--rate-limit', '2.5', '--host-rate-limit', 'glosbe.com=0.5']
+    assert args[args.index('--image-processes') + 1] == '2'
+    assert int(args[args.index('--voice-processes') + 1]) >= 1
+
+
+def build_shard_with_shared_caches(root, index, shard_count):
+    # Like a shard process opening the user cache and media store with the other shards
+    LookupCache.EVICTION_INTERVAL = 5
+    cache = LookupCache(root / 'lookups.sqlite', max_entries=150)
+    store = MediaStore(root / 'media')
+    for i in range(200):
+        word = f'word{i}'
+        if cache.get('glosbe', 'Dutch-English', word) is None:
+            cache.set('glosbe', 'Dutch-English', word, f'{word} from shard {index}')
+        if shards.shard_of(word, shard_count) == index:
+            sound = root / f'shard-{index}.mp3'
+            sound.write_bytes(word.encode())
+            store.put('gtts', 'Dutch', word, sound)
+    cache.close()
+    store.close()
+
+
+def test_shards_share_the_caches(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=build_shard_with_shared_caches, args=(tmp_path, index, 3)) for index in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+    cache = LookupCache(tmp_path / 'lookups.sqlite')
+    assert cache.get('glosbe', 'Dutch-English', 'word199').startswith('word199 from shard')
+    cache.close()
+    store = MediaStore(tmp_path / 'media')
+    assert all(store.get('gtts', 'Dutch', f'word{i}') is not None for i in range(200))
+    store.close()
@@ -0,0 +1,36 @@
+import pytest
+from anki_language_deck_generator.sorted_table import SortedTable, write_table
+
+
+def test_lookup(tmp_path):
+    items = [(f'key{i}', f'value{i}'.encode()) for i in range(1000)] + [('ключ', b'\x00\xff'), ('', b'empty')]
+    assert write_table(tmp_path / 'table', reversed(items)) == len(items)
+
+    with SortedTable(tmp_path / 'table') as table:
+        assert len(table) == len(items)
+        for key, value in items:
+            assert table.get(key) == value
+        assert 'key5' in table
+        assert table.get('key1000') is None
+        assert table.get('a', b'default') == b'default'
+        assert list(table.keys()) == sorted((key for key, _ in items), key=lambda key: key.encode())
+
+
+def test_later_values_replace_earlier_ones(tmp_path):
+    write_table(tmp_path / 'table', [('a', b'1'), ('b', b'2'), ('a', b'3')])
+    with SortedTable(tmp_path / 'table') as table:
+        assert table.get('a') == b'3'
+        assert len(table) == 2
+
+
+def test_empty_table(tmp_path):
+    write_table(tmp_path / 'table', [])
+    with SortedTable(tmp_path / 'table') as table:
+        assert len(table) == 0
+        assert table.get('a') is None
+
+
+def test_rejects_other_files(tmp_path):
+    (tmp_path / 'table').write_bytes(b'not a table at all')
+    with pytest.raises(ValueError):
+        SortedTable(tmp_path / 'table')
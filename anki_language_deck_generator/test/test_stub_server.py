@@ -0,0 +1,26 @@
+import sys
+import time
+from pathlib import Path
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'benchmarks'))
+
+from stub_server import StubConfig, start_stub_server  # noqa: E402
+
+
+def test_stub_without_latency_answers_at_once():
+    server = start_stub_server(StubConfig(latency_ms=0, jitter_ms=0))
+    url = f'http://127.0.0.1:{server.server_address[1]}/glosbe.com/nl/en/hond'
+    try:
+        with requests.Session() as session:
+            # The first request opens the keep-alive connection
+            session.get(url).raise_for_status()
+            start = time.perf_counter()
+            for _ in range(10):
+                assert 'hond' in session.get(url).text
+            elapsed = (time.perf_counter() - start) / 10
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert elapsed < 0.01
@@ -0,0 +1,61 @@
+import asyncio
+import bz2
+import pytest
+from anki_language_deck_generator.tatoeba_index import OfflineUsageFetcher, build_usage_index
+
+SENTENCES = [
+    (1, 'nld', 'De hond speelt in de tuin.'),
+    (2, 'eng', 'The dog is playing in the garden.'),
+    (3, 'nld', 'Mijn hond slaapt de hele dag.'),
+    (4, 'eng', 'My dog sleeps all day long.'),
+    (5, 'nld', 'Hond!'),
+    (6, 'eng', 'Dog!'),
+    (7, 'nld', 'De kat en de hond zijn vrienden.'),
+    (8, 'rus', 'Кошка и собака дружат.'),
+    (9, 'nld', 'Een hond zonder vertaling in de zin.'),
+]
+LINKS = [(1, 2), (2, 1), (3, 8), (3, 4), (5, 6), (7, 8)]
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    sentences = tmp_path / 'sentences.csv.bz2'
+    sentences.write_bytes(bz2.compress(''.join(f'{i}\t{lang}\t{text}\n' for i, lang, text in SENTENCES).encode()))
+    links = tmp_path / 'links.csv'
+    links.write_text(''.join(f'{a}\t{b}\n' for a, b in LINKS))
+    assert build_usage_index(sentences, links, 'Dutch', 'English', tmp_path / 'index') == 2
+    return tmp_path / 'index'
+
+
+def test_fetch_usage(index_dir):
+    fetcher = OfflineUsageFetcher(index_dir, 'Dutch', 'English')
+    # Too short and untranslated sentences are not indexed
+    assert fetcher.fetch_usage('Hond') == (
+        '<b>De hond speelt in de tuin.</b><br>The dog is playing in the garden.<br>'
+        '<b>Mijn hond slaapt de hele dag.</b><br>My dog sleeps all day long.'
+    )
+    assert fetcher.find_sentences('de tuin') == [['De hond speelt in de tuin.', 'The dog is playing in the garden.']]
+    assert fetcher.fetch_usage('kat') == ''
+    assert asyncio.run(fetcher.fetch_usage_async('tuin', None)).startswith('<b>De hond')
+    fetcher.close()
+
+
+def test_rejects_other_language_pair(index_dir):
+    with pytest.raises(ValueError):
+        OfflineUsageFetcher(index_dir, 'Dutch', 'Russian')
+
+
+def test_finds_phrases_of_common_words(tmp_path):
+    # The only sentence with both words comes after many sentences with the common one
+    sentences = [(2 * i + 1, 'nld', f'De hond slaapt in huis {i}.') for i in range(100)]
+    sentences.append((201, 'nld', 'De hond ligt in de tuin.'))
+    lines = [f'{i}\tnld\t{text}\n' for i, _, text in sentences]
+    lines += [f'{i + 1}\teng\tA translation.\n' for i, _, _ in sentences]
+    (tmp_path / 'sentences.csv').write_text(''.join(lines))
+    (tmp_path / 'links.csv').write_text(''.join(f'{i}\t{i + 1}\n' for i, _, _ in sentences))
+    build_usage_index(tmp_path / 'sentences.csv', tmp_path / 'links.csv', 'Dutch', 'English', tmp_path / 'index')
+
+    fetcher = OfflineUsageFetcher(tmp_path / 'index', 'Dutch', 'English')
+    assert fetcher.find_sentences('hond tuin') == [['De hond ligt in de tuin.', 'A translation.']]
+    assert len(fetcher.find_sentences('de hond', limit=200)) == 101
+    fetcher.close()
@@ -0,0 +1,80 @@
+import bz2
+from xml.sax.saxutils import escape
+from anki_language_deck_generator.wiktionary_index import (
+    WiktionaryIndex, _commons_url, build_wiktionary_index, extract_wikitext_fields,
+)
+
+HUIS = """[[Bestand:Nuvola apps Icon.svg|20px]]
+{{=nld=}}
+{{-pron-}}
+*{{sound}}: {{audio|nl-huis.ogg|huis|nl}}
+*{{WikiW|IPA}}: {{IPA|/ɦœy̯s/|nld}}
+{{-noun-|0}}
+{{-nlnoun-|huis|huizen|huisje|huisjes}}
+[[Bestand:Example.jpg|thumb|een huis]]
+'''huis''' {{n}}
+#gebouw om in te wonen
+{{=eng=}}
+{{-verb-|0}}
+'''huis''' {{m}}
+"""
+LOPEN = """{{=nld=}}
+{{-verb-|0}}
+'''lopen''' {{IPA|/ˈlopə(n)/|nld}}
+"""
+
+
+def make_page(title, text, namespace=0):
+    return (
+        f'<page><title>{escape(title)}</title><ns>{namespace}</ns><id>1</id>'
+        f'<revision><text xml:space="preserve">{escape(text)}</text></revision></page>'
+    )
+
+
+def test_commons_url():
+    assert _commons_url('Example.jpg') == 'https://upload.wikimedia.org/wikipedia/commons/a/a9/Example.jpg'
+    assert _commons_url('example.svg', 250) == (
+        'https://upload.wikimedia.org/wikipedia/commons/thumb/8/84/Example.svg/250px-Example.svg.png'
+    )
+
+
+def test_extract_wikitext_fields():
+    assert extract_wikitext_fields(HUIS) == {
+        'article': 'het',
+        'transcription': '/ɦœy̯s/',
+        'part_of_speech': 'zelfstandig naamwoord',
+        'plural': 'huizen',
+        'image_url': 'https://upload.wikimedia.org/wikipedia/commons/thumb/a/a9/Example.jpg/250px-Example.jpg',
+        'sound_url': _commons_url('nl-huis.ogg'),
+    }
+    assert extract_wikitext_fields('{{=eng=}}\n{{-noun-|0}}') is None
+
+
+def test_images_of_other_languages_are_ignored():
+    text = "{{=eng=}}\n[[File:English.jpg|thumb]]\n{{=nld=}}\n'''lopen'''\n{{=deu=}}\n[[File:German.jpg]]"
+    assert extract_wikitext_fields(text)['image_url'] is None
+    text = '[[Bestand:Above.jpg]]\n' + text.replace("'''lopen'''", '[[Bestand:Dutch.jpg]]')
+    assert extract_wikitext_fields(text)['image_url'] == _commons_url('Above.jpg', 250)
+    assert extract_wikitext_fields(text.split('\n', 1)[1])['image_url'] == _commons_url('Dutch.jpg', 250)
+
+
+def test_build_and_lookup(tmp_path):
+    dump = tmp_path / 'dump.xml.bz2'
+    pages = make_page('huis', HUIS) + make_page('lopen', LOPEN) + make_page('Overleg:huis', HUIS, namespace=1)
+    xml = f'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/"><siteinfo/>{pages}</mediawiki>'
+    dump.write_bytes(bz2.compress(xml.encode('utf-8')))
+
+    assert build_wiktionary_index(dump, tmp_path / 'index.table') == 2
+
+    index = WiktionaryIndex(tmp_path / 'index.table')
+    assert index.get_fields('huis')['plural'] == 'huizen'
+    assert index.get_fields('lopen') == {
+        'article': None,
+        'transcription': '/ˈlopə(n)/',
+        'part_of_speech': 'werkwoord',
+        'plural': None,
+        'image_url': None,
+        'sound_url': None,
+    }
+    assert index.get_fields('Overleg:huis') is None
+    index.close()
@@ -0,0 +1,58 @@
+import unicodedata
+from anki_language_deck_generator import shards
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator
+from anki_language_deck_generator.word_normalizer import WordNormalizer
+
+
+def test_dutch_words():
+    normalizer = WordNormalizer('Dutch')
+    decomposed = unicodedata.normalize('NFD', 'café')
+
+    words = [normalizer.deduplicate(word) for word in [
+        'de  hond', 'Hond', "'t huis", 'huis', 'het', decomposed, 'café', 'de', 'Amsterdam',
+    ]]
+
+    assert words == ['hond', None, 'huis', None, 'het', 'café', None, 'de', 'Amsterdam']
+    assert (normalizer.words, normalizer.duplicates) == (6, 3)
+
+
+def test_articles_of_names_and_phrases_are_kept():
+    normalizer = WordNormalizer('Dutch')
+
+    assert normalizer.normalize('De hond') == 'hond'
+    assert normalizer.normalize('De Haag') == 'De Haag'
+    assert normalizer.normalize('De facto') == 'De facto'
+    assert normalizer.normalize('het is mooi') == 'het is mooi'
+
+
+def test_case_per_language():
+    german = WordNormalizer('German')
+    turkish = WordNormalizer('Turkish')
+
+    assert german.key('Essen') != german.key('essen')
+    # Articles are only stripped in Dutch
+    assert german.normalize('de hond') == 'de hond'
+    assert turkish.key('IRMAK') == 'ırmak' and turkish.key('İzmir') == 'izmir'
+
+
+def test_duplicates_are_not_looked_up(monkeypatch, tmp_path):
+    generator = AnkiDeckGenerator(
+        'Test deck', 'Dutch', 'English', tmp_path, word_normalizer=WordNormalizer('Dutch'),
+    )
+    looked_up = []
+    monkeypatch.setattr(generator, 'add_word', looked_up.append)
+    progress = []
+    generator.progress_callback = lambda current, total: progress.append(current)
+
+    generator.add_words(['de kat', 'kat', 'Kat', 'vis'])
+
+    assert looked_up == ['kat', 'vis']
+    assert progress[-1] == 4
+
+
+def test_spellings_of_a_word_share_a_shard():
+    normalizer = WordNormalizer('Dutch')
+
+    for index in range(4):
+        part = list(shards.iter_shard_words(['de boom', 'Boom', 'boom '], index, 4, normalizer=normalizer))
+        assert len(part) in (0, 3)
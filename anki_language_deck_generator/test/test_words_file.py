@@ -0,0 +1,24 @@
+import gzip
+import io
+import sys
+from anki_language_deck_generator.words_file import count_words, open_words_file
+
+
+def test_plain_and_gzip_files(tmp_path):
+    plain = tmp_path / 'words.txt'
+    plain.write_text('hond\nkat\n\nhuis\n', encoding='UTF-8')
+    compressed = tmp_path / 'words.txt.gz'
+    with gzip.open(compressed, 'wt', encoding='UTF-8') as f:
+        f.write('hond\nkat\n\nhuis\n')
+
+    for path in (plain, compressed):
+        with open_words_file(str(path)) as words:
+            assert list(words) == ['hond\n', 'kat\n', '\n', 'huis\n']
+        assert count_words(str(path)) == 4
+
+
+def test_stdin(monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO('één\ntwee\n'.encode('UTF-8'))))
+    with open_words_file('-') as words:
+        assert list(words) == ['één\n', 'twee\n']
+    assert not sys.stdin.closed
@@ -1 +1,24 @@
 from . import glosbe
+
+TRANSLATORS = ['glosbe', 'dictionary', 'dictionary+glosbe']
+
+
+def create_translator(name, source_language, target_language, http_pool=None, dictionary_dir=None):
+    """
+    Create a translator by name: 'glosbe', an offline 'dictionary' or
+    'dictionary+glosbe', which asks Glosbe for words missing in the dictionary.
+    """
+    if name not in TRANSLATORS:
+        raise ValueError(f'Unknown translator: {name}')
+    translators = []
+    if name.startswith('dictionary'):
+        if not dictionary_dir:
+            raise ValueError(f"The translator '{name}' needs a dictionary directory")
+        from .dictionary import Translator as DictionaryTranslator
+        translators.append(DictionaryTranslator(dictionary_dir, source_language, target_language))
+    if name.endswith('glosbe'):
+        translators.append(glosbe.Translator(source_language, target_language, http_pool=http_pool))
+    if len(translators) == 1:
+        return translators[0]
+    from .fallback import FallbackTranslator
+    return FallbackTranslator(translators)
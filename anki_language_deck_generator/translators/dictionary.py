@@ -0,0 +1,151 @@
+"""
+Offline translations from a bilingual dictionary index.
+
+`build_dictionary_index` reads a Wiktextract JSONL dump (https://kaikki.org)
+once and writes an index for one language pair. `Translator` answers from it
+like the Glosbe translator does, without network requests:
+
+    python -m anki_language_deck_generator.translators.dictionary kaikki.org-dictionary-Dutch.jsonl.gz \
+        --source-language Dutch --target-language English -o dictionary-nl-en
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+from anki_language_deck_generator.failures import WordNotFoundError
+from anki_language_deck_generator.language_codes import get_language_codes
+from anki_language_deck_generator.sorted_table import SortedTable, write_table
+from anki_language_deck_generator.words_file import open_text_file
+
+META_FILE = 'meta.json'
+TRANSLATIONS_FILE = 'translations.table'
+
+
+def normalize(word):
+    return ' '.join(word.split()).casefold()
+
+
+# Where a translation comes from, a lower rank wins over a higher one
+TRANSLATION_TABLE = 0
+GLOSS = 1
+REVERSE_TRANSLATION_TABLE = 2
+
+
+def _entry_translations(entry, source_code, target_code, gloss_code):
+    """Yield (source word, translation, rank) found in one Wiktextract entry"""
+    word = entry.get('word')
+    if not word:
+        return
+    lang_code = entry.get('lang_code')
+    if lang_code == source_code:
+        # Translation tables of the source word
+        for translation in entry.get('translations', []):
+            if translation.get('code') == target_code and translation.get('word'):
+                yield word, translation['word'], TRANSLATION_TABLE
+        # Wiktionary explains foreign words with glosses in the language of its edition,
+        # they are only translations if that is the target language
+        if gloss_code == target_code:
+            for sense in entry.get('senses', []):
+                # "plural of hond" explains a form, not the meaning
+                if 'form_of' in sense or 'form-of' in sense.get('tags', []):
+                    continue
+                for gloss in sense.get('glosses', []):
+                    yield word, gloss, GLOSS
+    elif lang_code == target_code:
+        # Translation tables of a target word point back to the source words
+        for translation in entry.get('translations', []):
+            if translation.get('code') == source_code and translation.get('word'):
+                yield translation['word'], word, REVERSE_TRANSLATION_TABLE
+
+
+def build_dictionary_index(dump_path, source_language, target_language, index_dir, edition_language='English'):
+    """
+    Build the translation index of a language pair from a Wiktextract JSONL dump.
+
+    `edition_language` is the language of the Wiktionary the dump is extracted
+    from, the kaikki.org dictionaries come from the English one. The dump is
+    streamed once and every word keeps one translation: one from the word's
+    own translation table before one of its glosses before one found in the
+    table of a target word, and among those the one Wiktionary lists first.
+    Returns the number of indexed words.
+    """
+    source_code, target_code = get_language_codes(source_language, target_language)
+    _, gloss_code = get_language_codes(source_language, edition_language)
+    translations = {}
+    with open_text_file(dump_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            for word, translation, rank in _entry_translations(entry, source_code, target_code, gloss_code):
+                word = normalize(word)
+                if word not in translations or rank < translations[word][0]:
+                    translations[word] = (rank, translation.strip())
+
+    index_dir = Path(index_dir)
+    write_table(
+        index_dir / TRANSLATIONS_FILE,
+        ((word, translation.encode('utf-8')) for word, (_, translation) in translations.items()),
+    )
+    meta = {'source_language': source_code, 'target_language': target_code, 'words': len(translations)}
+    (index_dir / META_FILE).write_text(json.dumps(meta), encoding='utf-8')
+    logging.info(f'Indexed translations of {len(translations)} words in {index_dir}')
+    return len(translations)
+
+
+class Translator:
+    """Translator answering from an index built by `build_dictionary_index`"""
+    NAME = 'dictionary'
+    # Answered from a local table, so the generator does not cache the lookups
+    OFFLINE = True
+
+    def __init__(self, index_dir, source_language=None, target_language=None):
+        self.index_dir = Path(index_dir)
+        meta = json.loads((self.index_dir / META_FILE).read_text(encoding='utf-8'))
+        if source_language is not None and target_language is not None:
+            languages = get_language_codes(source_language, target_language)
+            if languages != (meta['source_language'], meta['target_language']):
+                raise ValueError(
+                    f"The dictionary {self.index_dir} is built for "
+                    f"{meta['source_language']}-{meta['target_language']}, not {'-'.join(languages)}"
+                )
+        self.table = SortedTable(self.index_dir / TRANSLATIONS_FILE)
+
+    def translate(self, word):
+        translation = self.table.get(normalize(word))
+        if translation is None:
+            raise WordNotFoundError(f"Cannot find translations for word '{word}'")
+        return translation.decode('utf-8')
+
+    async def translate_async(self, word, client=None):
+        return self.translate(word)
+
+    def close(self):
+        self.table.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='anki-deck-dictionary-index',
+        description='Build an offline dictionary from a Wiktextract JSONL dump',
+    )
+    parser.add_argument('dump', help='Wiktextract JSONL dump, may be compressed with gzip or bzip2')
+    parser.add_argument('--source-language', required=True, help='Language of the words to translate')
+    parser.add_argument('--target-language', required=True, help='Language of the translations')
+    parser.add_argument('-o', '--output', required=True, help='Directory of the dictionary')
+    parser.add_argument(
+        '--edition-language',
+        default='English',
+        help='Language of the Wiktionary the dump is extracted from, its glosses are in it (default: %(default)s)',
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_dictionary_index(
+        args.dump, args.source_language, args.target_language, args.output, edition_language=args.edition_language,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import logging
+
+
+class FallbackTranslator:
+    """Ask translators in order and use the first translation found, e.g. an offline dictionary before Glosbe"""
+
+    def __init__(self, translators):
+        self.translators = list(translators)
+        self.NAME = '+'.join(translator.NAME for translator in self.translators)
+
+    def translate(self, word, lookup=None):
+        """`lookup(translator, word)` asks one of the translators, e.g. through a cache, by default directly"""
+        lookup = lookup or (lambda translator, word: translator.translate(word))
+        for translator in self.translators[:-1]:
+            try:
+                return lookup(translator, word)
+            except Exception as e:
+                logging.info(f"{translator.NAME} has no translation for the word '{word}' ({e}), trying the next one")
+        return lookup(self.translators[-1], word)
+
+    async def translate_async(self, word, client, lookup=None):
+        """Like `translate`, with an async `lookup(translator, word)`"""
+        lookup = lookup or (lambda translator, word: translator.translate_async(word, client))
+        for translator in self.translators[:-1]:
+            try:
+                return await lookup(translator, word)
+            except Exception as e:
+                logging.info(f"{translator.NAME} has no translation for the word '{word}' ({e}), trying the next one")
+        return await lookup(self.translators[-1], word)
+
+    def close(self):
+        for translator in self.translators:
+            if hasattr(translator, 'close'):
+                translator.close()
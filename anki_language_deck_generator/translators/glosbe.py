@@ -1,34 +1,65 @@
-import requests
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 
+from anki_language_deck_generator.failures import WordNotFoundError
+from anki_language_deck_generator.http_pool import HttpPool
 from anki_language_deck_generator.language_codes import get_language_codes
 
 
 class Translator:
-    def __init__(self, source_language, target_language):
+    NAME = 'glosbe'
+
+    def __init__(self, source_language, target_language, http_pool=None):
         source_language_code, target_language_code = get_language_codes(
             source_language, target_language
         )
         self.base_url = '/'.join(
             ['https://glosbe.com', source_language_code, target_language_code]
         )
+        self.http_pool = http_pool or HttpPool()
 
     def translate(self, word):
-        response = requests.get(f'{self.base_url}/{word}')
+        response = self.http_pool.get(f'{self.base_url}/{word}')
+        response.raise_for_status()
+        return self._parse_translation(word, response.text)
+
+    async def translate_async(self, word, client):
+        import asyncio
+
+        response = await client.get(f'{self.base_url}/{word}')
         response.raise_for_status()
+        # Parsing would block the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._parse_translation, word, response.text)
 
-        # Parse HTML response
-        soup = BeautifulSoup(response.text, 'html.parser')
+    @staticmethod
+    def _find_content_summary(html):
+        # Only the summary paragraph is parsed, the rest of the page is skipped
+        start = html.find('id="content-summary"')
+        if start != -1:
+            start = html.rfind('<p', 0, start)
+            end = html.find('</p>', start)
+            if start != -1 and end != -1:
+                try:
+                    paragraph = lxml.html.fragment_fromstring(html[start:end + len('</p>')])
+                except etree.ParserError:
+                    paragraph = None
+                if paragraph is not None and paragraph.tag == 'p' and paragraph.get('id') == 'content-summary':
+                    return paragraph
+        # Unusual markup, fall back to the whole page
+        if not html.strip():
+            return None
+        return next(iter(lxml.html.fromstring(html).xpath('//p[@id="content-summary"]')), None)
 
+    def _parse_translation(self, word, html):
         # Find content summary paragraph
-        summary_paragraph = soup.find('p', id='content-summary')
+        summary_paragraph = self._find_content_summary(html)
         if summary_paragraph is None:
             raise RuntimeError(f"Cannot find content summary for word '{word}'")
 
         # Find translations in strong tags
-        translations = summary_paragraph.find('strong')
+        translations = summary_paragraph.find('.//strong')
         if translations is None:
-            raise RuntimeError(f"Cannot find translations for word '{word}'")
+            raise WordNotFoundError(f"Cannot find translations for word '{word}'")
 
         # Extract and split translations
-        return translations.text.split(", ")[0]
+        return translations.text_content().split(", ")[0]
@@ -0,0 +1,47 @@
+VOICE_BACKENDS = ['gtts', 'espeak-ng', 'piper']
+
+
+class VoiceBackend:
+    """
+    Interface of the engines that pronounce words.
+
+    A backend saves the sound of a word into a file in its working directory
+    and returns the path. `store_name` names the sounds it makes in the media
+    store, so sounds of different engines or voices are never mixed up.
+    """
+    NAME = None
+
+    @property
+    def store_name(self):
+        return self.NAME
+
+    def download_sound(self, word):
+        raise NotImplementedError
+
+    async def download_sound_async(self, word, client):
+        import asyncio
+
+        # Local engines block, so they run in the default executor of the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.download_sound, word)
+
+    def close(self):
+        pass
+
+
+def create_voice_backend(name, language, working_dir, http_pool=None, voice=None, processes=None):
+    """
+    Create a voice backend by name: 'gtts' (online), or the local engines
+    'espeak-ng' and 'piper', which run in up to `processes` subprocesses.
+    For piper, `voice` is the path of a voice model.
+    """
+    if name not in VOICE_BACKENDS:
+        raise ValueError(f'Unknown voice backend: {name}')
+    if name == 'gtts':
+        from anki_language_deck_generator.google_voice import GoogleVoice
+        return GoogleVoice(language, working_dir, http_pool=http_pool)
+    from anki_language_deck_generator.local_voice import EspeakVoice, PiperVoice
+    if name == 'espeak-ng':
+        return EspeakVoice(language, working_dir, voice=voice, processes=processes)
+    if not voice:
+        raise ValueError("The voice backend 'piper' needs a voice model")
+    return PiperVoice(language, working_dir, voice, processes=processes)
@@ -0,0 +1,190 @@
+"""
+Local Dutch Wiktionary index built from a nl.wiktionary XML dump.
+
+`build_wiktionary_index` streams a `nlwiktionary-*-pages-articles.xml.bz2`
+dump (https://dumps.wikimedia.org/nlwiktionary/) once and extracts the card
+fields of every Dutch entry from its wikitext. `WiktionaryIndex` answers from
+the result, so `DutchWiktionaryWord` lookups need no network requests:
+
+    python -m anki_language_deck_generator.wiktionary_index nlwiktionary-latest-pages-articles.xml.bz2 \
+        -o nl-wiktionary.table
+"""
+import argparse
+import bz2
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import quote
+from anki_language_deck_generator.dutch_wiktionary import FIELDS, article_from_genus
+from anki_language_deck_generator.sorted_table import SortedTable, write_table
+
+UPLOAD_URL = 'https://upload.wikimedia.org/wikipedia/commons'
+# Width of the image thumbnails, about what the rendered pages show
+THUMB_WIDTH = 250
+# Section header templates of the parts of speech, as on the rendered pages
+PARTS_OF_SPEECH = {
+    'noun': 'zelfstandig naamwoord',
+    'verb': 'werkwoord',
+    'adjc': 'bijvoeglijk naamwoord',
+    'adverb': 'bijwoord',
+    'interj': 'tussenwerpsel',
+    'pronoun': 'voornaamwoord',
+    'prep': 'voorzetsel',
+}
+# Genus templates on the headword line and their markers on the rendered pages
+GENUS_TEMPLATES = {'m': 'm', 'f': 'v', 'v': 'v', 'n': 'o', 'o': 'o', 'c': 'g', 'g': 'g'}
+
+LANGUAGE_SECTION_RE = re.compile(r'\{\{=(\w+)=\}\}')
+IPA_RE = re.compile(r'\{\{IPA\|([^|}]+)')
+AUDIO_RE = re.compile(r'\{\{audio\|([^|}]+)')
+PART_OF_SPEECH_RE = re.compile(r'\{\{-(' + '|'.join(PARTS_OF_SPEECH) + r')-[|}]')
+NOUN_TABLE_RE = re.compile(r'\{\{-nlnoun-\|([^|}]*)\|([^|}]*)')
+HEADWORD_RE = re.compile(r"^'''.*$", re.MULTILINE)
+GENUS_RE = re.compile(r'\{\{(' + '|'.join(GENUS_TEMPLATES) + r')\}\}')
+IMAGE_RE = re.compile(r'\[\[\s*(?:Bestand|Afbeelding|File|Image)\s*:\s*([^|\]]+)', re.IGNORECASE)
+
+
+def _commons_url(file_name, thumb_width=None):
+    # Commons stores files under the MD5 of their normalized name
+    file_name = file_name.strip().replace(' ', '_')
+    file_name = file_name[:1].upper() + file_name[1:]
+    digest = hashlib.md5(file_name.encode('utf-8')).hexdigest()
+    path = f'{digest[0]}/{digest[:2]}/{quote(file_name)}'
+    if thumb_width is None:
+        return f'{UPLOAD_URL}/{path}'
+    thumb_name = quote(file_name) + ('.png' if file_name.lower().endswith('.svg') else '')
+    return f'{UPLOAD_URL}/thumb/{path}/{thumb_width}px-{thumb_name}'
+
+
+def _split_sections(text):
+    """Return the text above the language sections and the Dutch section, or None without one"""
+    sections = list(LANGUAGE_SECTION_RE.finditer(text))
+    preamble = text[:sections[0].start()] if sections else text
+    for i, match in enumerate(sections):
+        if match.group(1) == 'nld':
+            end = sections[i + 1].start() if i + 1 < len(sections) else len(text)
+            return preamble, text[match.end():end]
+    return preamble, None
+
+
+def extract_wikitext_fields(text):
+    """Extract the card fields from the wikitext of a page, or None if it has no Dutch entry"""
+    preamble, section = _split_sections(text)
+    if section is None:
+        return None
+    fields = dict.fromkeys(FIELDS)
+
+    match = IPA_RE.search(section)
+    if match:
+        fields['transcription'] = match.group(1).strip()
+    match = AUDIO_RE.search(section)
+    if match:
+        fields['sound_url'] = _commons_url(match.group(1))
+    match = PART_OF_SPEECH_RE.search(section)
+    if match:
+        fields['part_of_speech'] = PARTS_OF_SPEECH[match.group(1)]
+
+    noun = re.search(r'\{\{-noun-[|}]', section)
+    if noun:
+        noun_section = section[noun.end():]
+        headword = HEADWORD_RE.search(noun_section)
+        if headword:
+            markers = [GENUS_TEMPLATES[genus] for genus in GENUS_RE.findall(headword.group(0))]
+            fields['article'] = article_from_genus(markers)
+        match = NOUN_TABLE_RE.search(noun_section)
+        if match and match.group(2).strip() not in ('', '-'):
+            fields['plural'] = match.group(2).strip()
+
+    # Images are often placed above the language sections, the images
+    # of the other languages' sections show other words
+    for match in itertools.chain(IMAGE_RE.finditer(preamble), IMAGE_RE.finditer(section)):
+        file_name = match.group(1).strip()
+        if not file_name.endswith(('Icon.svg', 'Symbol.svg')):
+            fields['image_url'] = _commons_url(file_name, THUMB_WIDTH)
+            break
+    return fields
+
+
+def _iter_pages(dump_path):
+    """Yield (title, wikitext) of the articles of a MediaWiki XML dump"""
+    path = str(dump_path)
+    opener = bz2.open if path.endswith('.bz2') else gzip.open if path.endswith('.gz') else open
+    with opener(dump_path, 'rb') as f:
+        root = None
+        title = namespace = text = None
+        for event, element in ElementTree.iterparse(f, events=('start', 'end')):
+            tag = element.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            if tag == 'title':
+                title = element.text
+            elif tag == 'ns':
+                namespace = element.text
+            elif tag == 'text':
+                text = element.text or ''
+            elif tag == 'page':
+                if namespace == '0' and title and text:
+                    yield title, text
+                title = namespace = text = None
+                # Drop the finished pages, the dump does not fit in memory
+                root.clear()
+
+
+def build_wiktionary_index(dump_path, output_path):
+    """Build the index of all Dutch entries of the dump. Returns the number of indexed words."""
+    entries = {}
+    for title, text in _iter_pages(dump_path):
+        fields = extract_wikitext_fields(text)
+        if fields is not None:
+            # Empty fields are left out to keep the index small
+            entries[title] = {name: value for name, value in fields.items() if value is not None}
+            if len(entries) % 100000 == 0:
+                logging.info(f'Extracted {len(entries)} Dutch entries...')
+    write_table(
+        output_path,
+        ((title, json.dumps(fields, ensure_ascii=False).encode('utf-8')) for title, fields in entries.items()),
+    )
+    logging.info(f'Indexed {len(entries)} Dutch entries in {output_path}')
+    return len(entries)
+
+
+class WiktionaryIndex:
+    """Card fields of Dutch words looked up in an index built by `build_wiktionary_index`"""
+
+    def __init__(self, path):
+        self.table = SortedTable(path)
+
+    def get_fields(self, word):
+        """Return the fields in the form of `DutchWiktionaryWord.get_fields` or None for unknown words"""
+        value = self.table.get(word)
+        if value is None:
+            return None
+        fields = dict.fromkeys(FIELDS)
+        fields.update(json.loads(value))
+        return fields
+
+    def close(self):
+        self.table.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='anki-deck-wiktionary-index',
+        description='Build a local Dutch Wiktionary index from a nl.wiktionary XML dump',
+    )
+    parser.add_argument('dump', help='pages-articles XML dump, may be compressed with bzip2 or gzip')
+    parser.add_argument('-o', '--output', required=True, help='Path of the index file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_wiktionary_index(args.dump, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import re
+import unicodedata
+
+# Languages whose spelling depends on the case, e.g. German nouns
+CASE_SENSITIVE_LANGUAGES = {'German'}
+# Languages with a dotted and a dotless i
+TURKIC_LANGUAGES = {'Turkish', 'Azerbaijani'}
+ARTICLE_RE = {
+    'Dutch': re.compile(r"^(?:de|het|'t) ", re.IGNORECASE),
+}
+# Loan phrases starting with what looks like an article
+ARTICLE_EXCEPTIONS = {
+    'Dutch': {'de facto', 'de jure', 'de luxe', 'de novo', 'de visu'},
+}
+
+
+def normalize_word(word, language):
+    """Bring a word to Unicode NFC with single spaces and strip the article where the generator adds it"""
+    word = ' '.join(unicodedata.normalize('NFC', word).split())
+    article_re = ARTICLE_RE.get(language)
+    match = article_re.match(word) if article_re is not None else None
+    if match is not None:
+        noun = word[match.end():]
+        # Only an article before a common noun, not in names ("De Haag") or phrases ("de facto")
+        if ' ' not in noun and noun.islower() and word.casefold() not in ARTICLE_EXCEPTIONS.get(language, ()):
+            return noun
+    return word
+
+
+def word_key(word, language):
+    """Return what two words have in common if they are the same word"""
+    word = normalize_word(word, language)
+    if language in CASE_SENSITIVE_LANGUAGES:
+        return word
+    if language in TURKIC_LANGUAGES:
+        return word.replace('I', 'ı').replace('İ', 'i').lower()
+    return word.casefold()
+
+
+class WordNormalizer:
+    """
+    Normalizes the words of a word list and drops duplicates before any lookup.
+
+    Words are brought to Unicode NFC with single spaces, and articles are
+    stripped from single common nouns where the generator adds them itself
+    (Dutch "de hond" -> "hond", but "De Haag" stays).
+    Duplicates are found by the case folded word unless case matters in the
+    language, but a word keeps the spelling of its first occurrence, so
+    proper nouns keep their capitals.
+    """
+
+    def __init__(self, language):
+        self.language = language
+        self._seen = set()
+        self.words = 0
+        self.duplicates = 0
+
+    def normalize(self, word):
+        return normalize_word(word, self.language)
+
+    def key(self, word):
+        return word_key(word, self.language)
+
+    def deduplicate(self, word):
+        """Return the normalized word, or None if the same word came before"""
+        key = self.key(word)
+        if key in self._seen:
+            self.duplicates += 1
+            return None
+        self._seen.add(key)
+        self.words += 1
+        return self.normalize(word)
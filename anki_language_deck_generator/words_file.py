@@ -0,0 +1,45 @@
+import bz2
+import gzip
+import io
+import sys
+from contextlib import contextmanager
+
+
+def _opener(path):
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open
+    if path.endswith('.bz2'):
+        return bz2.open
+    return open
+
+
+def open_text_file(path):
+    """Open a text file for reading, decompressing '*.gz' and '*.bz2' files on the fly"""
+    return _opener(path)(path, 'rt', encoding='UTF-8')
+
+
+@contextmanager
+def open_words_file(path):
+    """Open a words file for streaming: '-' reads stdin, '*.gz' and '*.bz2' files are decompressed on the fly"""
+    if path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='UTF-8')
+        try:
+            yield stream
+        finally:
+            # Do not close stdin together with the wrapper
+            stream.detach()
+    else:
+        with open_text_file(path) as f:
+            yield f
+
+
+def count_words(path):
+    """Count lines of a words file in a cheap pass without decoding them"""
+    if path == '-':
+        raise ValueError('Cannot count words read from stdin in advance')
+    count = 0
+    with _opener(path)(path, 'rb') as f:
+        for _ in f:
+            count += 1
+    return count
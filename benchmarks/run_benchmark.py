@@ -0,0 +1,215 @@
+"""
+Offline end-to-end throughput benchmark of AnkiDeckGenerator.
+
+Runs the full add_words -> save_deck path against the local stub server, so
+results do not depend on live services and can be compared between changes:
+
+    python benchmarks/run_benchmark.py --words 500 --workers 16 --latency-ms 80
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from anki_language_deck_generator.deck_generator import AnkiDeckGenerator  # noqa: E402
+from anki_language_deck_generator.http_pool import HttpPool  # noqa: E402
+from anki_language_deck_generator.image_normalizer import ImageNormalizer  # noqa: E402
+from anki_language_deck_generator.lookup_cache import LookupCache  # noqa: E402
+from anki_language_deck_generator.media_store import MediaStore  # noqa: E402
+from anki_language_deck_generator.metrics import Metrics  # noqa: E402
+from anki_language_deck_generator.rate_limiter import RateLimiter  # noqa: E402
+from stub_server import RESPONSES_DIR, StubConfig, start_stub_server  # noqa: E402
+
+
+def _redirect(url, stub_url):
+    scheme, _, rest = str(url).partition('://')
+    return f'{stub_url}/{rest}'
+
+
+class _RedirectAdapter(HTTPAdapter):
+    def __init__(self, stub_url, **kwargs):
+        self.stub_url = stub_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = _redirect(request.url, self.stub_url)
+        return super().send(request, **kwargs)
+
+
+class StubHttpPool(HttpPool):
+    """HttpPool sending every request to the stub server, keeping the original host in the path"""
+
+    def __init__(self, stub_url, **kwargs):
+        super().__init__(**kwargs)
+        adapter = _RedirectAdapter(stub_url, pool_connections=self.max_hosts, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.stub_url = stub_url
+
+    def create_async_client(self, max_connections=None):
+        import httpx
+
+        client = super().create_async_client(max_connections)
+
+        async def redirect(request):
+            request.url = httpx.URL(_redirect(request.url, self.stub_url))
+
+        client.event_hooks['request'].append(redirect)
+        return client
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_once(args, stub_url, words, work_dir, cache, media_store):
+    metrics = Metrics()
+    rate_limiter = RateLimiter(default_rate=args.rate_limit, base_delay=0.05)
+    http_pool = StubHttpPool(
+        stub_url,
+        pool_size=max(HttpPool.DEFAULT_POOL_SIZE, args.workers),
+        rate_limiter=rate_limiter,
+        metrics=metrics,
+    )
+    image_normalizer = None
+    if args.image_max_size:
+        image_normalizer = ImageNormalizer(max_size=args.image_max_size)
+    generator = AnkiDeckGenerator(
+        deck_name='Benchmark deck',
+        source_language=args.source_language,
+        target_language=args.target_language,
+        working_dir=work_dir,
+        workers=args.workers,
+        cache=cache,
+        media_store=media_store,
+        http_pool=http_pool,
+        metrics=metrics,
+        output_path=Path(work_dir) / 'deck.apkg',
+        image_normalizer=image_normalizer,
+    )
+
+    start = time.perf_counter()
+    if args.use_async:
+        asyncio.run(generator.add_words_async(words, concurrency=args.concurrency))
+    else:
+        generator.add_words(words)
+    add_words_seconds = time.perf_counter() - start
+
+    output_path = generator.apkg_writer.path
+    generator.save_deck()
+    total_seconds = time.perf_counter() - start
+    http_pool.close()
+    if image_normalizer is not None:
+        image_normalizer.close()
+
+    return {
+        'words': len(words),
+        'failed_words': len(generator.failed_words),
+        'add_words_seconds': add_words_seconds,
+        'total_seconds': total_seconds,
+        'words_per_second': len(words) / total_seconds,
+        'output_bytes': output_path.stat().st_size,
+        'retries': rate_limiter.retries,
+        'metrics': metrics.report(),
+    }
+
+
+def print_report(report):
+    print(
+        f"\n{report['words']} words in {report['total_seconds']:.2f}s: "
+        f"{report['words_per_second']:.1f} words/s, {report['failed_words']} failed, "
+        f"{report['retries']} retries, deck {report['output_bytes'] / 1024:.0f} KiB"
+    )
+    print(f"{'stage':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in report['metrics']['stages'].items():
+        print(
+            f"{stage:<16}{stats['count']:>8}{stats['p50_ms']:>10.1f}"
+            f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+    for name, counters in report['metrics']['caches'].items():
+        print(f"cache {name}: {counters['hit_ratio']:.0%} hits of {counters['hits'] + counters['misses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline throughput benchmark of the deck generator')
+    parser.add_argument('--words', type=int, default=200, help='Number of generated words (default: 200)')
+    parser.add_argument('--words-file', help='Use words from this file instead of generated ones')
+    parser.add_argument('--source-language', default='Dutch')
+    parser.add_argument('--target-language', default='Russian')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--async', dest='use_async', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=50, help='Mean stub response latency')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='Uniform jitter around the latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--rate-limit', type=float, default=1000, help='Requests per second per host')
+    parser.add_argument('--responses-dir', default=str(RESPONSES_DIR), help='Recorded responses to replay')
+    parser.add_argument(
+        '--with-cache',
+        action='store_true',
+        help='Share a lookup cache and media store between runs, so later runs measure warm caches',
+    )
+    parser.add_argument('--image-max-size', type=int, help='Normalize images to this size')
+    parser.add_argument('--runs', type=int, default=1, help='Number of runs (default: 1)')
+    parser.add_argument('--json', help='Write the report to this JSON file')
+    args = parser.parse_args()
+    # Per-word logging would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.words_file:
+        with open(args.words_file, 'r', encoding='UTF-8') as f:
+            words = [line.strip() for line in f if line.strip()]
+    else:
+        words = [f'woord{i}' for i in range(args.words)]
+
+    config = StubConfig(args.responses_dir, args.latency_ms, args.jitter_ms, args.failure_rate)
+    server = start_stub_server(config)
+    stub_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    reports = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = None
+        media_store = None
+        if args.with_cache:
+            cache = LookupCache(Path(temp_dir) / 'lookups.sqlite')
+            media_store = MediaStore(Path(temp_dir) / 'media')
+        for run in range(args.runs):
+            work_dir = Path(temp_dir) / f'run{run}'
+            report = run_once(args, stub_url, words, work_dir, cache, media_store)
+            reports.append(report)
+            print_report(report)
+        if args.with_cache:
+            cache.close()
+            media_store.close()
+    server.shutdown()
+
+    summary = {
+        'config': vars(args),
+        'stub_requests': config.requests,
+        'stub_failures': config.failures,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'runs': reports,
+    }
+    if summary['peak_rss_bytes'] is not None:
+        print(f"\npeak RSS {summary['peak_rss_bytes'] / 2**20:.1f} MiB, {config.requests} stub requests")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
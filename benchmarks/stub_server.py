@@ -0,0 +1,132 @@
+"""
+Local stand-in for every service the deck generator talks to.
+
+Requests are routed by the original host, which the benchmark puts in front of
+the path (`/glosbe.com/nl/en/hond`). The synthetic responses in `responses/`,
+shaped like the real ones, are served with the requested word filled in. Latency and failures are
+injected to model slow or throttling hosts.
+"""
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+RESPONSES_DIR = Path(__file__).parent / 'responses'
+# A few kilobytes of bytes shaped like an MP3 frame stream
+FAKE_MP3 = b'ID3\x03\x00\x00\x00\x00\x00\x00' + b'\xff\xfb\x90\x64' * 1024
+
+
+class StubConfig:
+    def __init__(self, responses_dir=RESPONSES_DIR, latency_ms=50, jitter_ms=20, failure_rate=0.0):
+        self.responses_dir = Path(responses_dir)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.glosbe = (self.responses_dir / 'glosbe.html').read_text(encoding='utf-8')
+        self.tatoeba = (self.responses_dir / 'tatoeba.json').read_text(encoding='utf-8')
+        self.wiktionary = (self.responses_dir / 'wiktionary.html').read_text(encoding='utf-8')
+        self.image = (self.responses_dir / 'image.jpg').read_bytes()
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def count(self, failed):
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle's algorithm and delayed
+    # ACKs every keep-alive response would be held back for about 40 ms
+    disable_nagle_algorithm = True
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_network(self):
+        config = self.config
+        delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+        failed = random.random() < config.failure_rate
+        config.count(failed)
+        if failed:
+            self._send(503, 'text/plain', 'Service unavailable', {'Retry-After': '0'})
+        return failed
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self._handle(self.rfile.read(length).decode('utf-8'))
+
+    def _handle(self, body=''):
+        if self._simulate_network():
+            return
+        url = urlsplit(self.path)
+        host, _, path = url.path.lstrip('/').partition('/')
+        query = parse_qs(url.query)
+        config = self.config
+
+        if host == 'glosbe.com':
+            word = unquote(path.rsplit('/', 1)[-1])
+            self._send(200, 'text/html; charset=utf-8', config.glosbe.replace('WORD', word))
+        elif host == 'tatoeba.org':
+            word = query['query'][0]
+            self._send(200, 'application/json', config.tatoeba.replace('WORD', word))
+        elif host == 'nl.wiktionary.org':
+            word = query['page'][0]
+            data = {
+                'parse': {
+                    'title': word,
+                    'text': config.wiktionary.replace('WORD', word),
+                    'langlinks': [{'lang': 'en', 'title': word}],
+                }
+            }
+            self._send(200, 'application/json', json.dumps(data, ensure_ascii=False))
+        elif host == 'translate.google.com':
+            # gTTS batchexecute answer carrying base64 encoded MP3
+            audio = base64.b64encode(FAKE_MP3).decode('ascii')
+            self._send(200, 'application/json', f')]}}\'\n\n[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null]]')
+        elif host == 'www.google.com':
+            word = query['q'][0]
+            self._send(
+                200,
+                'text/html; charset=utf-8',
+                f'<html><body><script>AF_initDataCallback(["https://images.example.com/{word}.jpg"]);'
+                f'</script></body></html>',
+            )
+        else:
+            self._send(200, 'image/jpeg', config.image)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of connections arrive at once from the async client
+    request_queue_size = 1024
+
+
+def start_stub_server(config):
+    """Start the stub server in a background thread and return it"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config})
+    server = StubServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
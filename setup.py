@@ -21,15 +21,28 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.8',
     install_requires=[
+        # google_image_downloader calls icrawler's GoogleParser without a crawler,
+        # test_google_image_downloader checks that before upgrading
         'icrawler==0.6.10',
         'genanki==0.13.1',
         'requests==2.32.3',
         'beautifulsoup4==4.12.3',
+        'lxml>=4.6.4',
+        # google_voice relies on gTTS internals, test_google_voice checks them before upgrading
         'gTTS==2.5.4',
     ],
     extras_require={
+        'async': [
+            'httpx',
+        ],
+        'images': [
+            'pillow',
+        ],
+        'yaml': [
+            'pyyaml',
+        ],
         'dev': [
             'pytest',
         ]
@@ -37,6 +50,12 @@ setup(
     entry_points={
         'console_scripts': [
             'anki-language-deck-generator=anki_language_deck_generator.__main__:main',
+            'anki-deck-tatoeba-index=anki_language_deck_generator.tatoeba_index:main',
+            'anki-deck-dictionary-index=anki_language_deck_generator.translators.dictionary:main',
+            'anki-deck-wiktionary-index=anki_language_deck_generator.wiktionary_index:main',
+            'anki-deck-batch=anki_language_deck_generator.batch:main',
+            'anki-deck-service=anki_language_deck_generator.service:main',
+            'anki-deck-merge=anki_language_deck_generator.apkg_merge:main',
         ],
     },
 )